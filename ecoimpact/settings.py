@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'simulacao.middleware.PerfilMiddleware',  # só ativo com SIMULACAO_PERFIL
+    'simulacao.middleware.ReplicaMiddleware',  # só ativo com réplicas (DB_REPLICAS)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +59,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Perfil por requisição (cabeçalho Server-Timing e amostras de cProfile); ver simulacao/middleware.py
+SIMULACAO_PERFIL = os.getenv('SIMULACAO_PERFIL') == 'True'
+SIMULACAO_PERFIL_AMOSTRA = float(os.getenv('SIMULACAO_PERFIL_AMOSTRA', '0'))
+SIMULACAO_PERFIL_DIR = os.getenv('SIMULACAO_PERFIL_DIR')
+
+# Diretório compartilhado pelos workers para somar as métricas de /metrics; ver simulacao/metricas.py
+SIMULACAO_METRICAS_DIR = os.getenv('SIMULACAO_METRICAS_DIR')
+
 ROOT_URLCONF = 'ecoimpact.urls'
 
 TEMPLATES = [
@@ -80,13 +90,44 @@ WSGI_APPLICATION = 'ecoimpact.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Conexões persistentes (segundos), verificadas antes de reutilizar. O default de
+# 60 vale para o WSGI, em que cada worker reaproveita a conexão da sua thread.
+# Sob ASGI defina DB_CONN_MAX_AGE=0: as views assíncronas e o sync_to_async
+# rodam em threads de executor, e conexões persistentes presas a essas threads
+# se acumulam sem ser fechadas ao fim da requisição.
+CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# WAL: leitores não bloqueiam o escritor; IMMEDIATE: a transação pega o lock de
+# escrita no BEGIN, em vez de falhar com "database is locked" ao tentar promovê-lo
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=5000; '
+    'PRAGMA temp_store=MEMORY; PRAGMA cache_size=-20000;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS, 'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
+# Réplicas de leitura: DB_REPLICAS=/caminho/replica1.sqlite3,/caminho/replica2.sqlite3
+# (localmente, preenchidas com manage.py sincronizar_replicas). Ver simulacao/roteamento.py
+for _indice, _nome in enumerate(filter(None, map(str.strip, os.getenv('DB_REPLICAS', '').split(','))), start=1):
+    DATABASES[f'replica{_indice}'] = {
+        **DATABASES['default'],
+        'NAME': _nome,
+        'OPTIONS': {**DATABASES['default']['OPTIONS'], 'init_command': SQLITE_PRAGMAS + ' PRAGMA query_only=ON;'},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['simulacao.roteamento.ReplicaRouter']
+SIMULACAO_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+SIMULACAO_REPLICA_ATRASO = int(os.getenv('DB_REPLICA_ATRASO', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
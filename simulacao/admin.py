@@ -1,26 +1,155 @@
 from __future__ import annotations
 
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from . import importacao
+from .models import (
+    CenarioCoeficiente, ChaveIdempotencia, Cidade, Comparacao, EstatisticaDiaria, Projecao, Simulacao, Relatorio, VersaoCoeficientes,
+)
+
+
+class ImportarCidadesForm(forms.Form):
+    arquivo = forms.FileField(label="CSV")
+    encoding = forms.ChoiceField(choices=[("utf-8-sig", "UTF-8"), ("latin-1", "Latin-1 (IBGE)")], initial="utf-8-sig")
+    estado = forms.CharField(required=False, max_length=50, help_text="Usado quando o CSV não tem coluna estado/uf")
 
-from .models import Cidade, Simulacao, Relatorio
 
 @admin.register(Cidade)
 class CidadeAdmin(admin.ModelAdmin):
-    list_display = ("nome", "populacao", "pib_per_capita")
+    list_display = ("nome", "estado", "populacao", "pib_per_capita")
+    list_filter = ("estado",)
     search_fields = ("nome",)
+    change_list_template = "admin/simulacao/cidade/change_list.html"
+
+    def get_urls(self):
+        urls = [
+            path("importar-csv/", self.admin_site.admin_view(self.importar_csv), name="simulacao_cidade_importar_csv"),
+        ]
+        return urls + super().get_urls()
+
+    def importar_csv(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect("admin:simulacao_cidade_changelist")
+        form = ImportarCidadesForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            arquivo = io.TextIOWrapper(form.cleaned_data["arquivo"].file, encoding=form.cleaned_data["encoding"], newline="")
+            try:
+                resultado = importacao.importar_cidades(importacao.ler_csv(arquivo, estado_padrao=form.cleaned_data["estado"]))
+            except (UnicodeDecodeError, ValueError) as e:
+                form.add_error("arquivo", str(e))
+            else:
+                self.message_user(
+                    request,
+                    f"{resultado.inseridas} inserida(s), {resultado.atualizadas} atualizada(s), "
+                    f"{resultado.inalteradas} inalterada(s), {resultado.ignoradas} ignorada(s).",
+                    messages.WARNING if resultado.ignoradas else messages.SUCCESS,
+                )
+                for erro in resultado.erros[:10]:
+                    self.message_user(request, erro, messages.WARNING)
+                return redirect("admin:simulacao_cidade_changelist")
+        contexto = {**self.admin_site.each_context(request), "opts": self.model._meta, "form": form, "title": "Importar cidades (CSV)"}
+        return TemplateResponse(request, "admin/simulacao/cidade/importar_csv.html", contexto)
 
 
 @admin.register(Simulacao)
 class SimulacaoAdmin(admin.ModelAdmin):
-    list_display = ("id", "cidade", "data_criacao")
-    list_filter = ("cidade", "data_criacao")
-    readonly_fields = ("data_criacao",)
+    list_display = ("id", "cidade", "cenario", "status", "data_criacao")
+    list_filter = ("status", "cenario", "cidade", "data_criacao")
+    readonly_fields = ("data_criacao", "parametros_hash", "iniciado_em", "cenario")
 
 
 @admin.register(Relatorio)
 class RelatorioAdmin(admin.ModelAdmin):
-    list_display = ("simulacao", "criado_em")
+    list_display = ("simulacao", "impacto_total", "n_cidades", "versao_coeficientes", "criado_em")
+    list_filter = ("versao_coeficientes",)
+    readonly_fields = ("criado_em", *Relatorio.CAMPOS_RESUMO)
+
+
+def _versao_em_uso(obj) -> bool:
+    return obj is not None and obj.relatorios.exists()
+
+
+class CenarioCoeficienteInline(admin.TabularInline):
+    model = CenarioCoeficiente
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return not _versao_em_uso(obj) and super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        return not _versao_em_uso(obj) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not _versao_em_uso(obj) and super().has_delete_permission(request, obj)
+
+
+@admin.register(VersaoCoeficientes)
+class VersaoCoeficientesAdmin(admin.ModelAdmin):
+    """Versões usadas em relatórios ficam somente leitura: edite uma cópia e ative-a."""
+
+    list_display = ("id", "descricao", "ativa", "criada_em", "atualizada_em")
+    inlines = [CenarioCoeficienteInline]
+    actions = ["ativar_versao", "duplicar_versao"]
+    readonly_fields = ("ativa", "criada_em", "atualizada_em")
+
+    def get_readonly_fields(self, request, obj=None):
+        if _versao_em_uso(obj):
+            return [f.name for f in self.model._meta.concrete_fields]
+        return self.readonly_fields
+
+    def has_delete_permission(self, request, obj=None):
+        return not _versao_em_uso(obj) and super().has_delete_permission(request, obj)
+
+    @admin.action(description="Ativar a versão selecionada")
+    def ativar_versao(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Selecione exatamente uma versão para ativar.", messages.ERROR)
+            return
+        versao = queryset.get()
+        versao.ativar()
+        self.message_user(request, f"Versão {versao.id} ativada.", messages.SUCCESS)
+
+    @admin.action(description="Duplicar como nova versão (inativa)")
+    def duplicar_versao(self, request, queryset):
+        for versao in queryset:
+            nova = versao.duplicar()
+            self.message_user(request, f"Versão {nova.id} criada a partir da {versao.id}.", messages.SUCCESS)
+
+
+@admin.register(EstatisticaDiaria)
+class EstatisticaDiariaAdmin(admin.ModelAdmin):
+    list_display = ("dia", "cidade", "cenario", "quantidade", "soma_impacto")
+    list_filter = ("cenario", "cidade")
+    date_hierarchy = "dia"
+
+
+@admin.register(Comparacao)
+class ComparacaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "estado", "criterio", "n_cidades", "impacto_total", "criado_em")
+    readonly_fields = ("criado_em",)
+
+
+@admin.register(Projecao)
+class ProjecaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "cidade", "granularidade", "inicio", "n_pontos", "impacto_total", "criado_em")
+    list_filter = ("granularidade",)
+    # As séries empacotadas são binárias: só visíveis pela API
+    exclude = ("turistas", "impacto")
     readonly_fields = ("criado_em",)
 
 
-## Admin de ImpactoEconomico removido.
\ No newline at end of file
+@admin.register(ChaveIdempotencia)
+class ChaveIdempotenciaAdmin(admin.ModelAdmin):
+    list_display = ("chave", "status_code", "criada_em", "expira_em")
+    search_fields = ("chave",)
+    readonly_fields = ("chave", "impressao", "status_code", "resposta", "criada_em", "expira_em")
+
+
+## Admin de ImpactoEconomico removido.
+
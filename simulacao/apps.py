@@ -7,3 +7,6 @@ class SimulacaoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'simulacao'
     verbose_name = 'Simulação'
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
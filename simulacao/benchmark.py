@@ -0,0 +1,213 @@
+"""Casos de benchmark do serviço de simulação e da API (comando ``benchmark``).
+
+Cada caso mede o tempo por operação (mediana e p95, em microssegundos) de uma
+chamada repetida até ``repeticoes`` vezes ou ``tempo_max`` segundos; os casos
+da API medem também as consultas ao banco por requisição. ``comparar`` confere
+o resultado com uma baseline gravada: um caso regrediu se a mediana passou da
+baseline em mais que ``limite`` (fração) ou se fez mais consultas.
+
+Os casos de API e formulário usam o banco configurado; ``banco_de_teste``
+cria um banco descartável para eles (também usado por ``benchmark_asgi``).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import platform
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .forms import SimulacaoForm
+from .models import Cidade
+from .services import calcular_impacto_economico, calcular_impacto_lote
+
+TAMANHOS_CIDADES = (1, 10, 1_000, 10_000)
+LINHAS_LOTE = 100_000
+LIMITE_REGRESSAO = 0.25
+
+BASE = {'numero_turistas': 1200, 'gasto_medio': 310.5, 'duracao_estadia': 12, 'cenario': 'otimista'}
+
+
+@contextmanager
+def banco_de_teste() -> Iterator[Cidade]:
+    """Cria um banco de teste descartável com uma cidade e o destrói na saída.
+
+    No SQLite o banco fica num arquivo temporário: o banco em memória (cache
+    compartilhado) trava tabelas entre threads e não mede o custo real de
+    gravação. ``testserver`` entra em ALLOWED_HOSTS enquanto isso.
+    """
+    nome_original = connection.settings_dict["NAME"]
+    tmp = None
+    if connection.vendor == "sqlite":
+        tmp = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False)
+        tmp.close()
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = tmp.name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    hosts_originais = settings.ALLOWED_HOSTS
+    settings.ALLOWED_HOSTS = [*hosts_originais, "testserver"]
+    try:
+        yield Cidade.objects.create(nome="Benchmark", populacao=1, pib_per_capita=1)
+    finally:
+        settings.ALLOWED_HOSTS = hosts_originais
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+        if tmp is not None and os.path.exists(tmp.name):
+            os.unlink(tmp.name)
+
+
+def medir(funcao: Callable[[int], Any], repeticoes: int = 200, tempo_max: float = 2.0, aquecimento: int = 2) -> Dict[str, Any]:
+    """Executa ``funcao(i)`` repetidamente e resume os tempos por chamada."""
+    for i in range(aquecimento):
+        funcao(-1 - i)
+    tempos: List[float] = []
+    limite = time.perf_counter() + tempo_max
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+        if time.perf_counter() > limite:
+            break
+    tempos.sort()
+    mediana = statistics.median(tempos)
+    return {
+        'execucoes': len(tempos),
+        'mediana_us': round(mediana * 1e6, 2),
+        'p95_us': round(tempos[math.ceil(0.95 * len(tempos)) - 1] * 1e6, 2),
+        'por_segundo': round(1 / mediana, 1) if mediana else None,
+    }
+
+
+def casos_servico(repeticoes: int, tempo_max: float) -> Dict[str, Dict[str, Any]]:
+    casos = {}
+    for n in TAMANHOS_CIDADES:
+        nomes = [f'Cidade {i}' for i in range(n)]
+        casos[f'calcular_lista_{n}'] = medir(
+            lambda _, nomes=nomes: calcular_impacto_economico({**BASE, 'cidades_visitadas': nomes}), repeticoes, tempo_max,
+        )
+    casos['calcular_inteiro_1000000'] = medir(
+        lambda _: calcular_impacto_economico({**BASE, 'cidades_visitadas': 1_000_000}), repeticoes, tempo_max,
+    )
+    casos['calcular_expandido_10000'] = medir(
+        lambda _: calcular_impacto_economico({**BASE, 'cidades_visitadas': 10_000}, expandir=True), repeticoes, tempo_max,
+    )
+    rng = np.random.default_rng(0)
+    turistas = rng.integers(1, 10_000, LINHAS_LOTE)
+    gasto = rng.uniform(0, 1000, LINHAS_LOTE)
+    duracao = rng.integers(1, 30, LINHAS_LOTE)
+    casos[f'lote_vetorizado_{LINHAS_LOTE}'] = medir(
+        lambda _: calcular_impacto_lote(turistas, gasto, duracao, 3, 1.0), max(1, repeticoes // 10), tempo_max,
+    )
+    return casos
+
+
+def casos_formulario(cidade_id: int, repeticoes: int, tempo_max: float) -> Dict[str, Dict[str, Any]]:
+    dados = {
+        'cidade_principal': str(cidade_id), 'numero_turistas': '1200', 'gasto_medio': '310.50',
+        'duracao_estadia': '12', 'cidades_visitadas': ', '.join(f'Cidade {i}' for i in range(50)), 'cenario': 'otimista',
+    }
+
+    def validar(_):
+        form = SimulacaoForm(dados)
+        if not form.is_valid():
+            raise AssertionError(form.errors.as_json())
+        form.build_parametros()
+
+    return {'formulario_validacao': medir(validar, repeticoes, tempo_max)}
+
+
+def _medir_requisicoes(requisitar: Callable[[int], Any], repeticoes: int, tempo_max: float) -> Dict[str, Any]:
+    consultas: List[int] = []
+
+    def chamar(i):
+        with CaptureQueriesContext(connection) as capturadas:
+            resposta = requisitar(i)
+        if resposta.status_code >= 400:
+            raise AssertionError(f"status {resposta.status_code}: {resposta.content[:200]!r}")
+        if i >= 0:
+            consultas.append(len(capturadas))
+
+    medida = medir(chamar, repeticoes, tempo_max)
+    medida['consultas'] = max(consultas) if consultas else 0
+    return medida
+
+
+def casos_api(cidade_id: int, repeticoes: int, tempo_max: float) -> Dict[str, Dict[str, Any]]:
+    cliente = Client()
+    criadas: List[int] = []
+
+    def simular(i):
+        # Parâmetros distintos por chamada: mede cálculo + gravação, não o cache
+        payload = {'cidade_id': cidade_id, **BASE, 'numero_turistas': 10_000_000 + i, 'cidades_visitadas': 3}
+        resposta = cliente.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+        if resposta.status_code == 201:
+            criadas.append(resposta.json()['simulacao_id'])
+        return resposta
+
+    def simular_repetida(_):
+        payload = {'cidade_id': cidade_id, **BASE, 'cidades_visitadas': 3}
+        return cliente.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+
+    casos = {
+        'api_simular_nova': _medir_requisicoes(simular, repeticoes, tempo_max),
+        'api_simular_reutilizada': _medir_requisicoes(simular_repetida, repeticoes, tempo_max),
+    }
+    casos['api_resultado'] = _medir_requisicoes(
+        lambda i: cliente.get(reverse('api_resultado', args=[criadas[i % len(criadas)]])), repeticoes, tempo_max,
+    )
+    return casos
+
+
+def ambiente() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'banco': connection.vendor,
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+    }
+
+
+def comparar(baseline: Dict[str, Any], atual: Dict[str, Any], limite: float = LIMITE_REGRESSAO) -> List[Dict[str, Any]]:
+    """Uma entrada por caso presente nos dois resultados, com ``regrediu``."""
+    comparacoes = []
+    for nome, medida in atual['casos'].items():
+        referencia = baseline.get('casos', {}).get(nome)
+        if referencia is None:
+            continue
+        razao = medida['mediana_us'] / referencia['mediana_us'] if referencia['mediana_us'] else 1.0
+        mais_consultas = medida.get('consultas', 0) > referencia.get('consultas', medida.get('consultas', 0))
+        comparacoes.append({
+            'caso': nome,
+            'baseline_us': referencia['mediana_us'],
+            'atual_us': medida['mediana_us'],
+            'razao': round(razao, 3),
+            'consultas': medida.get('consultas'),
+            'baseline_consultas': referencia.get('consultas'),
+            'regrediu': razao > 1 + limite or mais_consultas,
+        })
+    return comparacoes
+
+
+def executar(cidade_id: Optional[int], repeticoes: int = 200, tempo_max: float = 2.0, grupos=('servico', 'formulario', 'api')) -> Dict[str, Any]:
+    """Roda os grupos de casos pedidos; ``cidade_id`` é exigido por formulario e api."""
+    casos: Dict[str, Dict[str, Any]] = {}
+    if 'servico' in grupos:
+        casos.update(casos_servico(repeticoes, tempo_max))
+    if 'formulario' in grupos:
+        casos.update(casos_formulario(cidade_id, repeticoes, tempo_max))
+    if 'api' in grupos:
+        casos.update(casos_api(cidade_id, repeticoes, tempo_max))
+    return {'ambiente': ambiente(), 'parametros': {'repeticoes': repeticoes, 'tempo_max': tempo_max}, 'casos': casos}
@@ -0,0 +1,199 @@
+"""Hash canônico de parâmetros e cache de resultados de simulação.
+
+O hash identifica simulações equivalentes (mesma cidade e mesmos parâmetros
+após normalização) e é gravado em ``Simulacao.parametros_hash``. Um resultado
+só é reaproveitado se foi calculado com a mesma versão de coeficientes, por
+isso as entradas do cache são indexadas por hash e versão. O cache em
+processo (LRU com TTL) evita consultar o banco para parâmetros repetidos; se
+``SIMULACAO_CACHE_ALIAS`` apontar para um cache do Django, ele é usado como
+segundo nível compartilhado entre processos.
+
+``SIMULACAO_RESULTADO_CACHE_ALIAS`` (opcional) guarda os bytes já serializados
+das respostas de ``api_resultado`` com o ETag, por id de simulação.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _decimal_canonico(valor: Any) -> str:
+    numero = Decimal(str(valor)).normalize()
+    # normalize() pode gerar notação científica (ex.: 1E+2)
+    return format(numero, 'f')
+
+
+def parametros_canonicos(cidade_id: Any, parametros: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Forma normalizada dos parâmetros, ou None se não for possível normalizar.
+
+    Cenário em minúsculas, listas de cidades em casefold e ordenadas, números
+    decimais sem zeros à direita. Chaves opcionais ausentes não entram na forma
+    canônica, para que novos parâmetros não alterem hashes já gravados.
+    """
+    try:
+        canonico = {
+            'cidade_id': int(cidade_id),
+            'numero_turistas': int(parametros['numero_turistas']),
+            'gasto_medio': _decimal_canonico(parametros['gasto_medio']),
+            'duracao_estadia': int(parametros['duracao_estadia']),
+            'cenario': str(parametros.get('cenario', 'realista')).strip().lower(),
+        }
+        cidades = parametros['cidades_visitadas']
+        if isinstance(cidades, int):
+            canonico['cidades_visitadas'] = cidades
+        elif isinstance(cidades, (list, tuple)):
+            canonico['cidades_visitadas'] = sorted(str(c).strip().casefold() for c in cidades if str(c).strip())
+        else:
+            return None
+        if parametros.get('multiplicador') is not None:
+            canonico['multiplicador'] = _decimal_canonico(parametros['multiplicador'])
+        ponderacao = str(parametros.get('ponderacao') or 'uniforme').strip().lower()
+        if ponderacao != 'uniforme':
+            pesos = parametros.get('pesos')
+            if isinstance(pesos, dict):
+                pesos = sorted([str(k).strip().casefold(), _decimal_canonico(v)] for k, v in pesos.items())
+            elif isinstance(pesos, (list, tuple)):
+                # Lista segue a ordem de cidades_visitadas, que não é ordenada acima
+                pesos = [[str(c).strip().casefold(), _decimal_canonico(v)] for c, v in zip(cidades, pesos)]
+                pesos.sort()
+            else:
+                return None
+            canonico['ponderacao'] = ponderacao
+            canonico['pesos'] = pesos
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return None
+    return canonico
+
+
+def hash_parametros(cidade_id: Any, parametros: Dict[str, Any]) -> Optional[str]:
+    """SHA-256 da forma canônica dos parâmetros (None se inválidos)."""
+    canonico = parametros_canonicos(cidade_id, parametros)
+    if canonico is None:
+        return None
+    serializado = json.dumps(canonico, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+class CacheResultados:
+    """LRU com TTL, seguro para threads, de hash -> {simulacao_id, resultado}."""
+
+    def __init__(self, tamanho_max: int = 1024, ttl: float = 300.0):
+        self.tamanho_max = tamanho_max
+        self.ttl = ttl
+        self._dados: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave: str) -> Any:
+        agora = time.monotonic()
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < agora:
+                del self._dados[chave]
+                return None
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave: str, valor: Any) -> None:
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_max:
+                self._dados.popitem(last=False)
+
+    def discard(self, chave: str) -> None:
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+
+cache_local = CacheResultados(
+    tamanho_max=getattr(settings, 'SIMULACAO_CACHE_MAX', 1024),
+    ttl=getattr(settings, 'SIMULACAO_CACHE_TTL', 300),
+)
+
+
+def _cache_compartilhado():
+    alias = getattr(settings, 'SIMULACAO_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _chave_cache(chave: str, versao: Optional[int]) -> str:
+    return chave if versao is None else f'{chave}:v{versao}'
+
+
+def obter_resultado(chave: str, versao: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Busca ``{simulacao_id, resultado}`` no cache local e depois no compartilhado."""
+    chave = _chave_cache(chave, versao)
+    valor = cache_local.get(chave)
+    if valor is None:
+        compartilhado = _cache_compartilhado()
+        if compartilhado is not None:
+            valor = compartilhado.get(f'simulacao:{chave}')
+            if valor is not None:
+                cache_local.set(chave, valor)
+    return valor
+
+
+def guardar_resultado(chave: str, simulacao_id: int, resultado: Dict[str, Any], versao: Optional[int] = None) -> None:
+    """Guarda sob ``versao`` (padrão: a versão de coeficientes registrada no resultado)."""
+    chave = _chave_cache(chave, versao if versao is not None else resultado.get('versao_coeficientes'))
+    valor = {'simulacao_id': simulacao_id, 'resultado': resultado}
+    cache_local.set(chave, valor)
+    compartilhado = _cache_compartilhado()
+    if compartilhado is not None:
+        compartilhado.set(f'simulacao:{chave}', valor, timeout=getattr(settings, 'SIMULACAO_CACHE_TTL', 300))
+
+
+def descartar_resultado(chave: str, versao: Optional[int] = None) -> None:
+    chave = _chave_cache(chave, versao)
+    cache_local.discard(chave)
+    compartilhado = _cache_compartilhado()
+    if compartilhado is not None:
+        compartilhado.delete(f'simulacao:{chave}')
+
+
+# --- Respostas serializadas de api_resultado ---
+
+def _cache_respostas():
+    alias = getattr(settings, 'SIMULACAO_RESULTADO_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _chave_resposta(simulacao_id: int, expandir: bool) -> str:
+    return f'simulacao:resposta:{simulacao_id}:{int(expandir)}'
+
+
+def obter_resposta(simulacao_id: int, expandir: bool) -> Optional[tuple[str, bytes, str]]:
+    """``(etag, corpo, cenario)`` guardados para o resultado, se ``SIMULACAO_RESULTADO_CACHE_ALIAS`` estiver definido."""
+    respostas = _cache_respostas()
+    return respostas.get(_chave_resposta(simulacao_id, expandir)) if respostas is not None else None
+
+
+def guardar_resposta(simulacao_id: int, expandir: bool, etag: str, corpo: bytes, cenario: str) -> None:
+    respostas = _cache_respostas()
+    if respostas is not None:
+        respostas.set(
+            _chave_resposta(simulacao_id, expandir), (etag, corpo, cenario),
+            timeout=getattr(settings, 'SIMULACAO_RESULTADO_CACHE_TTL', 3600),
+        )
+
+
+def descartar_respostas(*simulacao_ids: int) -> None:
+    respostas = _cache_respostas()
+    if respostas is not None and simulacao_ids:
+        respostas.delete_many([_chave_resposta(i, expandir) for i in simulacao_ids for expandir in (False, True)])
@@ -0,0 +1,159 @@
+"""Catálogo de cidades em memória do processo.
+
+Carrega id/nome/estado/populacao/pib_per_capita de todas as cidades em uma
+consulta e resolve buscas por id ou nome (sem acento, case-insensitive) como
+consulta a dicionário. É invalidado pelos sinais de save/delete de ``Cidade``
+no próprio processo; como outros processos não recebem esses sinais, o
+catálogo também expira após ``SIMULACAO_CATALOGO_TTL`` segundos e, em caso de
+falta, confirma no banco pela chave indexada antes de responder "não existe".
+``resolver_varios`` faz essa confirmação uma única vez para um lote inteiro.
+
+Operações em massa (``bulk_create``/``update``) não disparam sinais: chame
+``invalidar()`` depois delas.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Cidade, normalizar_nome
+
+
+@dataclass(frozen=True)
+class CidadeInfo:
+    id: int
+    nome: str
+    estado: str
+    populacao: int
+    pib_per_capita: Decimal
+
+    def __str__(self) -> str:
+        return self.nome
+
+
+class _Catalogo:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carregado_em: Optional[float] = None
+        self._por_id: Dict[int, CidadeInfo] = {}
+        self._por_nome: Dict[str, CidadeInfo] = {}
+        self._por_chave: Dict[str, CidadeInfo] = {}
+        self._ordenadas: List[CidadeInfo] = []
+        # Incrementada a cada recarga: chave para caches derivados do catálogo
+        self.versao = 0
+
+    def _expirado(self) -> bool:
+        if self._carregado_em is None:
+            return True
+        return time.monotonic() - self._carregado_em > getattr(settings, 'SIMULACAO_CATALOGO_TTL', 300)
+
+    def _garantir(self) -> None:
+        if not self._expirado():
+            return
+        with self._lock:
+            if not self._expirado():
+                return
+            linhas = Cidade.objects.order_by('nome').values_list(
+                'id', 'nome', 'nome_normalizado', 'estado', 'populacao', 'pib_per_capita'
+            )
+            por_id, por_nome, por_chave, ordenadas = {}, {}, {}, []
+            for id_, nome, chave, estado, populacao, pib in linhas:
+                info = CidadeInfo(id_, nome, estado, populacao, pib)
+                ordenadas.append(info)
+                por_id[id_] = info
+                por_nome.setdefault(nome.casefold(), info)
+                por_chave.setdefault(chave or normalizar_nome(nome), info)
+            self._por_id, self._por_nome, self._por_chave, self._ordenadas = por_id, por_nome, por_chave, ordenadas
+            self.versao += 1
+            self._carregado_em = time.monotonic()
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._carregado_em = None
+
+    def versao_atual(self) -> int:
+        """Versão do catálogo carregado (recarrega antes se expirado)."""
+        self._garantir()
+        return self.versao
+
+    def todas(self) -> List[CidadeInfo]:
+        self._garantir()
+        return self._ordenadas
+
+    def por_id(self, cidade_id: Any) -> Optional[CidadeInfo]:
+        try:
+            cidade_id = int(cidade_id)
+        except (TypeError, ValueError):
+            return None
+        self._garantir()
+        info = self._por_id.get(cidade_id)
+        if info is None and Cidade.objects.filter(id=cidade_id).exists():
+            # Criada por outro processo depois da carga
+            self.invalidar()
+            self._garantir()
+            info = self._por_id.get(cidade_id)
+        return info
+
+    def _buscar_nome(self, nome: str) -> Optional[CidadeInfo]:
+        # Preferência para o nome exato (casefold); depois sem acentos
+        return self._por_nome.get(nome.strip().casefold()) or self._por_chave.get(normalizar_nome(nome))
+
+    def por_nome(self, nome: Any) -> Optional[CidadeInfo]:
+        if not isinstance(nome, str) or not nome.strip():
+            return None
+        self._garantir()
+        info = self._buscar_nome(nome)
+        if info is None and Cidade.objects.filter(nome_normalizado=normalizar_nome(nome)).exists():
+            self.invalidar()
+            self._garantir()
+            info = self._por_chave.get(normalizar_nome(nome))
+        return info
+
+    def resolver_varios(self, ids: Iterable[Any], nomes: Iterable[Any]) -> Tuple[Dict[int, CidadeInfo], Dict[str, CidadeInfo]]:
+        """Resolve vários ids e nomes com no máximo uma consulta ao banco.
+
+        Devolve ``{id: info}`` e ``{nome sem espaços nas pontas: info}`` só com
+        os encontrados. As faltas são confirmadas juntas, numa consulta; se
+        alguma existir no banco o catálogo é recarregado uma vez.
+        """
+        validos_id = set()
+        for cidade_id in ids:
+            try:
+                validos_id.add(int(cidade_id))
+            except (TypeError, ValueError):
+                continue
+        validos_nome = {nome.strip() for nome in nomes if isinstance(nome, str) and nome.strip()}
+        self._garantir()
+
+        def buscar():
+            por_id = {i: self._por_id[i] for i in validos_id if i in self._por_id}
+            por_nome = {n: info for n in validos_nome if (info := self._buscar_nome(n)) is not None}
+            return por_id, por_nome
+
+        por_id, por_nome = buscar()
+        faltam_id = validos_id - por_id.keys()
+        faltam_nome = {normalizar_nome(n) for n in validos_nome - por_nome.keys()}
+        if faltam_id or faltam_nome:
+            # Criadas por outro processo depois da carga?
+            if Cidade.objects.filter(Q(id__in=faltam_id) | Q(nome_normalizado__in=faltam_nome)).exists():
+                self.invalidar()
+                self._garantir()
+                por_id, por_nome = buscar()
+        return por_id, por_nome
+
+
+catalogo = _Catalogo()
+
+todas = catalogo.todas
+por_id = catalogo.por_id
+por_nome = catalogo.por_nome
+resolver_varios = catalogo.resolver_varios
+invalidar = catalogo.invalidar
+versao = catalogo.versao_atual
@@ -0,0 +1,81 @@
+"""Coalescência de cálculos idênticos em andamento ("single-flight").
+
+Quando várias requisições com o mesmo hash de parâmetros chegam juntas, só a
+primeira executa o cálculo (e grava a simulação); as outras esperam por ela e
+recebem o mesmo valor, em vez de calcular em paralelo e gravar duplicatas.
+Vale dentro de um processo: entre threads (``executar``) e entre corrotinas
+do mesmo event loop (``aexecutar``). Entre processos a deduplicação continua
+sendo a do hash gravado.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from django.conf import settings
+
+
+class _Voo:
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.valor: Any = None
+        self.erro: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voos: Dict[str, _Voo] = {}
+        self._tarefas: Dict[str, asyncio.Future] = {}
+
+    def executar(self, chave: str, funcao: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Executa ``funcao`` uma vez por ``chave`` em andamento.
+
+        Retorna ``(valor, compartilhado)``; ``compartilhado`` é True para quem
+        esperou o cálculo de outra thread. Exceções da execução são relançadas
+        para todos. Se a espera passar de ``SIMULACAO_COALESCER_ESPERA``
+        segundos, a thread desiste e executa ``funcao`` ela mesma.
+        """
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+        if not lider:
+            if voo.concluido.wait(getattr(settings, 'SIMULACAO_COALESCER_ESPERA', 30)):
+                if voo.erro is not None:
+                    raise voo.erro
+                return voo.valor, True
+            return funcao(), False
+        try:
+            voo.valor = funcao()
+            return voo.valor, False
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._voos[chave]
+            voo.concluido.set()
+
+    async def aexecutar(self, chave: str, fabrica: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Versão para corrotinas: uma tarefa por ``chave`` em andamento.
+
+        A tarefa é protegida com ``shield``: se o cliente que a iniciou
+        desconectar, as demais continuam esperando o mesmo resultado.
+        """
+        tarefa = self._tarefas.get(chave)
+        compartilhado = tarefa is not None
+        if not compartilhado:
+            tarefa = self._tarefas[chave] = asyncio.ensure_future(fabrica())
+            tarefa.add_done_callback(lambda _: self._tarefas.pop(chave, None))
+        return await asyncio.shield(tarefa), compartilhado
+
+    def em_andamento(self) -> int:
+        with self._lock:
+            return len(self._voos) + len(self._tarefas)
+
+
+voos = SingleFlight()
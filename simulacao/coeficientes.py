@@ -0,0 +1,85 @@
+"""Registro de cenários e coeficientes em memória do processo.
+
+A versão ativa de ``VersaoCoeficientes`` (com seus cenários) é convertida num
+``services.Coeficientes`` imutável e servida da memória: o cálculo nunca
+consulta o banco por chamada. Save/delete no próprio processo invalidam o
+cache pelos sinais; outros processos revalidam a cada
+``SIMULACAO_COEFICIENTES_TTL`` segundos com uma consulta pela marca da versão
+ativa (id + atualizada_em) e só recarregam os cenários se ela mudou.
+
+Sem nenhuma versão ativa no banco vale ``services.COEFICIENTES_PADRAO``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from .models import CenarioCoeficiente, VersaoCoeficientes
+from .services import COEFICIENTES_PADRAO, Coeficientes
+
+
+def _carregar(versao: VersaoCoeficientes) -> Coeficientes:
+    cenarios = list(CenarioCoeficiente.objects.filter(versao=versao).values_list('nome', 'multiplicador', 'crescimento_anual'))
+    tabelas = {}
+    if cenarios:  # versão sem cenários cadastrados herda a tabela padrão
+        tabelas = {
+            'cenarios': {nome: float(multiplicador) for nome, multiplicador, _ in cenarios},
+            'crescimento': {nome: float(crescimento) for nome, _, crescimento in cenarios},
+        }
+    return Coeficientes(
+        ajuste_por_cidade=float(versao.ajuste_por_cidade),
+        ajuste_cidades_max=float(versao.ajuste_cidades_max),
+        dias_sem_desconto=versao.dias_sem_desconto,
+        desconto_por_dia=float(versao.desconto_por_dia),
+        desconto_max=float(versao.desconto_max),
+        versao=versao.id,
+        **tabelas,
+    )
+
+
+def da_versao(versao_id: int) -> Coeficientes:
+    """Coeficientes de uma versão específica, ativa ou não (sempre consulta o banco)."""
+    return _carregar(VersaoCoeficientes.objects.get(id=versao_id))
+
+
+class _Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._verificado_em: Optional[float] = None
+        self._marca: Optional[Tuple] = None
+        self._atual: Coeficientes = COEFICIENTES_PADRAO
+
+    def _expirado(self) -> bool:
+        if self._verificado_em is None:
+            return True
+        return time.monotonic() - self._verificado_em > getattr(settings, 'SIMULACAO_COEFICIENTES_TTL', 30)
+
+    def atual(self) -> Coeficientes:
+        """Coeficientes da versão ativa (revalida no banco só quando expirado)."""
+        if not self._expirado():
+            return self._atual
+        with self._lock:
+            if not self._expirado():
+                return self._atual
+            versao = VersaoCoeficientes.objects.filter(ativa=True).first()
+            marca = (versao.id, versao.atualizada_em) if versao is not None else None
+            if marca != self._marca:
+                self._atual = _carregar(versao) if versao is not None else COEFICIENTES_PADRAO
+                self._marca = marca
+            self._verificado_em = time.monotonic()
+            return self._atual
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._verificado_em = None
+            self._marca = None
+
+
+registro = _Registro()
+
+atual = registro.atual
+invalidar = registro.invalidar
@@ -0,0 +1,114 @@
+"""Comparação de um mesmo pacote turístico entre todas as cidades do catálogo.
+
+O impacto_total depende só dos parâmetros, não da cidade; o que muda entre
+municípios é o peso desse impacto na economia local. A comparação calcula o
+impacto uma vez e, numa única passada vetorizada sobre os arrays do catálogo
+(população e PIB per capita), obtém impacto per capita e participação no PIB
+municipal de cada cidade, ordenando pelo critério pedido.
+
+Os arrays são montados a partir do catálogo em memória e reaproveitados
+enquanto a versão do catálogo não muda.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from . import catalogo
+from .models import normalizar_nome
+from .services import Coeficientes, ParametrosInvalidos, calcular_impacto_economico
+
+# critério -> coluna usada no ranking (decrescente)
+CRITERIOS = ('participacao_pib', 'impacto_per_capita')
+
+ESTADOS = {
+    'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas', 'BA': 'Bahia', 'CE': 'Ceará',
+    'DF': 'Distrito Federal', 'ES': 'Espírito Santo', 'GO': 'Goiás', 'MA': 'Maranhão', 'MT': 'Mato Grosso',
+    'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais', 'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná',
+    'PE': 'Pernambuco', 'PI': 'Piauí', 'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte',
+    'RS': 'Rio Grande do Sul', 'RO': 'Rondônia', 'RR': 'Roraima', 'SC': 'Santa Catarina', 'SP': 'São Paulo',
+    'SE': 'Sergipe', 'TO': 'Tocantins',
+}
+
+
+def _chaves_estado(estado: str) -> set:
+    """Formas aceitas de um estado (sigla e nome, normalizados): 'PA' casa com 'Pará'."""
+    chave = normalizar_nome(estado)
+    for sigla, nome in ESTADOS.items():
+        if chave in (sigla.casefold(), normalizar_nome(nome)):
+            return {sigla.casefold(), normalizar_nome(nome)}
+    return {chave}
+
+
+@lru_cache(maxsize=2)
+def _arrays_catalogo(versao: int) -> Dict[str, np.ndarray]:
+    cidades = catalogo.todas()
+    return {
+        'ids': np.fromiter((c.id for c in cidades), dtype=np.int64, count=len(cidades)),
+        'nomes': np.asarray([c.nome for c in cidades], dtype=object),
+        'estados': np.asarray([c.estado for c in cidades], dtype=object),
+        'chaves_estado': np.asarray([normalizar_nome(c.estado) for c in cidades], dtype=object),
+        'populacao': np.fromiter((c.populacao for c in cidades), dtype=np.float64, count=len(cidades)),
+        'pib_per_capita': np.fromiter((float(c.pib_per_capita) for c in cidades), dtype=np.float64, count=len(cidades)),
+    }
+
+
+def comparar(parametros: Dict[str, Any], estado: str = '', criterio: str = 'participacao_pib',
+             limite: Optional[int] = None, coeficientes: Optional[Coeficientes] = None) -> Dict[str, Any]:
+    """Aplica ``parametros`` a todas as cidades (ou às de ``estado``) e ranqueia.
+
+    Retorna ``{impacto_total, criterio, estado, n_cidades, ranking: [...]}``;
+    ``limite`` corta o ranking (``n_cidades`` continua sendo o total comparado).
+    Lança ParametrosInvalidos para parâmetros ou critério inválidos.
+    """
+    if criterio not in CRITERIOS:
+        raise ParametrosInvalidos(f"criterio inválido (use {'|'.join(CRITERIOS)})")
+    resultado = calcular_impacto_economico(parametros, coeficientes=coeficientes)
+    impacto = resultado['impacto_total']
+
+    arrays = _arrays_catalogo(catalogo.versao())
+    selecao = np.ones(arrays['ids'].size, dtype=bool)
+    if estado:
+        selecao = np.isin(arrays['chaves_estado'], list(_chaves_estado(estado)))
+    populacao = arrays['populacao'][selecao]
+    pib_municipal = populacao * arrays['pib_per_capita'][selecao]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_capita = np.where(populacao > 0, impacto / populacao, np.nan)
+        participacao = np.where(pib_municipal > 0, 100.0 * impacto / pib_municipal, np.nan)
+    chave = participacao if criterio == 'participacao_pib' else per_capita
+    # Decrescente e estável; cidades sem dado (NaN) vão para o fim
+    ordem = np.argsort(np.where(np.isnan(chave), np.inf, -chave), kind='stable')
+    if limite is not None:
+        ordem = ordem[:limite]
+
+    ids = arrays['ids'][selecao][ordem]
+    nomes = arrays['nomes'][selecao][ordem]
+    estados = arrays['estados'][selecao][ordem]
+    ranking: List[Dict[str, Any]] = []
+    for posicao, (i, cidade_id, nome, uf) in enumerate(zip(ordem.tolist(), ids.tolist(), nomes, estados), start=1):
+        ranking.append({
+            'posicao': posicao,
+            'cidade_id': cidade_id,
+            'cidade': nome,
+            'estado': uf,
+            'populacao': int(populacao[i]),
+            'pib_municipal': round(float(pib_municipal[i]), 2),
+            'impacto_per_capita': None if np.isnan(per_capita[i]) else round(float(per_capita[i]), 2),
+            'participacao_pib': None if np.isnan(participacao[i]) else round(float(participacao[i]), 6),
+        })
+    comparacao = {
+        'impacto_total': impacto,
+        'cenario': resultado['cenario'],
+        'multiplicador': resultado['multiplicador'],
+        'criterio': criterio,
+        'estado': estado,
+        'n_cidades': int(selecao.sum()),
+        'ranking': ranking,
+    }
+    if 'versao_coeficientes' in resultado:
+        comparacao['versao_coeficientes'] = resultado['versao_coeficientes']
+    return comparacao
@@ -0,0 +1,111 @@
+"""Agregados de impacto por cidade × cenário × dia (``EstatisticaDiaria``).
+
+Cada relatório persistido soma 1 à quantidade e seus impacto_total e
+gasto_total às somas da linha correspondente, dentro da mesma transação que
+o grava; os painéis leem só essa tabela. O incremento é um ``UPDATE ... SET
+x = x + n`` no banco, seguro com vários processos gravando ao mesmo tempo.
+
+Remoções de simulações/relatórios não são descontadas: rode
+``reconstruir_estatisticas`` depois de limpezas em massa.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import EstatisticaDiaria, Relatorio
+
+
+def _somar(cidade_id: int, cenario: str, dia, quantidade: int, impacto: Decimal, gasto: Decimal) -> None:
+    linha = EstatisticaDiaria.objects.filter(cidade_id=cidade_id, cenario=cenario, dia=dia)
+    incremento = {
+        "quantidade": F("quantidade") + quantidade,
+        "soma_impacto": F("soma_impacto") + impacto,
+        "soma_gasto": F("soma_gasto") + gasto,
+    }
+    if linha.update(**incremento):
+        return
+    try:
+        with transaction.atomic():
+            EstatisticaDiaria.objects.create(
+                cidade_id=cidade_id, cenario=cenario, dia=dia,
+                quantidade=quantidade, soma_impacto=impacto, soma_gasto=gasto,
+            )
+    except IntegrityError:
+        # Outra transação criou a linha entre o UPDATE e o INSERT
+        linha.update(**incremento)
+
+
+def _dia(data_criacao):
+    return timezone.localdate(data_criacao) if timezone.is_aware(data_criacao) else data_criacao.date()
+
+
+def _aplicar(grupos) -> None:
+    # Ordem fixa das linhas tocadas evita deadlock entre lotes concorrentes
+    for (cidade_id, cenario, dia), (quantidade, impacto, gasto) in sorted(grupos.items()):
+        _somar(cidade_id, cenario, dia, quantidade, impacto, gasto)
+
+
+def registrar(relatorios: Iterable[Relatorio]) -> None:
+    """Soma relatórios recém-criados aos agregados.
+
+    Espera ``relatorio.simulacao`` carregada (cidade_id, cenario e
+    data_criacao). Chame dentro da transação que grava os relatórios.
+    """
+    grupos = defaultdict(lambda: [0, Decimal("0"), Decimal("0")])
+    for relatorio in relatorios:
+        simulacao = relatorio.simulacao
+        grupo = grupos[(simulacao.cidade_id, simulacao.cenario, _dia(simulacao.data_criacao))]
+        grupo[0] += 1
+        grupo[1] += relatorio.impacto_total or 0
+        grupo[2] += relatorio.gasto_total or 0
+    _aplicar(grupos)
+
+
+def ajustar(diferencas: Iterable[Tuple[int, str, datetime, Decimal, Decimal]]) -> None:
+    """Aplica ``(cidade_id, cenario, data_criacao, delta_impacto, delta_gasto)`` de relatórios recalculados.
+
+    As quantidades não mudam. Chame dentro da transação que regrava os relatórios.
+    """
+    grupos = defaultdict(lambda: [0, Decimal("0"), Decimal("0")])
+    for cidade_id, cenario, data_criacao, delta_impacto, delta_gasto in diferencas:
+        grupo = grupos[(cidade_id, cenario, _dia(data_criacao))]
+        grupo[1] += delta_impacto
+        grupo[2] += delta_gasto
+    _aplicar({chave: grupo for chave, grupo in grupos.items() if grupo[1] or grupo[2]})
+
+
+def reconstruir() -> int:
+    """Recalcula todos os agregados a partir dos relatórios; retorna o nº de linhas."""
+    agregados = (
+        Relatorio.objects
+        .annotate(dia=TruncDate("simulacao__data_criacao"))
+        .values("simulacao__cidade_id", "simulacao__cenario", "dia")
+        .annotate(quantidade=Count("id"), soma_impacto=Sum("impacto_total"), soma_gasto=Sum("gasto_total"))
+        .order_by()
+    )
+    with transaction.atomic():
+        EstatisticaDiaria.objects.all().delete()
+        linhas = EstatisticaDiaria.objects.bulk_create(
+            (
+                EstatisticaDiaria(
+                    cidade_id=a["simulacao__cidade_id"],
+                    cenario=a["simulacao__cenario"],
+                    dia=a["dia"],
+                    quantidade=a["quantidade"],
+                    soma_impacto=a["soma_impacto"] or 0,
+                    soma_gasto=a["soma_gasto"] or 0,
+                )
+                for a in agregados.iterator()
+            ),
+            batch_size=1000,
+        )
+    return len(linhas)
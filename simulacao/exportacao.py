@@ -0,0 +1,176 @@
+"""Exportação em massa de simulações com seus relatórios.
+
+Uma única consulta (``Simulacao`` + ``Cidade`` + ``Relatorio`` via
+``select_related``) é percorrida com ``.iterator(chunk_size=...)``: as linhas
+são convertidas e escritas bloco a bloco, então a memória usada depende só do
+tamanho do bloco, não do total exportado. Simulações ainda sem relatório
+(pendentes ou com erro) saem com as colunas de resultado vazias.
+
+CSV e NDJSON são gerados como iteradores de texto (servem tanto ao
+``StreamingHttpResponse`` quanto a um arquivo). Parquet depende do
+``pyarrow``, que é opcional; sem ele ``escrever_parquet`` lança
+FormatoIndisponivel.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+from decimal import Decimal, InvalidOperation
+from typing import Any, BinaryIO, Dict, Iterator, List
+
+from django.db.models import QuerySet
+
+from .models import Simulacao
+
+TAMANHO_BLOCO = 2000
+
+COLUNAS = [
+    'simulacao_id', 'cidade_id', 'cidade', 'data_criacao', 'status', 'cenario',
+    'numero_turistas', 'gasto_medio', 'duracao_estadia', 'n_cidades',
+    'multiplicador', 'gasto_total', 'impacto_total',
+]
+# Com ``completo=True``: parâmetros e resultado originais (objetos no NDJSON, texto JSON no CSV)
+COLUNAS_COMPLETO = COLUNAS + ['parametros', 'resultado']
+
+
+class FormatoIndisponivel(RuntimeError):
+    """Formato de exportação cuja dependência opcional não está instalada."""
+
+
+def consulta(queryset: QuerySet | None = None, completo: bool = False) -> QuerySet:
+    """Simulações (já filtradas, se ``queryset`` for dado) na ordem de id, com o join pronto."""
+    queryset = Simulacao.objects.all() if queryset is None else queryset
+    queryset = queryset.select_related("cidade", "relatorio").order_by("id")
+    if not completo:
+        queryset = queryset.defer("relatorio__resultado")
+    return queryset
+
+
+def _numero(valor: Any) -> Any:
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+
+def _parametro_real(valor: Any) -> float | None:
+    """Parâmetro bruto (número ou texto como "150") como float; None se ausente ou inválido."""
+    if valor is None or isinstance(valor, bool):
+        return None
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if math.isfinite(numero) else None
+
+
+def _parametro_inteiro(valor: Any) -> int | None:
+    """Como ``_parametro_real``, mas só aceita valores inteiros ("100", 100.0)."""
+    if valor is None or isinstance(valor, bool):
+        return None
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        return None
+    if not numero.is_finite() or numero != numero.to_integral_value():
+        return None
+    return int(numero)
+
+
+def _linha(sim: Simulacao, completo: bool) -> Dict[str, Any]:
+    parametros = sim.parametros if isinstance(sim.parametros, dict) else {}
+    rel = getattr(sim, "relatorio", None)
+    linha = {
+        'simulacao_id': sim.id,
+        'cidade_id': sim.cidade_id,
+        'cidade': sim.cidade.nome,
+        'data_criacao': sim.data_criacao.isoformat(),
+        'status': sim.status,
+        'cenario': sim.cenario,
+        # Parâmetros brutos do payload: tipados aqui para casar com o esquema do Parquet
+        'numero_turistas': _parametro_inteiro(parametros.get('numero_turistas')),
+        'gasto_medio': _parametro_real(parametros.get('gasto_medio')),
+        'duracao_estadia': _parametro_inteiro(parametros.get('duracao_estadia')),
+        'n_cidades': rel.n_cidades if rel else None,
+        'multiplicador': _numero(rel.multiplicador) if rel else None,
+        'gasto_total': _numero(rel.gasto_total) if rel else None,
+        'impacto_total': _numero(rel.impacto_total) if rel else None,
+    }
+    if completo:
+        linha['parametros'] = sim.parametros
+        linha['resultado'] = rel.resultado if rel else None
+    return linha
+
+
+def _json_como_texto(linha: Dict[str, Any]) -> None:
+    for campo in ('parametros', 'resultado'):
+        if linha[campo] is not None:
+            linha[campo] = json.dumps(linha[campo], ensure_ascii=False)
+
+
+def iterar_blocos(queryset: QuerySet, completo: bool = False, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[List[Dict[str, Any]]]:
+    """Percorre a consulta uma vez, em listas de até ``tamanho_bloco`` linhas."""
+    bloco = []
+    for sim in queryset.iterator(chunk_size=tamanho_bloco):
+        bloco.append(_linha(sim, completo))
+        if len(bloco) >= tamanho_bloco:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def gerar_ndjson(queryset: QuerySet, completo: bool = False, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[str]:
+    """Um objeto JSON por linha, um bloco por vez."""
+    for bloco in iterar_blocos(queryset, completo, tamanho_bloco):
+        yield ''.join(json.dumps(linha, ensure_ascii=False) + '\n' for linha in bloco)
+
+
+def gerar_csv(queryset: QuerySet, completo: bool = False, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[str]:
+    """CSV com cabeçalho, um bloco por vez (vazio para valores ausentes)."""
+    colunas = COLUNAS_COMPLETO if completo else COLUNAS
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(colunas)
+    yield buffer.getvalue()
+    for bloco in iterar_blocos(queryset, completo, tamanho_bloco):
+        buffer.seek(0)
+        buffer.truncate()
+        for linha in bloco:
+            if completo:
+                _json_como_texto(linha)
+            escritor.writerow(['' if linha[c] is None else linha[c] for c in colunas])
+        yield buffer.getvalue()
+
+
+def escrever_parquet(queryset: QuerySet, destino: str | BinaryIO, completo: bool = False, tamanho_bloco: int = TAMANHO_BLOCO) -> int:
+    """Grava em Parquet, um row group por bloco; retorna o número de linhas.
+
+    ``parametros``/``resultado`` (com ``completo``) vão como texto JSON.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise FormatoIndisponivel("Exportação em Parquet requer o pacote pyarrow.")
+
+    campos = [
+        ('simulacao_id', pa.int64()), ('cidade_id', pa.int64()), ('cidade', pa.string()),
+        ('data_criacao', pa.string()), ('status', pa.string()), ('cenario', pa.string()),
+        ('numero_turistas', pa.int64()), ('gasto_medio', pa.float64()), ('duracao_estadia', pa.int64()),
+        ('n_cidades', pa.int64()), ('multiplicador', pa.float64()), ('gasto_total', pa.float64()),
+        ('impacto_total', pa.float64()),
+    ]
+    if completo:
+        campos += [('parametros', pa.string()), ('resultado', pa.string())]
+    esquema = pa.schema(campos)
+
+    total = 0
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloco in iterar_blocos(queryset, completo, tamanho_bloco):
+            if completo:
+                for linha in bloco:
+                    _json_como_texto(linha)
+            escritor.write_table(pa.Table.from_pylist(bloco, schema=esquema))
+            total += len(bloco)
+    return total
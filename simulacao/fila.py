@@ -0,0 +1,117 @@
+"""Fila de simulações assíncronas apoiada no banco.
+
+``api_simular`` com ``async=true`` grava a ``Simulacao`` como pendente e
+responde imediatamente; o comando ``processar_simulacoes`` consome a fila,
+calcula o resultado e grava o ``Relatorio``. A reivindicação de um item é um
+UPDATE condicional (status pendente -> processando), portanto vários workers
+(threads ou processos) podem consumir a mesma fila sem processar um item duas
+vezes, em qualquer banco suportado.
+
+O progresso vai de 0 (pendente) a ``PROGRESSO_REIVINDICADA`` (reivindicada) e
+então a 100 (concluída): o cálculo é um único passo de milissegundos, sem
+etapas intermediárias a relatar. Itens reivindicados por um worker que caiu são
+devolvidos à fila por ``reenfileirar_travadas``, chamada a cada ciclo do comando.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, coeficientes, estatisticas
+from .catalogo import CidadeInfo
+from .models import Relatorio, Simulacao
+from .services import ParametrosInvalidos, calcular_impacto_economico
+
+logger = logging.getLogger(__name__)
+
+PROGRESSO_REIVINDICADA = 10
+
+
+def enfileirar(cidade: CidadeInfo, parametros: dict, chave: str = "") -> Simulacao:
+    """Cria a simulação pendente, sem calcular."""
+    return Simulacao.objects.create(
+        cidade_id=cidade.id,
+        parametros=parametros,
+        parametros_hash=chave,
+        status=Simulacao.Status.PENDENTE,
+        progresso=0,
+    )
+
+
+def pendente_com_hash(chave: str | None) -> Optional[Simulacao]:
+    """Simulação idêntica ainda na fila (evita enfileirar o mesmo cálculo duas vezes)."""
+    if not chave:
+        return None
+    return (
+        Simulacao.objects.filter(
+            parametros_hash=chave,
+            status__in=[Simulacao.Status.PENDENTE, Simulacao.Status.PROCESSANDO],
+        ).order_by("id").first()
+    )
+
+
+def reivindicar(simulacao_id: int) -> bool:
+    """Marca a simulação como em processamento; False se outro worker a pegou antes."""
+    return bool(
+        Simulacao.objects.filter(id=simulacao_id, status=Simulacao.Status.PENDENTE).update(
+            status=Simulacao.Status.PROCESSANDO,
+            progresso=PROGRESSO_REIVINDICADA,
+            iniciado_em=timezone.now(),
+        )
+    )
+
+
+def processar(simulacao: Simulacao) -> bool:
+    """Calcula e grava o relatório de uma simulação já reivindicada (com os coeficientes vigentes)."""
+    try:
+        resultado = calcular_impacto_economico(simulacao.parametros, coeficientes=coeficientes.atual())
+    except ParametrosInvalidos as e:
+        _falhar(simulacao, str(e))
+        return False
+    except Exception as e:  # proteção genérica
+        logger.exception("Falha ao processar simulação %s", simulacao.id)
+        _falhar(simulacao, f"Falha ao calcular: {e}")
+        return False
+
+    with transaction.atomic():
+        estatisticas.registrar([Relatorio.objects.create(simulacao=simulacao, resultado=resultado)])
+        Simulacao.objects.filter(id=simulacao.id).update(status=Simulacao.Status.CONCLUIDA, progresso=100, erro="")
+    if simulacao.parametros_hash:
+        cache.guardar_resultado(simulacao.parametros_hash, simulacao.id, resultado)
+    return True
+
+
+def _falhar(simulacao: Simulacao, mensagem: str) -> None:
+    Simulacao.objects.filter(id=simulacao.id).update(status=Simulacao.Status.ERRO, progresso=100, erro=mensagem)
+
+
+def processar_pendentes(limite: int = 100) -> int:
+    """Processa até ``limite`` simulações pendentes, na ordem de criação.
+
+    Retorna quantas foram reivindicadas por este worker.
+    """
+    ids = list(
+        Simulacao.objects.filter(status=Simulacao.Status.PENDENTE)
+        .order_by("id").values_list("id", flat=True)[:limite]
+    )
+    processadas = 0
+    for simulacao_id in ids:
+        if not reivindicar(simulacao_id):
+            continue
+        processar(Simulacao.objects.get(id=simulacao_id))
+        processadas += 1
+    return processadas
+
+
+def reenfileirar_travadas(apos: timedelta) -> int:
+    """Devolve à fila simulações em processamento há mais de ``apos`` (worker morto)."""
+    return Simulacao.objects.filter(
+        status=Simulacao.Status.PROCESSANDO,
+        iniciado_em__lt=timezone.now() - apos,
+        relatorio__isnull=True,
+    ).update(status=Simulacao.Status.PENDENTE, progresso=0, iniciado_em=None)
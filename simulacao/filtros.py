@@ -0,0 +1,84 @@
+"""Filtros de simulações por query string (listagem e exportação)."""
+
+from __future__ import annotations
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Mapping
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import catalogo
+
+
+class FiltroInvalido(ValueError):
+    """Valor de filtro malformado (a mensagem vai para o cliente)."""
+
+
+def parse_data_filtro(valor: str, fim: bool = False) -> datetime:
+    """Converte ``desde``/``ate`` (data ou data-hora ISO) em datetime aware.
+
+    Para ``ate`` com apenas a data, retorna o início do dia seguinte (limite exclusivo).
+    """
+    data = parse_date(valor)
+    if data is not None:
+        data_hora = datetime.combine(data, time.min)
+        if fim:
+            data_hora += timedelta(days=1)
+    else:
+        data_hora = parse_datetime(valor)
+        if data_hora is None:
+            raise ValueError(valor)
+    if timezone.is_naive(data_hora):
+        data_hora = timezone.make_aware(data_hora)
+    return data_hora
+
+
+def _decimal_filtro(valor: str) -> Decimal:
+    """Limite de impacto finito ("nan" e "inf" são recusados como não numéricos)."""
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        numero = None
+    if numero is None or not numero.is_finite():
+        raise FiltroInvalido("impacto_min/impacto_max devem ser numéricos.")
+    return numero
+
+
+def filtrar_simulacoes(queryset: QuerySet, params: Mapping[str, str]) -> QuerySet:
+    """Aplica ``cidade``, ``desde``, ``ate``, ``cenario``, ``status``,
+    ``impacto_min`` e ``impacto_max`` (valores vazios são ignorados).
+
+    Lança FiltroInvalido para cidade inexistente, datas ou números inválidos.
+    """
+    cidade_param = params.get("cidade")
+    if cidade_param:
+        cidade_param = str(cidade_param)
+        cidade = catalogo.por_id(cidade_param) if cidade_param.isdigit() else catalogo.por_nome(cidade_param)
+        if cidade is None:
+            raise FiltroInvalido("Cidade não encontrada.")
+        queryset = queryset.filter(cidade_id=cidade.id)
+
+    try:
+        if params.get("desde"):
+            queryset = queryset.filter(data_criacao__gte=parse_data_filtro(params["desde"]))
+        if params.get("ate"):
+            ate = params["ate"]
+            filtro = "data_criacao__lte" if parse_date(ate) is None else "data_criacao__lt"
+            queryset = queryset.filter(**{filtro: parse_data_filtro(ate, fim=True)})
+    except ValueError:
+        raise FiltroInvalido("Data inválida (use AAAA-MM-DD ou data-hora ISO).")
+
+    if params.get("cenario"):
+        queryset = queryset.filter(cenario=params["cenario"].strip().lower())
+
+    if params.get("impacto_min"):
+        queryset = queryset.filter(relatorio__impacto_total__gte=_decimal_filtro(params["impacto_min"]))
+    if params.get("impacto_max"):
+        queryset = queryset.filter(relatorio__impacto_total__lte=_decimal_filtro(params["impacto_max"]))
+
+    if params.get("status"):
+        queryset = queryset.filter(status=params["status"])
+    return queryset
@@ -1,17 +1,50 @@
 from __future__ import annotations
 
 from django import forms
-from .models import Cidade
+
+from . import catalogo, coeficientes
+
+
+def _escolhas_cidades():
+    return [("", "---------")] + [(str(c.id), c.nome) for c in catalogo.todas()]
+
+
+def _escolhas_cenarios():
+    # Cenários da versão de coeficientes vigente (inclusive os criados pelo admin)
+    return [(nome, nome.replace('_', ' ').capitalize()) for nome in coeficientes.atual().cenarios]
+
+
+class CidadeCatalogoField(forms.ChoiceField):
+    """Escolha de cidade servida pelo catálogo em memória; ``clean`` devolve CidadeInfo."""
+
+    def __init__(self, **kwargs):
+        super().__init__(choices=_escolhas_cidades, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        cidade = catalogo.por_id(value)
+        if cidade is None:
+            raise forms.ValidationError(self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value})
+        return cidade
+
+    def validate(self, value):
+        if value is None and self.required:
+            raise forms.ValidationError(self.error_messages["required"], code="required")
 
 
 class SimulacaoForm(forms.Form):
-    cidade_principal = forms.ModelChoiceField(queryset=Cidade.objects.all(), required=True, label="Cidade principal")
+    cidade_principal = CidadeCatalogoField(required=True, label="Cidade principal")
     numero_turistas = forms.IntegerField(min_value=1, initial=100, label="Número de turistas")
     gasto_medio = forms.DecimalField(min_value=0, decimal_places=2, max_digits=12, initial=250, label="Gasto médio por dia (R$)")
     duracao_estadia = forms.IntegerField(min_value=1, initial=3, label="Duração (dias)")
     cidades_visitadas = forms.CharField(required=False, label="Outras cidades (separar por vírgula)", help_text="Ex: Belém, Santarém")
-    cenario = forms.ChoiceField(choices=[('conservador','Conservador'),('realista','Realista'),('otimista','Otimista')], initial='realista')
+    cenario = forms.ChoiceField(choices=_escolhas_cenarios, initial='realista')
     multiplicador = forms.DecimalField(required=False, min_value=0, decimal_places=4, max_digits=8, label="Multiplicador custom (opcional)", help_text="Deixe em branco para usar cenário")
+    ponderacao = forms.ChoiceField(
+        choices=[('uniforme', 'Uniforme'), ('populacao', 'Por população'), ('pib', 'Por PIB')], initial='uniforme', required=False,
+        label="Repartição entre cidades", help_text="População e PIB vêm do cadastro de cidades",
+    )
 
     def limpar_lista_cidades(self):
         raw = self.cleaned_data.get('cidades_visitadas') or ''
@@ -68,4 +101,6 @@ class SimulacaoForm(forms.Form):
         mult = self.cleaned_data.get('multiplicador')
         if mult is not None:
             params['multiplicador'] = float(mult)
+        if self.cleaned_data.get('ponderacao') not in (None, '', 'uniforme'):
+            params['ponderacao'] = self.cleaned_data['ponderacao']
         return params
@@ -0,0 +1,135 @@
+"""Cabeçalho ``Idempotency-Key`` para views de criação.
+
+A primeira requisição com uma chave a reserva (linha em ``ChaveIdempotencia``
+com chave única) antes de executar a view e, ao terminar, guarda o status e o
+corpo JSON da resposta por ``SIMULACAO_IDEMPOTENCIA_TTL`` segundos. Repetições
+com a mesma chave recebem essa resposta de volta (com ``Idempotent-Replayed:
+true``) sem executar nada; enquanto a original não termina recebem 409, e a
+mesma chave com outro corpo recebe 422. Respostas 5xx não são guardadas, para
+que o cliente possa tentar de novo. Reservas de requisições que morreram no
+meio expiram após ``SIMULACAO_IDEMPOTENCIA_ESPERA`` segundos.
+
+A unicidade no banco vale entre processos. Linhas expiradas são removidas
+quando a chave é reutilizada ou pelo comando ``limpar_idempotencia``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import ChaveIdempotencia
+
+CABECALHO = "Idempotency-Key"
+TAMANHO_MAX = 255
+
+
+def _impressao(request: HttpRequest) -> str:
+    conteudo = b"\n".join([request.method.encode(), request.path.encode(), request.body or b""])
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def _reservar(chave: str, impressao: str) -> HttpResponse | None:
+    """Reserva ``chave``; devolve None se esta requisição deve executar ou a resposta a usar no lugar."""
+    agora = timezone.now()
+    ChaveIdempotencia.objects.filter(chave=chave, expira_em__lte=agora).delete()
+    try:
+        with transaction.atomic():
+            ChaveIdempotencia.objects.create(
+                chave=chave,
+                impressao=impressao,
+                expira_em=agora + timedelta(seconds=getattr(settings, "SIMULACAO_IDEMPOTENCIA_ESPERA", 60)),
+            )
+        return None
+    except IntegrityError:
+        registro = ChaveIdempotencia.objects.filter(chave=chave).first()
+
+    if registro is not None and registro.impressao != impressao:
+        return JsonResponse({"erro": f"{CABECALHO} já usada com outra requisição."}, status=422)
+    if registro is None or registro.status_code is None:
+        resposta = JsonResponse({"erro": f"Requisição com este {CABECALHO} ainda em processamento."}, status=409)
+        resposta["Retry-After"] = "1"
+        return resposta
+    resposta = JsonResponse(registro.resposta, status=registro.status_code, safe=False)
+    resposta["Idempotent-Replayed"] = "true"
+    return resposta
+
+
+def _concluir(chave: str, resposta: HttpResponse) -> None:
+    registro = ChaveIdempotencia.objects.filter(chave=chave, status_code__isnull=True)
+    if resposta.status_code >= 500 or not resposta.get("Content-Type", "").startswith("application/json"):
+        registro.delete()
+        return
+    registro.update(
+        status_code=resposta.status_code,
+        resposta=json.loads(resposta.content),
+        expira_em=timezone.now() + timedelta(seconds=getattr(settings, "SIMULACAO_IDEMPOTENCIA_TTL", 24 * 3600)),
+    )
+
+
+def _liberar(chave: str) -> None:
+    ChaveIdempotencia.objects.filter(chave=chave, status_code__isnull=True).delete()
+
+
+def _chave_invalida() -> JsonResponse:
+    return JsonResponse({"erro": f"{CABECALHO} deve ter até {TAMANHO_MAX} caracteres."}, status=400)
+
+
+def idempotente(view):
+    """Decora uma view (síncrona ou assíncrona) com o tratamento de ``Idempotency-Key``.
+
+    Sem o cabeçalho a view roda normalmente.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def _view_async(request: HttpRequest, *args, **kwargs):
+            chave = request.headers.get(CABECALHO)
+            if not chave:
+                return await view(request, *args, **kwargs)
+            if len(chave) > TAMANHO_MAX:
+                return _chave_invalida()
+            anterior = await sync_to_async(_reservar)(chave, _impressao(request))
+            if anterior is not None:
+                return anterior
+            try:
+                resposta = await view(request, *args, **kwargs)
+            except BaseException:
+                await sync_to_async(_liberar)(chave)
+                raise
+            await sync_to_async(_concluir)(chave, resposta)
+            return resposta
+
+        return markcoroutinefunction(_view_async)
+
+    @wraps(view)
+    def _view(request: HttpRequest, *args, **kwargs):
+        chave = request.headers.get(CABECALHO)
+        if not chave:
+            return view(request, *args, **kwargs)
+        if len(chave) > TAMANHO_MAX:
+            return _chave_invalida()
+        anterior = _reservar(chave, _impressao(request))
+        if anterior is not None:
+            return anterior
+        try:
+            resposta = view(request, *args, **kwargs)
+        except BaseException:
+            _liberar(chave)
+            raise
+        _concluir(chave, resposta)
+        return resposta
+
+    return _view
+
+
+def purgar() -> int:
+    """Remove as chaves expiradas; retorna quantas."""
+    return ChaveIdempotencia.objects.filter(expira_em__lte=timezone.now()).delete()[0]
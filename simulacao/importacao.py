@@ -0,0 +1,177 @@
+"""Importação/atualização de cidades a partir de CSV (formato IBGE ou simples).
+
+O arquivo é lido linha a linha e gravado em lotes com
+``bulk_create(update_conflicts=True)`` sobre a chave única ``Cidade.nome``:
+cidades novas são inseridas, existentes com dados diferentes são atualizadas
+e as idênticas não são regravadas, então reimportar o mesmo arquivo (ou um
+censo novo) é idempotente. Cada lote faz uma consulta dos nomes já
+existentes e no máximo um INSERT ... ON CONFLICT.
+
+Cabeçalhos aceitos (sem acento, case-insensitive): ``nome``/``municipio``,
+``estado``/``uf``, ``populacao``, ``pib_per_capita``/``pib_pc``. O separador
+(``,`` ou ``;``) é detectado e números no formato brasileiro
+(``1.234.567``, ``25.123,45``) são aceitos.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from django.db import transaction
+
+from . import catalogo
+from .models import Cidade, normalizar_nome
+
+TAMANHO_LOTE = 1000
+MAX_MENSAGENS = 50
+
+ALIASES = {
+    'nome': ('nome', 'municipio', 'nome_municipio', 'nome do municipio', 'cidade'),
+    'estado': ('estado', 'uf', 'sigla_uf'),
+    'populacao': ('populacao', 'populacao_estimada', 'populacao estimada', 'pop'),
+    'pib_per_capita': ('pib_per_capita', 'pib per capita', 'pib_pc', 'pibpc'),
+}
+CAMPOS_ATUALIZADOS = ['populacao', 'pib_per_capita', 'estado', 'nome_normalizado']
+
+_MILHARES = re.compile(r'^\d{1,3}(\.\d{3})+$')
+
+
+@dataclass
+class ResultadoImportacao:
+    inseridas: int = 0
+    atualizadas: int = 0
+    inalteradas: int = 0
+    ignoradas: int = 0
+    erros: List[str] = field(default_factory=list)
+
+    def ignorar(self, mensagem: str) -> None:
+        self.ignoradas += 1
+        if len(self.erros) < MAX_MENSAGENS:
+            self.erros.append(mensagem)
+
+    def como_dict(self) -> Dict[str, object]:
+        return {
+            'inseridas': self.inseridas,
+            'atualizadas': self.atualizadas,
+            'inalteradas': self.inalteradas,
+            'ignoradas': self.ignoradas,
+            'erros': self.erros,
+        }
+
+
+def _numero(texto: str) -> Decimal:
+    """Aceita ``1234.5``, ``1.234,5`` e ``1.234.567`` (milhares com ponto)."""
+    texto = texto.strip().replace(' ', '').replace('\xa0', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    elif _MILHARES.match(texto):
+        texto = texto.replace('.', '')
+    return Decimal(texto)
+
+
+def _mapear_cabecalho(cabecalho: List[str]) -> Dict[str, str]:
+    normalizado = {normalizar_nome(c).replace('-', '_'): c for c in cabecalho if c}
+    mapa = {}
+    for campo, aliases in ALIASES.items():
+        for alias in aliases:
+            if alias in normalizado:
+                mapa[campo] = normalizado[alias]
+                break
+    faltando = [c for c in ('nome', 'populacao', 'pib_per_capita') if c not in mapa]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}")
+    return mapa
+
+
+def ler_csv(arquivo: TextIO, estado_padrao: str = "") -> Iterator[Tuple[int, Optional[Cidade], str]]:
+    """Gera ``(linha, Cidade não salva, '')`` ou ``(linha, None, erro)`` por registro.
+
+    Lança ValueError se o cabeçalho não tiver as colunas obrigatórias.
+    """
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arquivo, dialect=dialeto)
+    mapa = _mapear_cabecalho(leitor.fieldnames or [])
+    for registro in leitor:
+        linha = leitor.line_num
+        nome = (registro.get(mapa['nome']) or '').strip()
+        if not nome:
+            yield linha, None, f"linha {linha}: nome vazio"
+            continue
+        try:
+            populacao = int(_numero(registro.get(mapa['populacao']) or ''))
+            pib = _numero(registro.get(mapa['pib_per_capita']) or '').quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            yield linha, None, f"linha {linha}: populacao/pib_per_capita inválidos para {nome!r}"
+            continue
+        if populacao < 0 or pib < 0 or pib >= Decimal('1e10'):
+            yield linha, None, f"linha {linha}: valores fora do intervalo para {nome!r}"
+            continue
+        estado = ((registro.get(mapa['estado']) if 'estado' in mapa else '') or estado_padrao or '').strip()
+        cidade = Cidade(nome=nome[:120], populacao=populacao, pib_per_capita=pib, estado=estado[:50] or "Pará")
+        cidade.nome_normalizado = normalizar_nome(cidade.nome)  # bulk_create não chama save()
+        yield linha, cidade, ''
+
+
+def _gravar_lote(lote: List[Cidade], resultado: ResultadoImportacao) -> None:
+    existentes = {
+        nome: (populacao, pib, estado)
+        for nome, populacao, pib, estado in Cidade.objects.filter(nome__in=[c.nome for c in lote])
+        .values_list('nome', 'populacao', 'pib_per_capita', 'estado')
+    }
+    gravar = []
+    for cidade in lote:
+        atual = existentes.get(cidade.nome)
+        if atual is None:
+            resultado.inseridas += 1
+        elif atual == (cidade.populacao, cidade.pib_per_capita, cidade.estado):
+            resultado.inalteradas += 1
+            continue
+        else:
+            resultado.atualizadas += 1
+        gravar.append(cidade)
+    if gravar:
+        Cidade.objects.bulk_create(
+            gravar, update_conflicts=True, unique_fields=['nome'], update_fields=CAMPOS_ATUALIZADOS,
+        )
+
+
+def importar_cidades(registros: Iterable[Tuple[int, Optional[Cidade], str]], tamanho_lote: int = TAMANHO_LOTE,
+                     simular: bool = False) -> ResultadoImportacao:
+    """Grava os registros de ``ler_csv`` em lotes; ``simular`` desfaz tudo no fim.
+
+    Nomes repetidos no arquivo (ex.: municípios homônimos de outros estados,
+    já que ``Cidade.nome`` é único) mantêm a primeira ocorrência e as demais
+    contam como ignoradas.
+    """
+    resultado = ResultadoImportacao()
+    vistos = set()
+    lote: List[Cidade] = []
+    with transaction.atomic():
+        for linha, cidade, erro in registros:
+            if cidade is None:
+                resultado.ignorar(erro)
+                continue
+            if cidade.nome in vistos:
+                resultado.ignorar(f"linha {linha}: {cidade.nome!r} repetida no arquivo")
+                continue
+            vistos.add(cidade.nome)
+            lote.append(cidade)
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(lote, resultado)
+                lote = []
+        if lote:
+            _gravar_lote(lote, resultado)
+        if simular:
+            transaction.set_rollback(True)
+    if not simular and (resultado.inseridas or resultado.atualizadas):
+        catalogo.invalidar()
+    return resultado
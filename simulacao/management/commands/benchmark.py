@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacao import benchmark
+
+GRUPOS = ("servico", "formulario", "api")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a vazão de calcular_impacto_economico (vários tamanhos de cidades_visitadas), o custo "
+        "de validar SimulacaoForm e a latência/consultas de api_simular e api_resultado, em um banco "
+        "de teste. Com --salvar-baseline grava o resultado; com --baseline compara com um resultado "
+        "gravado e falha se algum caso ficou mais de --limite mais lento ou fez mais consultas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=200, help="Execuções por caso (no máximo)")
+        parser.add_argument("--tempo-max", type=float, default=2.0, help="Segundos por caso (no máximo)")
+        parser.add_argument("--grupos", default=",".join(GRUPOS), help=f"Subconjunto de {','.join(GRUPOS)}")
+        parser.add_argument("--baseline", help="Arquivo JSON de um resultado anterior para comparar")
+        parser.add_argument(
+            "--limite", type=float, default=benchmark.LIMITE_REGRESSAO,
+            help="Aumento relativo da mediana tolerado antes de acusar regressão (0.25 = 25%%)",
+        )
+        parser.add_argument("--salvar-baseline", metavar="ARQUIVO", help="Grava o resultado como baseline")
+        parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+
+    def handle(self, *args, **opts):
+        grupos = [g.strip() for g in opts["grupos"].split(",") if g.strip()]
+        invalidos = [g for g in grupos if g not in GRUPOS]
+        if invalidos:
+            raise CommandError(f"Grupos inválidos: {', '.join(invalidos)}")
+        baseline = None
+        if opts["baseline"]:
+            try:
+                with open(opts["baseline"], encoding="utf-8") as arquivo:
+                    baseline = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Baseline ilegível ({opts['baseline']}): {e}")
+
+        if grupos == ["servico"]:
+            resultado = benchmark.executar(None, opts["repeticoes"], opts["tempo_max"], grupos)
+        else:
+            with benchmark.banco_de_teste() as cidade:
+                resultado = benchmark.executar(cidade.id, opts["repeticoes"], opts["tempo_max"], grupos)
+
+        if opts["salvar_baseline"]:
+            with open(opts["salvar_baseline"], "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        comparacoes = benchmark.comparar(baseline, resultado, opts["limite"]) if baseline is not None else []
+        regressoes = [c["caso"] for c in comparacoes if c["regrediu"]]
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({**resultado, "comparacoes": comparacoes}, indent=2, ensure_ascii=False))
+        else:
+            self._imprimir(resultado, comparacoes)
+        if regressoes:
+            raise CommandError(f"Regressão acima de {opts['limite']:.0%} em: {', '.join(regressoes)}")
+
+    def _imprimir(self, resultado: dict, comparacoes: list[dict]) -> None:
+        por_caso = {c["caso"]: c for c in comparacoes}
+        self.stdout.write(f"{'caso':<28} {'execuções':>9} {'mediana(µs)':>12} {'p95(µs)':>11} {'op/s':>10} {'consultas':>9} {'vs base':>8}")
+        for nome, m in resultado["casos"].items():
+            comparacao = por_caso.get(nome)
+            relativo = f"{comparacao['razao']:.2f}x" + ("!" if comparacao["regrediu"] else "") if comparacao else "-"
+            self.stdout.write(
+                f"{nome:<28} {m['execucoes']:>9} {m['mediana_us']:>12.1f} {m['p95_us']:>11.1f} "
+                f"{m['por_segundo'] or 0:>10.1f} {m.get('consultas', '-'):>9} {relativo:>8}"
+            )
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacao.benchmark import banco_de_teste
+from simulacao.models import Cidade, Relatorio, Simulacao
+from simulacao.services import calcular_impacto_economico
+
+MODOS = {
+    # modo: (servidor, rota de simular, rota de resultado)
+    "wsgi": ("wsgi", "/api/simular/", "/api/resultados/{}/"),
+    "asgi-sync": ("asgi", "/api/simular/", "/api/resultados/{}/"),
+    "asgi": ("asgi", "/api/async/simular/", "/api/async/resultados/{}/"),
+}
+
+
+class _EntradaLenta(io.RawIOBase):
+    """wsgi.input que simula um cliente lento: o corpo só chega após ``latencia``."""
+
+    def __init__(self, corpo: bytes, latencia: float):
+        self._corpo = io.BytesIO(corpo)
+        self._latencia = latencia
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._latencia:
+            time.sleep(self._latencia)
+            self._latencia = 0
+        dados = self._corpo.read(len(buffer))
+        buffer[:len(dados)] = dados
+        return len(dados)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão de api_simular/api_resultado servidas por WSGI (threads) e por ASGI "
+        "(view síncrona e view nativa assíncrona) com clientes lentos, em um banco de teste. "
+        "No SQLite o endpoint simular mede sobretudo a disputa pelo lock de escrita: sob ASGI "
+        "cada requisição tem sua própria thread e conexão, então prefira --endpoint resultado "
+        "ou um banco de produção para comparar servidores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requisicoes", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8, help="Threads do servidor WSGI (como gunicorn gthread)")
+        parser.add_argument("--concorrencia", type=int, default=0, help="Requisições simultâneas no ASGI (0 = todas)")
+        parser.add_argument("--endpoint", choices=["simular", "resultado"], default="simular")
+        parser.add_argument(
+            "--latencia", type=float, default=0.05,
+            help="Segundos que o cliente lento leva para enviar o corpo (simular) ou ler a resposta (resultado)",
+        )
+        parser.add_argument("--modos", default=",".join(MODOS), help=f"Subconjunto de {','.join(MODOS)}")
+        parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+
+    def handle(self, *args, **opts):
+        modos = [m.strip() for m in opts["modos"].split(",") if m.strip()]
+        invalidos = [m for m in modos if m not in MODOS]
+        if invalidos:
+            raise CommandError(f"Modos inválidos: {', '.join(invalidos)}")
+
+        with banco_de_teste() as cidade:
+            if opts["endpoint"] == "resultado":
+                ids = self._criar_relatorios(cidade, opts["requisicoes"])
+            resultados = []
+            for deslocamento, modo in enumerate(modos):
+                servidor, rota_simular, rota_resultado = MODOS[modo]
+                if opts["endpoint"] == "resultado":
+                    requisicoes = [("GET", rota_resultado.format(i), b"") for i in ids]
+                else:
+                    requisicoes = [
+                        ("POST", rota_simular, json.dumps({
+                            "cidade_id": cidade.id,
+                            # valores distintos por requisição e modo: nada é reaproveitado do cache
+                            "numero_turistas": (deslocamento + 1) * 1_000_000 + i,
+                            "gasto_medio": 250,
+                            "duracao_estadia": 4,
+                            "cidades_visitadas": 3,
+                        }).encode())
+                        for i in range(opts["requisicoes"])
+                    ]
+                if servidor == "wsgi":
+                    medidas = self._rodar_wsgi(requisicoes, opts["threads"], opts["latencia"])
+                else:
+                    medidas = asyncio.run(self._rodar_asgi(requisicoes, opts["concorrencia"], opts["latencia"]))
+                resultados.append({"modo": modo, **medidas})
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({"parametros": {k: opts[k] for k in ("endpoint", "requisicoes", "threads", "concorrencia", "latencia")}, "resultados": resultados}, indent=2))
+            return
+        self.stdout.write(f"{'modo':<10} {'req/s':>9} {'total(s)':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'erros':>6}")
+        for r in resultados:
+            self.stdout.write(
+                f"{r['modo']:<10} {r['req_por_s']:>9.1f} {r['tempo_total']:>9.2f} "
+                f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['erros']:>6}"
+            )
+
+    @staticmethod
+    def _resumo(duracoes: list[float], status: list[int], total: float) -> dict:
+        ordenadas = sorted(duracoes)
+        return {
+            "requisicoes": len(duracoes),
+            "tempo_total": round(total, 4),
+            "req_por_s": round(len(duracoes) / total, 2) if total else 0.0,
+            "p50_ms": round(statistics.median(ordenadas) * 1000, 2),
+            "p95_ms": round(ordenadas[int(0.95 * (len(ordenadas) - 1))] * 1000, 2),
+            "erros": sum(1 for s in status if s >= 400),
+        }
+
+    @staticmethod
+    def _criar_relatorios(cidade: Cidade, quantidade: int) -> list[int]:
+        resultado = calcular_impacto_economico({
+            "numero_turistas": 100, "gasto_medio": 250, "duracao_estadia": 4, "cidades_visitadas": ["Benchmark"],
+        })
+        simulacoes = Simulacao.objects.bulk_create(
+            [Simulacao(cidade=cidade, parametros={"indice": i}) for i in range(quantidade)]
+        )
+        relatorios = [Relatorio(simulacao=s, resultado=resultado) for s in simulacoes]
+        for relatorio in relatorios:
+            relatorio.preencher_resumo()
+        Relatorio.objects.bulk_create(relatorios)
+        return [s.id for s in simulacoes]
+
+    def _rodar_wsgi(self, requisicoes: list[tuple[str, str, bytes]], threads: int, latencia: float) -> dict:
+        app = WSGIHandler()
+
+        def requisitar(requisicao):
+            metodo, rota, corpo = requisicao
+            inicio = time.perf_counter()
+            status_http = []
+            environ = {
+                "REQUEST_METHOD": metodo,
+                "PATH_INFO": rota,
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "HTTP_HOST": "testserver",
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(corpo)),
+                "wsgi.input": io.BufferedReader(_EntradaLenta(corpo, latencia if corpo else 0)),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": io.StringIO(),
+            }
+            resposta = app(environ, lambda s, h, *a: status_http.append(int(s.split()[0])))
+            if not corpo and latencia:
+                # Cliente lento lendo a resposta: a thread do servidor fica presa enquanto isso
+                time.sleep(latencia)
+            b"".join(resposta)
+            if hasattr(resposta, "close"):
+                resposta.close()
+            return time.perf_counter() - inicio, status_http[0]
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            medidas = list(pool.map(requisitar, requisicoes))
+        total = time.perf_counter() - inicio
+        return self._resumo([m[0] for m in medidas], [m[1] for m in medidas], total)
+
+    async def _rodar_asgi(self, requisicoes: list[tuple[str, str, bytes]], concorrencia: int, latencia: float) -> dict:
+        app = ASGIHandler()
+        limite = asyncio.Semaphore(concorrencia or len(requisicoes))
+
+        async def requisitar(requisicao):
+            metodo, rota, corpo = requisicao
+            async with limite:
+                inicio = time.perf_counter()
+                enviado = False
+                status_http = []
+
+                async def receive():
+                    nonlocal enviado
+                    if enviado:
+                        # Cliente segue conectado até a resposta terminar
+                        await asyncio.Future()
+                    enviado = True
+                    if corpo:
+                        await asyncio.sleep(latencia)
+                    return {"type": "http.request", "body": corpo, "more_body": False}
+
+                async def send(mensagem):
+                    if mensagem["type"] == "http.response.start":
+                        status_http.append(mensagem["status"])
+                    elif not corpo and latencia and not mensagem.get("more_body"):
+                        await asyncio.sleep(latencia)
+
+                scope = {
+                    "type": "http",
+                    "asgi": {"version": "3.0"},
+                    "http_version": "1.1",
+                    "method": metodo,
+                    "scheme": "http",
+                    "path": rota,
+                    "raw_path": rota.encode(),
+                    "query_string": b"",
+                    "headers": [
+                        (b"host", b"testserver"),
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(corpo)).encode()),
+                    ],
+                    "server": ("testserver", 80),
+                    "client": ("127.0.0.1", 50000),
+                }
+                await app(scope, receive, send)
+                return time.perf_counter() - inicio, status_http[0]
+
+        inicio = time.perf_counter()
+        medidas = await asyncio.gather(*(requisitar(r) for r in requisicoes))
+        total = time.perf_counter() - inicio
+        return self._resumo([m[0] for m in medidas], [m[1] for m in medidas], total)
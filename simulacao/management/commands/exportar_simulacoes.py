@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacao import exportacao, filtros
+from simulacao.models import Simulacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta simulações com seus relatórios em CSV, NDJSON ou Parquet (requer pyarrow), "
+        "percorrendo o banco uma vez em blocos, com memória constante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=["csv", "ndjson", "parquet"], default="csv")
+        parser.add_argument("--saida", default="-", help="Arquivo de saída ('-' = stdout; obrigatório para parquet)")
+        parser.add_argument("--completo", action="store_true", help="Inclui parâmetros e resultado originais (JSON)")
+        parser.add_argument("--tamanho-bloco", type=int, default=exportacao.TAMANHO_BLOCO, help="Linhas por leitura do banco")
+        for filtro in ("cidade", "desde", "ate", "cenario", "status"):
+            parser.add_argument(f"--{filtro}", default="")
+
+    def handle(self, *args, **opts):
+        try:
+            queryset = filtros.filtrar_simulacoes(Simulacao.objects.all(), opts)
+        except filtros.FiltroInvalido as e:
+            raise CommandError(str(e))
+        queryset = exportacao.consulta(queryset, completo=opts["completo"])
+        tamanho = max(1, opts["tamanho_bloco"])
+
+        if opts["formato"] == "parquet":
+            if opts["saida"] == "-":
+                raise CommandError("Parquet exige --saida com o caminho do arquivo.")
+            try:
+                total = exportacao.escrever_parquet(queryset, opts["saida"], opts["completo"], tamanho)
+            except exportacao.FormatoIndisponivel as e:
+                raise CommandError(str(e))
+            self.stderr.write(f"{total} linha(s) exportada(s) para {opts['saida']}.")
+            return
+
+        gerar = exportacao.gerar_csv if opts["formato"] == "csv" else exportacao.gerar_ndjson
+        pedacos = gerar(queryset, opts["completo"], tamanho)
+        if opts["saida"] == "-":
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending="")
+            return
+        with open(opts["saida"], "w", encoding="utf-8", newline="") as destino:
+            destino.writelines(pedacos)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacao import importacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa/atualiza cidades de um CSV (nome, estado/uf, populacao, pib_per_capita) em lotes, "
+        "com upsert pelo nome. Pode ser reexecutado: cidades sem mudança não são regravadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do CSV")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Codificação do arquivo (IBGE costuma usar latin-1)")
+        parser.add_argument("--estado", default="", help="Estado usado quando o CSV não tem coluna estado/uf")
+        parser.add_argument("--lote", type=int, default=importacao.TAMANHO_LOTE, help="Cidades por INSERT")
+        parser.add_argument("--dry-run", action="store_true", help="Conta o que mudaria e desfaz a transação")
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["arquivo"], encoding=opts["encoding"], newline="") as arquivo:
+                resultado = importacao.importar_cidades(
+                    importacao.ler_csv(arquivo, estado_padrao=opts["estado"]),
+                    tamanho_lote=max(1, opts["lote"]),
+                    simular=opts["dry_run"],
+                )
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for erro in resultado.erros:
+            self.stderr.write(erro)
+        resumo = (
+            f"{resultado.inseridas} inserida(s), {resultado.atualizadas} atualizada(s), "
+            f"{resultado.inalteradas} inalterada(s), {resultado.ignoradas} ignorada(s)"
+        )
+        if opts["dry_run"]:
+            resumo += " (dry-run: nada foi gravado)"
+        self.stdout.write(self.style.SUCCESS(resumo + "."))
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from simulacao import idempotencia
+
+
+class Command(BaseCommand):
+    help = "Remove as respostas guardadas de Idempotency-Key já expiradas."
+
+    def handle(self, *args, **opts):
+        removidas = idempotencia.purgar()
+        self.stdout.write(self.style.SUCCESS(f"{removidas} chave(s) expirada(s) removida(s)."))
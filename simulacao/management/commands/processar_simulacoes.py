@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from simulacao import fila
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker da fila de simulações assíncronas (api_simular com async=true). "
+        "Os workers são threads: o cálculo NumPy/Decimal serializa no GIL e as threads só "
+        "sobrepõem a espera pelo banco. Para paralelismo de CPU, execute vários processos "
+        "deste comando; a reivindicação condicional impede que um item seja processado duas vezes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Threads consumindo a fila (default 1; limitadas pelo GIL)")
+        parser.add_argument("--lote", type=int, default=100, help="Simulações buscadas por iteração")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Espera em segundos quando a fila está vazia")
+        parser.add_argument("--once", action="store_true", help="Esvazia a fila uma vez e encerra")
+        parser.add_argument(
+            "--reenfileirar-apos", type=int, default=600,
+            help=(
+                "Devolve à fila, a cada ciclo de consulta, simulações em processamento "
+                "há mais de N segundos (0 desativa)"
+            ),
+        )
+
+    def handle(self, *args, **opts):
+        parar = threading.Event()
+        total = [0]
+        lock = threading.Lock()
+
+        def recuperar_travadas():
+            if not opts["reenfileirar_apos"]:
+                return
+            devolvidas = fila.reenfileirar_travadas(timedelta(seconds=opts["reenfileirar_apos"]))
+            if devolvidas:
+                with lock:
+                    self.stdout.write(f"{devolvidas} simulação(ões) travada(s) devolvida(s) à fila.")
+
+        def trabalhar():
+            try:
+                while not parar.is_set():
+                    close_old_connections()
+                    # Repetido a cada ciclo: itens de um worker que caiu voltam à fila
+                    # sem esperar o reinício deste comando.
+                    recuperar_travadas()
+                    n = fila.processar_pendentes(limite=opts["lote"])
+                    with lock:
+                        total[0] += n
+                    if n == 0:
+                        if opts["once"]:
+                            return
+                        parar.wait(opts["intervalo"])
+            finally:
+                close_old_connections()
+
+        workers = max(1, opts["workers"])
+        threads = [threading.Thread(target=trabalhar, daemon=True) for _ in range(workers - 1)]
+        for t in threads:
+            t.start()
+        try:
+            # A thread principal também consome a fila (com --workers 1 é a única)
+            trabalhar()
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            parar.set()
+            for t in threads:
+                t.join()
+        self.stdout.write(self.style.SUCCESS(f"{total[0]} simulação(ões) processada(s)."))
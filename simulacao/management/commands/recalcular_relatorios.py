@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulacao import coeficientes, recalculo
+from simulacao.models import VersaoCoeficientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula relatórios gravados com os coeficientes vigentes (ou de --versao), em lotes por keyset "
+        "com bulk_update, processos de trabalho opcionais, checkpoint para retomar e --dry-run com resumo das diferenças."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--versao", type=int, help="Versão de coeficientes a aplicar (padrão: a ativa)")
+        parser.add_argument(
+            "--todos", action="store_true",
+            help="Recalcula também relatórios já na versão alvo (ex.: mudança na fórmula de services)",
+        )
+        parser.add_argument("--lote", type=int, default=recalculo.TAMANHO_LOTE, help="Relatórios por leitura/gravação")
+        parser.add_argument("--workers", type=int, default=1, help="Processos de cálculo (1 = no próprio processo)")
+        parser.add_argument("--pausa", type=float, default=0.0, help="Segundos de espera entre lotes (limita a carga no banco)")
+        parser.add_argument("--checkpoint", default="", help="Arquivo de progresso; se existir, o recálculo é retomado dele")
+        parser.add_argument("--reiniciar", action="store_true", help="Ignora o checkpoint existente e começa do início")
+        parser.add_argument("--dry-run", action="store_true", help="Só calcula e resume as diferenças, sem gravar")
+
+    def handle(self, *args, **opts):
+        if opts["versao"] is not None:
+            try:
+                alvo = coeficientes.da_versao(opts["versao"])
+            except VersaoCoeficientes.DoesNotExist:
+                raise CommandError(f"Versão de coeficientes {opts['versao']} não existe.")
+        else:
+            alvo = coeficientes.atual()
+
+        checkpoint = opts["checkpoint"] or None
+        if checkpoint and opts["reiniciar"]:
+            try:
+                os.remove(checkpoint)
+            except FileNotFoundError:
+                pass
+
+        def progresso(resumo: recalculo.ResumoRecalculo) -> None:
+            self.stderr.write(
+                f"até id {resumo.ultimo_id}: {resumo.lidos} lido(s), {resumo.alterados} alterado(s), {resumo.erros} erro(s)"
+            )
+
+        try:
+            resumo = recalculo.recalcular(
+                alvo,
+                todos=opts["todos"],
+                tamanho_lote=max(1, opts["lote"]),
+                workers=max(1, opts["workers"]),
+                pausa=max(0.0, opts["pausa"]),
+                simular=opts["dry_run"],
+                checkpoint=checkpoint,
+                ao_concluir_lote=progresso if opts["verbosity"] >= 2 else None,
+            )
+        except recalculo.CheckpointInvalido as e:
+            raise CommandError(f"{e} Use --reiniciar para descartá-lo.")
+
+        for amostra in resumo.amostras:
+            if "erro" in amostra:
+                self.stderr.write(f"relatório {amostra['relatorio_id']}: {amostra['erro']}")
+            else:
+                self.stdout.write(
+                    f"relatório {amostra['relatorio_id']}: {amostra['impacto_anterior']} -> {amostra['impacto_novo']}"
+                )
+        texto = (
+            f"{resumo.lidos} relatório(s) lido(s) com coeficientes v{alvo.versao}: {resumo.alterados} alterado(s), "
+            f"{resumo.inalterados} inalterado(s), {resumo.erros} com erro; "
+            f"diferença total de impacto {resumo.delta_impacto} (maior {resumo.maior_delta}"
+            f"{f' no relatório {resumo.maior_delta_id}' if resumo.maior_delta_id else ''})"
+        )
+        if opts["dry_run"]:
+            texto += " (dry-run: nada foi gravado)"
+        self.stdout.write(self.style.SUCCESS(texto + "."))
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from simulacao import estatisticas
+
+
+class Command(BaseCommand):
+    help = "Recalcula a tabela EstatisticaDiaria (cidade × cenário × dia) a partir de todos os relatórios."
+
+    def handle(self, *args, **opts):
+        linhas = estatisticas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{linhas} linha(s) de estatística gravada(s)."))
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from simulacao import roteamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia o banco SQLite primário para os arquivos das réplicas de SIMULACAO_REPLICAS "
+        "(API de backup do SQLite, segura com o primário em uso). Serve para testar o "
+        "roteamento localmente; em produção as réplicas vêm da replicação do banco."
+    )
+
+    def handle(self, *args, **opts):
+        aliases = roteamento.replicas()
+        if not aliases:
+            raise CommandError("Nenhuma réplica configurada (SIMULACAO_REPLICAS / DB_REPLICAS).")
+        origem = connections[roteamento.PRIMARIO]
+        if origem.vendor != "sqlite" or any(connections[a].vendor != "sqlite" for a in aliases):
+            raise CommandError("Só há cópia local entre bancos SQLite.")
+        origem.ensure_connection()
+        for alias in aliases:
+            connections[alias].close()
+            destino = sqlite3.connect(connections[alias].settings_dict["NAME"])
+            try:
+                origem.connection.backup(destino)
+            finally:
+                destino.close()
+            self.stdout.write(f"{alias}: {connections[alias].settings_dict['NAME']}")
+        roteamento.saude.limpar()
+        self.stdout.write(self.style.SUCCESS(f"{len(aliases)} réplica(s) sincronizada(s)."))
@@ -0,0 +1,248 @@
+"""Métricas no formato de texto do Prometheus (endpoint ``/metrics``).
+
+Contadores e histogramas são agregados em memória por processo: cada
+observação é uma soma num dicionário sob um lock (o histograma guarda a
+contagem por faixa, acumulada só na exposição). Com vários processos
+(gunicorn/uvicorn com workers), defina ``SIMULACAO_METRICAS_DIR``: cada
+processo grava seu estado em ``metricas-<pid>.json`` nesse diretório no máximo
+a cada ``SIMULACAO_METRICAS_INTERVALO`` segundos (e ao sair), e o ``/metrics``
+de qualquer processo soma os arquivos dos outros ao seu estado atual. Arquivos
+de processos encerrados continuam somando, para que os contadores não voltem;
+limpe o diretório ao reiniciar o serviço.
+"""
+
+from __future__ import annotations
+
+import atexit
+import bisect
+import glob
+import json
+import os
+import re
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404
+
+FAIXAS_REQUISICAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAIXAS_CALCULO = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0)
+FAIXAS_GRAVACAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# nome: (tipo, ajuda, faixas do histograma)
+METRICAS = {
+    "simulacao_requisicoes_total": ("counter", "Requisições atendidas por view, status e cenário.", None),
+    "simulacao_requisicao_segundos": ("histogram", "Latência das views por view, status e cenário.", FAIXAS_REQUISICAO),
+    "simulacao_calculo_segundos": ("histogram", "Tempo de calcular_impacto_economico por cenário.", FAIXAS_CALCULO),
+    "simulacao_erros_validacao_total": ("counter", "ParametrosInvalidos por classe de mensagem.", None),
+    "simulacao_gravacao_segundos": ("histogram", "Tempo de gravação de simulação e relatório.", FAIXAS_GRAVACAO),
+}
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def classe_erro(mensagem: str) -> str:
+    """Reduz a mensagem de ParametrosInvalidos a uma classe de baixa cardinalidade.
+
+    Corta no primeiro ``:`` ou ``(`` (onde começam nomes e valores) e troca
+    números por ``N``: "pesos ausentes para: Belém" -> "pesos ausentes para".
+    """
+    classe = re.split(r"[:(]", mensagem, maxsplit=1)[0]
+    return re.sub(r"\d+(?:[.,]\d+)?", "N", classe).strip()[:80] or "outro"
+
+
+class _Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self) -> None:
+        self._pid = os.getpid()
+        self._contadores: Dict[Tuple[str, Rotulos], float] = {}
+        # (nome, rótulos) -> [contagem por faixa..., +Inf, soma]
+        self._histogramas: Dict[Tuple[str, Rotulos], List[float]] = {}
+        self._gravado_em = time.monotonic()
+
+    def _verificar_processo(self) -> None:
+        # Processo filho de um fork herda o estado do pai: recomeça do zero
+        if self._pid != os.getpid():
+            self._reiniciar()
+
+    def incrementar(self, nome: str, valor: float = 1.0, **rotulos: str) -> None:
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._verificar_processo()
+            self._contadores[chave] = self._contadores.get(chave, 0.0) + valor
+        self._talvez_gravar()
+
+    def observar(self, nome: str, valor: float, **rotulos: str) -> None:
+        faixas = METRICAS[nome][2]
+        indice = bisect.bisect_left(faixas, valor)
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._verificar_processo()
+            contagens = self._histogramas.get(chave)
+            if contagens is None:
+                contagens = self._histogramas[chave] = [0.0] * (len(faixas) + 2)
+            contagens[indice] += 1
+            contagens[-1] += valor
+        self._talvez_gravar()
+
+    def instantaneo(self) -> dict:
+        with self._lock:
+            self._verificar_processo()
+            return {
+                "contadores": [[nome, list(rotulos), valor] for (nome, rotulos), valor in self._contadores.items()],
+                "histogramas": [[nome, list(rotulos), list(c)] for (nome, rotulos), c in self._histogramas.items()],
+            }
+
+    def _talvez_gravar(self) -> None:
+        diretorio = getattr(settings, "SIMULACAO_METRICAS_DIR", None)
+        if not diretorio or time.monotonic() - self._gravado_em < getattr(settings, "SIMULACAO_METRICAS_INTERVALO", 1.0):
+            return
+        self.gravar(diretorio)
+
+    def gravar(self, diretorio: Optional[str] = None) -> None:
+        diretorio = diretorio or getattr(settings, "SIMULACAO_METRICAS_DIR", None)
+        if not diretorio:
+            return
+        self._gravado_em = time.monotonic()
+        dados = self.instantaneo()
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f"metricas-{os.getpid()}.json")
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo)
+        os.replace(temporario, caminho)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._reiniciar()
+
+
+registro = _Registro()
+incrementar = registro.incrementar
+observar = registro.observar
+atexit.register(registro.gravar)
+
+
+def _somar(total: dict, dados: dict) -> None:
+    for nome, rotulos, valor in dados.get("contadores", []):
+        chave = (nome, tuple(tuple(r) for r in rotulos))
+        total["contadores"][chave] = total["contadores"].get(chave, 0.0) + valor
+    for nome, rotulos, contagens in dados.get("histogramas", []):
+        chave = (nome, tuple(tuple(r) for r in rotulos))
+        atual = total["histogramas"].get(chave)
+        total["histogramas"][chave] = contagens if atual is None else [a + b for a, b in zip(atual, contagens)]
+
+
+def coletar() -> dict:
+    """Estado deste processo somado ao gravado pelos demais (se houver diretório)."""
+    total = {"contadores": {}, "histogramas": {}}
+    _somar(total, registro.instantaneo())
+    diretorio = getattr(settings, "SIMULACAO_METRICAS_DIR", None)
+    if diretorio:
+        proprio = f"metricas-{os.getpid()}.json"
+        for caminho in glob.glob(os.path.join(diretorio, "metricas-*.json")):
+            if os.path.basename(caminho) == proprio:
+                continue
+            try:
+                with open(caminho, encoding="utf-8") as arquivo:
+                    _somar(total, json.load(arquivo))
+            except (OSError, ValueError):
+                continue  # processo gravando ou arquivo removido no meio da leitura
+    return total
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(rotulos, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pares = [*rotulos, *extra]
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + "}"
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def exposicao() -> str:
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    dados = coletar()
+    linhas = []
+    for nome, (tipo, ajuda, faixas) in METRICAS.items():
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        if tipo == "counter":
+            for (metrica, rotulos), valor in sorted(dados["contadores"].items()):
+                if metrica == nome:
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_numero(valor)}")
+            continue
+        for (metrica, rotulos), contagens in sorted(dados["histogramas"].items()):
+            if metrica != nome:
+                continue
+            acumulado = 0.0
+            for limite, contagem in zip([*map(repr, faixas), "+Inf"], contagens):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, (('le', limite),))} {_numero(acumulado)}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_numero(contagens[-1])}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {_numero(acumulado)}")
+    return "\n".join(linhas) + "\n"
+
+
+def anotar_cenario(request, cenario: Optional[str]) -> None:
+    """Informa o cenário da requisição para o rótulo das métricas de ``instrumentar``."""
+    request.simulacao_cenario = cenario
+
+
+def _registrar_requisicao(nome_view: str, request, status: int, duracao: float) -> None:
+    cenario = getattr(request, "simulacao_cenario", None) or "nenhum"
+    rotulos = {"view": nome_view, "status": str(status), "cenario": cenario}
+    incrementar("simulacao_requisicoes_total", **rotulos)
+    observar("simulacao_requisicao_segundos", duracao, **rotulos)
+
+
+def instrumentar(nome_view: str):
+    """Decora uma view (síncrona ou assíncrona) com contagem e latência por status e cenário.
+
+    Http404 lançado pela view conta como status 404; outras exceções, como 500.
+    """
+    def decorador(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def _view_async(request, *args, **kwargs):
+                inicio, status = time.perf_counter(), 500
+                try:
+                    resposta = await view(request, *args, **kwargs)
+                    status = resposta.status_code
+                    return resposta
+                except Http404:
+                    status = 404
+                    raise
+                finally:
+                    _registrar_requisicao(nome_view, request, status, time.perf_counter() - inicio)
+
+            return markcoroutinefunction(_view_async)
+
+        @wraps(view)
+        def _view(request, *args, **kwargs):
+            inicio, status = time.perf_counter(), 500
+            try:
+                resposta = view(request, *args, **kwargs)
+                status = resposta.status_code
+                return resposta
+            except Http404:
+                status = 404
+                raise
+            finally:
+                _registrar_requisicao(nome_view, request, status, time.perf_counter() - inicio)
+
+        return _view
+
+    return decorador
@@ -0,0 +1,176 @@
+"""Middlewares do app: perfil por requisição e fixação no primário (réplicas).
+
+``PerfilMiddleware`` (opcional): com ``SIMULACAO_PERFIL = True`` cada resposta leva um cabeçalho
+``Server-Timing`` com os trechos de ``perfil.trecho`` (json, cidade, calculo,
+gravacao, ...), as consultas SQL e o tempo de banco (``db``) e o total. Uma
+fração ``SIMULACAO_PERFIL_AMOSTRA`` (0 a 1) das requisições também roda sob
+cProfile e é gravada em ``SIMULACAO_PERFIL_DIR`` (padrão: ``<tmp>/simulacao-perfil``),
+legível com ``python -m pstats``. Nas views assíncronas o cProfile cobre só o
+que roda na thread do event loop.
+
+Desligado, o middleware se retira da pilha na inicialização
+(``MiddlewareNotUsed``) e não custa nada por requisição.
+
+``ReplicaMiddleware``: ver ``roteamento``; também se retira sem réplicas.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import perfil, roteamento
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    coleta = perfil.atual()
+    if coleta is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coleta.somar_consulta(time.perf_counter() - inicio)
+
+
+def _instalar(conexao) -> None:
+    if _contar_consulta not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(_contar_consulta)
+
+
+def _instalar_na_thread() -> None:
+    # Conexões são por thread: as que já existem nesta thread não disparam connection_created
+    for conexao in connections.all(initialized_only=True):
+        _instalar(conexao)
+
+
+def _ao_conectar(sender, connection, **kwargs):
+    _instalar(connection)
+
+
+class PerfilMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SIMULACAO_PERFIL", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.amostra = float(getattr(settings, "SIMULACAO_PERFIL_AMOSTRA", 0.0))
+        self.diretorio = getattr(settings, "SIMULACAO_PERFIL_DIR", None) or os.path.join(tempfile.gettempdir(), "simulacao-perfil")
+        connection_created.connect(_ao_conectar, dispatch_uid="simulacao_perfil")
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        _instalar_na_thread()
+        coleta, token = perfil.iniciar()
+        perfilador = self._perfilador()
+        try:
+            resposta = self.get_response(request)
+        finally:
+            if perfilador is not None:
+                perfilador.disable()
+            perfil.encerrar(token)
+        return self._concluir(request, resposta, coleta, perfilador)
+
+    async def __acall__(self, request):
+        # As consultas das views assíncronas rodam na thread de sync_to_async
+        await sync_to_async(_instalar_na_thread)()
+        coleta, token = perfil.iniciar()
+        perfilador = self._perfilador()
+        try:
+            resposta = await self.get_response(request)
+        finally:
+            if perfilador is not None:
+                perfilador.disable()
+            perfil.encerrar(token)
+        return self._concluir(request, resposta, coleta, perfilador)
+
+    def _perfilador(self) -> cProfile.Profile | None:
+        if self.amostra <= 0 or random.random() >= self.amostra:
+            return None
+        perfilador = cProfile.Profile()
+        try:
+            perfilador.enable()
+        except ValueError:  # outro profiler já ativo nesta thread
+            return None
+        return perfilador
+
+    def _concluir(self, request, resposta, coleta: perfil.Coleta, perfilador: cProfile.Profile | None):
+        if perfilador is not None:
+            caminho = self._gravar(request, perfilador)
+            resposta["X-Perfil"] = os.path.basename(caminho)
+        resposta["Server-Timing"] = coleta.server_timing()
+        return resposta
+
+    def _gravar(self, request, perfilador: cProfile.Profile) -> str:
+        os.makedirs(self.diretorio, exist_ok=True)
+        rota = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "raiz"
+        nome = f"{time.strftime('%Y%m%dT%H%M%S')}-{request.method}-{rota}-{uuid.uuid4().hex[:8]}.prof"
+        caminho = os.path.join(self.diretorio, nome)
+        perfilador.dump_stats(caminho)
+        return caminho
+
+
+class ReplicaMiddleware:
+    """Fixa no primário as requisições que escrevem e as seguintes do mesmo cliente.
+
+    Após um método não seguro a resposta leva um cookie de
+    ``SIMULACAO_REPLICA_ATRASO`` segundos; enquanto ele vier, as leituras do
+    cliente não vão para as réplicas.
+    """
+
+    sync_capable = True
+    async_capable = True
+    METODOS_SEGUROS = frozenset({"GET", "HEAD", "OPTIONS", "TRACE"})
+
+    def __init__(self, get_response):
+        if not roteamento.replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = getattr(settings, "SIMULACAO_REPLICA_COOKIE", "simulacao_primario")
+        self.atraso = getattr(settings, "SIMULACAO_REPLICA_ATRASO", 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _no_primario(self, request) -> bool:
+        return request.method not in self.METODOS_SEGUROS or self.cookie in request.COOKIES
+
+    def _concluir(self, request, resposta):
+        if request.method not in self.METODOS_SEGUROS:
+            resposta.set_cookie(self.cookie, "1", max_age=self.atraso, httponly=True, samesite="Lax")
+        return resposta
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = roteamento.fixar(self._no_primario(request))
+        try:
+            resposta = self.get_response(request)
+        finally:
+            roteamento.liberar(token)
+        return self._concluir(request, resposta)
+
+    async def __acall__(self, request):
+        token = roteamento.fixar(self._no_primario(request))
+        try:
+            resposta = await self.get_response(request)
+        finally:
+            roteamento.liberar(token)
+        return self._concluir(request, resposta)
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:29
+
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+
+# Cópia congelada de cache.hash_parametros como era nesta migração: mudanças
+# futuras no app não podem alterar os hashes que ela grava.
+def _decimal_canonico(valor):
+    return format(Decimal(str(valor)).normalize(), 'f')
+
+
+def hash_parametros(cidade_id, parametros):
+    try:
+        canonico = {
+            'cidade_id': int(cidade_id),
+            'numero_turistas': int(parametros['numero_turistas']),
+            'gasto_medio': _decimal_canonico(parametros['gasto_medio']),
+            'duracao_estadia': int(parametros['duracao_estadia']),
+            'cenario': str(parametros.get('cenario', 'realista')).strip().lower(),
+        }
+        cidades = parametros['cidades_visitadas']
+        if isinstance(cidades, int):
+            canonico['cidades_visitadas'] = cidades
+        elif isinstance(cidades, (list, tuple)):
+            canonico['cidades_visitadas'] = sorted(str(c).strip().casefold() for c in cidades if str(c).strip())
+        else:
+            return None
+        if parametros.get('multiplicador') is not None:
+            canonico['multiplicador'] = _decimal_canonico(parametros['multiplicador'])
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return None
+    serializado = json.dumps(canonico, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+def preencher_hash(apps, schema_editor):
+    Simulacao = apps.get_model('simulacao', 'Simulacao')
+    lote = []
+    for sim in Simulacao.objects.only('id', 'cidade_id', 'parametros').iterator(chunk_size=2000):
+        chave = hash_parametros(sim.cidade_id, sim.parametros or {})
+        if chave:
+            sim.parametros_hash = chave
+            lote.append(sim)
+        if len(lote) >= 2000:
+            Simulacao.objects.bulk_update(lote, ['parametros_hash'])
+            lote = []
+    if lote:
+        Simulacao.objects.bulk_update(lote, ['parametros_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0003_cidade_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacao',
+            name='parametros_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 dos parâmetros normalizados (deduplicação)', max_length=64),
+        ),
+        migrations.RunPython(preencher_hash, migrations.RunPython.noop),
+    ]
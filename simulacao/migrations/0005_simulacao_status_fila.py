@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0004_simulacao_parametros_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulacao',
+            name='erro',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='simulacao',
+            name='iniciado_em',
+            field=models.DateTimeField(blank=True, help_text='Quando um worker assumiu o processamento', null=True),
+        ),
+        migrations.AddField(
+            model_name='simulacao',
+            name='progresso',
+            field=models.PositiveSmallIntegerField(default=100, help_text='Percentual concluído (0-100)'),
+        ),
+        migrations.AddField(
+            model_name='simulacao',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], db_index=True, default='concluida', max_length=12),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:31
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Cópia congelada de models.normalizar_nome como era nesta migração: mudanças
+# futuras no app não podem alterar as chaves que ela grava.
+def normalizar_nome(nome):
+    decomposto = unicodedata.normalize('NFKD', str(nome))
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acento.casefold().split())
+
+
+def preencher_nome_normalizado(apps, schema_editor):
+    Cidade = apps.get_model('simulacao', 'Cidade')
+    cidades = list(Cidade.objects.only('id', 'nome'))
+    for cidade in cidades:
+        cidade.nome_normalizado = normalizar_nome(cidade.nome)
+    Cidade.objects.bulk_update(cidades, ['nome_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0005_simulacao_status_fila'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cidade',
+            name='nome_normalizado',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='Nome sem acentos e em casefold (busca case-insensitive indexada)', max_length=120),
+        ),
+        migrations.RunPython(preencher_nome_normalizado, migrations.RunPython.noop),
+    ]
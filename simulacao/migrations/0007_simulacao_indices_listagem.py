@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0006_cidade_nome_normalizado'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='simulacao',
+            options={'ordering': ['-data_criacao', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='simulacao',
+            index=models.Index(fields=['-data_criacao', '-id'], name='simulacao_data_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulacao',
+            index=models.Index(fields=['cidade', '-data_criacao', '-id'], name='simulacao_cidade_data_idx'),
+        ),
+    ]
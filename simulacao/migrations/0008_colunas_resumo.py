@@ -0,0 +1,104 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:37
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+TAMANHO_LOTE = 2000
+
+
+# Cópias congeladas de models.cenario_dos_parametros e models.resumo_do_resultado
+# como eram nesta migração: mudanças futuras no app não podem alterar o backfill.
+def _decimal(valor, casas):
+    try:
+        return Decimal(str(valor)).quantize(Decimal(casas))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def cenario_dos_parametros(parametros):
+    parametros = parametros if isinstance(parametros, dict) else {}
+    return str(parametros.get('cenario') or 'realista').strip().lower()[:20]
+
+
+def resumo_do_resultado(resultado):
+    resultado = resultado if isinstance(resultado, dict) else {}
+    n_cidades = resultado.get('n_cidades')
+    return {
+        'impacto_total': _decimal(resultado.get('impacto_total'), '0.01'),
+        'gasto_total': _decimal(resultado.get('gasto_total'), '0.01'),
+        'multiplicador': _decimal(resultado.get('multiplicador'), '0.0001'),
+        'n_cidades': n_cidades if isinstance(n_cidades, int) and n_cidades >= 0 else None,
+    }
+
+
+def preencher_colunas_resumo(apps, schema_editor):
+    """Backfill em lotes por keyset (id), sem carregar as tabelas inteiras."""
+    Simulacao = apps.get_model('simulacao', 'Simulacao')
+    Relatorio = apps.get_model('simulacao', 'Relatorio')
+
+    ultimo_id = 0
+    while True:
+        lote = list(Simulacao.objects.filter(id__gt=ultimo_id).order_by('id').only('id', 'parametros')[:TAMANHO_LOTE])
+        if not lote:
+            break
+        for simulacao in lote:
+            simulacao.cenario = cenario_dos_parametros(simulacao.parametros)
+        Simulacao.objects.bulk_update(lote, ['cenario'])
+        ultimo_id = lote[-1].id
+
+    campos = ['impacto_total', 'gasto_total', 'multiplicador', 'n_cidades']
+    ultimo_id = 0
+    while True:
+        lote = list(Relatorio.objects.filter(id__gt=ultimo_id).order_by('id').only('id', 'resultado')[:TAMANHO_LOTE])
+        if not lote:
+            break
+        for relatorio in lote:
+            for campo, valor in resumo_do_resultado(relatorio.resultado).items():
+                setattr(relatorio, campo, valor)
+        Relatorio.objects.bulk_update(lote, campos)
+        ultimo_id = lote[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0007_simulacao_indices_listagem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relatorio',
+            name='gasto_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='relatorio',
+            name='impacto_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='relatorio',
+            name='multiplicador',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='relatorio',
+            name='n_cidades',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='simulacao',
+            name='cenario',
+            field=models.CharField(default='realista', help_text="Copiado de parametros['cenario']", max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='relatorio',
+            index=models.Index(fields=['-impacto_total'], name='relatorio_impacto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='simulacao',
+            index=models.Index(fields=['cenario', '-data_criacao', '-id'], name='simulacao_cenario_data_idx'),
+        ),
+        migrations.RunPython(preencher_colunas_resumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Relatorio = apps.get_model('simulacao', 'Relatorio')
+    EstatisticaDiaria = apps.get_model('simulacao', 'EstatisticaDiaria')
+    agregados = (
+        Relatorio.objects
+        .annotate(dia=TruncDate('simulacao__data_criacao'))
+        .values('simulacao__cidade_id', 'simulacao__cenario', 'dia')
+        .annotate(quantidade=Count('id'), soma_impacto=Sum('impacto_total'), soma_gasto=Sum('gasto_total'))
+        .order_by()
+    )
+    EstatisticaDiaria.objects.bulk_create(
+        (
+            EstatisticaDiaria(
+                cidade_id=a['simulacao__cidade_id'],
+                cenario=a['simulacao__cenario'],
+                dia=a['dia'],
+                quantidade=a['quantidade'],
+                soma_impacto=a['soma_impacto'] or 0,
+                soma_gasto=a['soma_gasto'] or 0,
+            )
+            for a in agregados.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0008_colunas_resumo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cenario', models.CharField(max_length=20)),
+                ('dia', models.DateField()),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('soma_impacto', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('soma_gasto', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('cidade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='simulacao.cidade')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='estatistica_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cidade', 'cenario', 'dia'), name='estatistica_cidade_cenario_dia')],
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
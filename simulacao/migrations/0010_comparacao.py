@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0009_estatistica_diaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comparacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parametros', models.JSONField()),
+                ('estado', models.CharField(blank=True, default='', help_text='Filtro de estado usado (vazio = todos)', max_length=50)),
+                ('criterio', models.CharField(max_length=30)),
+                ('n_cidades', models.PositiveIntegerField()),
+                ('impacto_total', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('resultado', models.JSONField(help_text='Ranking completo')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+    ]
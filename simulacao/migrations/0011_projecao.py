@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0010_comparacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Projecao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parametros', models.JSONField()),
+                ('inicio', models.DateField(help_text='Primeiro dia da série')),
+                ('granularidade', models.CharField(max_length=10)),
+                ('n_pontos', models.PositiveIntegerField()),
+                ('turistas', models.BinaryField(help_text='float64 little-endian, zlib')),
+                ('impacto', models.BinaryField(help_text='float64 little-endian, zlib')),
+                ('impacto_total', models.DecimalField(decimal_places=2, max_digits=22)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('cidade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='projecoes', to='simulacao.cidade')),
+            ],
+            options={
+                'ordering': ['-criado_em', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:50
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+# Valores que estavam fixos em services quando esta migração foi escrita (congelados aqui)
+CENARIOS_INICIAIS = {
+    # nome: (multiplicador, crescimento_anual)
+    'conservador': (Decimal('0.9'), Decimal('0.01')),
+    'realista': (Decimal('1.0'), Decimal('0.03')),
+    'otimista': (Decimal('1.15'), Decimal('0.06')),
+}
+
+
+def criar_versao_inicial(apps, schema_editor):
+    """Versão 1 com os valores que estavam fixos no código; relatórios existentes foram calculados com ela."""
+    VersaoCoeficientes = apps.get_model('simulacao', 'VersaoCoeficientes')
+    CenarioCoeficiente = apps.get_model('simulacao', 'CenarioCoeficiente')
+    Relatorio = apps.get_model('simulacao', 'Relatorio')
+
+    versao = VersaoCoeficientes.objects.create(
+        descricao='Valores originais',
+        ativa=True,
+        ajuste_por_cidade=Decimal('0.02'),
+        ajuste_cidades_max=Decimal('0.10'),
+        dias_sem_desconto=10,
+        desconto_por_dia=Decimal('0.02'),
+        desconto_max=Decimal('0.25'),
+    )
+    CenarioCoeficiente.objects.bulk_create([
+        CenarioCoeficiente(versao=versao, nome=nome, multiplicador=multiplicador, crescimento_anual=crescimento)
+        for nome, (multiplicador, crescimento) in CENARIOS_INICIAIS.items()
+    ])
+    Relatorio.objects.filter(versao_coeficientes__isnull=True).update(versao_coeficientes=versao)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0011_projecao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoCoeficientes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descricao', models.CharField(blank=True, default='', max_length=200)),
+                ('ativa', models.BooleanField(default=False)),
+                ('ajuste_por_cidade', models.DecimalField(decimal_places=4, default=Decimal('0.02'), help_text='Acréscimo por cidade visitada além da primeira', max_digits=6)),
+                ('ajuste_cidades_max', models.DecimalField(decimal_places=4, default=Decimal('0.10'), help_text='Teto do acréscimo por diversidade de cidades', max_digits=6)),
+                ('dias_sem_desconto', models.PositiveSmallIntegerField(default=10, help_text='Dias de estadia sem desconto')),
+                ('desconto_por_dia', models.DecimalField(decimal_places=4, default=Decimal('0.02'), help_text='Desconto por dia além de dias_sem_desconto', max_digits=6)),
+                ('desconto_max', models.DecimalField(decimal_places=4, default=Decimal('0.25'), help_text='Teto do desconto por duração', max_digits=6)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizada_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'versão de coeficientes',
+                'verbose_name_plural': 'versões de coeficientes',
+                'ordering': ['-id'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('ativa', True)), fields=('ativa',), name='coeficientes_uma_ativa')],
+            },
+        ),
+        migrations.AddField(
+            model_name='relatorio',
+            name='versao_coeficientes',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='relatorios', to='simulacao.versaocoeficientes'),
+        ),
+        migrations.CreateModel(
+            name='CenarioCoeficiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=20)),
+                ('multiplicador', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('crescimento_anual', models.DecimalField(decimal_places=4, default=Decimal('0'), help_text='Crescimento anual do fluxo usado nas projeções', max_digits=6)),
+                ('versao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cenarios', to='simulacao.versaocoeficientes')),
+            ],
+            options={
+                'verbose_name': 'cenário',
+                'ordering': ['versao', 'multiplicador', 'nome'],
+                'constraints': [models.UniqueConstraint(fields=('versao', 'nome'), name='cenario_versao_nome')],
+            },
+        ),
+        migrations.RunPython(criar_versao_inicial, migrations.RunPython.noop),
+    ]
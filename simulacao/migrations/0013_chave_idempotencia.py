@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0012_registro_coeficientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, unique=True)),
+                ('impressao', models.CharField(help_text='SHA-256 de método, caminho e corpo da requisição original', max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, help_text='Vazio enquanto em processamento', null=True)),
+                ('resposta', models.JSONField(blank=True, null=True)),
+                ('criada_em', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'chave de idempotência',
+                'verbose_name_plural': 'chaves de idempotência',
+            },
+        ),
+    ]
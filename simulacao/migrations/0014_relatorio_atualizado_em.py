@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copiar_criado_em(apps, schema_editor):
+    Relatorio = apps.get_model("simulacao", "Relatorio")
+    Relatorio.objects.update(atualizado_em=models.F("criado_em"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulacao', '0013_chave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relatorio',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copiar_criado_em, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,53 @@
-"""Modelagem mínima: Cidade, Simulacao, Relatorio."""
+"""Modelagem mínima: Cidade, Simulacao, Relatorio (mais EstatisticaDiaria, Comparacao, Projecao, o registro de coeficientes e as chaves de idempotência)."""
 
 from __future__ import annotations
 
-from django.db import models
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+
+
+def _decimal(valor, casas: str) -> Decimal | None:
+    try:
+        return Decimal(str(valor)).quantize(Decimal(casas))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def cenario_dos_parametros(parametros) -> str:
+    """Cenário normalizado de ``Simulacao.parametros`` (default realista)."""
+    parametros = parametros if isinstance(parametros, dict) else {}
+    return str(parametros.get("cenario") or "realista").strip().lower()[:20]
+
+
+def resumo_do_resultado(resultado) -> dict:
+    """Campos tipados de ``Relatorio.resultado`` copiados para colunas próprias."""
+    resultado = resultado if isinstance(resultado, dict) else {}
+    n_cidades = resultado.get("n_cidades")
+    versao = resultado.get("versao_coeficientes")
+    return {
+        "impacto_total": _decimal(resultado.get("impacto_total"), "0.01"),
+        "gasto_total": _decimal(resultado.get("gasto_total"), "0.01"),
+        "multiplicador": _decimal(resultado.get("multiplicador"), "0.0001"),
+        "n_cidades": n_cidades if isinstance(n_cidades, int) and n_cidades >= 0 else None,
+        "versao_coeficientes_id": versao if isinstance(versao, int) else None,
+    }
+
+
+def normalizar_nome(nome: str) -> str:
+    """Chave de busca de cidade: sem acentos, casefold e espaços colapsados."""
+    decomposto = unicodedata.normalize("NFKD", str(nome))
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
 
 
 class Cidade(models.Model):
     nome = models.CharField(max_length=120, unique=True)
+    nome_normalizado = models.CharField(
+        max_length=120, db_index=True, editable=False, default="",
+        help_text="Nome sem acentos e em casefold (busca case-insensitive indexada)",
+    )
     populacao = models.PositiveIntegerField()
     pib_per_capita = models.DecimalField(max_digits=12, decimal_places=2)
     estado = models.CharField(max_length=50, default="Pará", help_text="Unidade federativa (default Pará)")
@@ -17,26 +58,274 @@ class Cidade(models.Model):
     def __str__(self) -> str:
         return self.nome
 
+    def save(self, *args, **kwargs):
+        self.nome_normalizado = normalizar_nome(self.nome)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "nome" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "nome_normalizado"}
+        super().save(*args, **kwargs)
+
 
 class Simulacao(models.Model):
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PROCESSANDO = "processando", "Processando"
+        CONCLUIDA = "concluida", "Concluída"
+        ERRO = "erro", "Erro"
+
     cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, related_name="simulacoes")
     data_criacao = models.DateTimeField(auto_now_add=True)
     parametros = models.JSONField()
+    parametros_hash = models.CharField(
+        max_length=64, blank=True, default="", db_index=True,
+        help_text="SHA-256 dos parâmetros normalizados (deduplicação)",
+    )
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.CONCLUIDA, db_index=True)
+    progresso = models.PositiveSmallIntegerField(default=100, help_text="Percentual concluído (0-100)")
+    erro = models.TextField(blank=True, default="")
+    iniciado_em = models.DateTimeField(null=True, blank=True, help_text="Quando um worker assumiu o processamento")
+    cenario = models.CharField(max_length=20, default="realista", help_text="Copiado de parametros['cenario']")
 
     class Meta:
-        ordering = ["-data_criacao"]
+        ordering = ["-data_criacao", "-id"]
+        indexes = [
+            # Paginação por keyset em (data_criacao, id), com e sem filtro de cidade
+            models.Index(fields=["-data_criacao", "-id"], name="simulacao_data_id_idx"),
+            models.Index(fields=["cidade", "-data_criacao", "-id"], name="simulacao_cidade_data_idx"),
+            models.Index(fields=["cenario", "-data_criacao", "-id"], name="simulacao_cenario_data_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Simulação {self.id} - {self.cidade.nome}"
 
+    def preencher_resumo(self) -> None:
+        """Copia o cenário dos parâmetros para a coluna indexada.
+
+        Chamado por ``save()``; quem usa ``bulk_create`` deve chamá-lo antes.
+        """
+        self.cenario = cenario_dos_parametros(self.parametros)
+
+    def save(self, *args, **kwargs):
+        self.preencher_resumo()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parametros" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "cenario"}
+        super().save(*args, **kwargs)
+
+
+class VersaoCoeficientes(models.Model):
+    """Versão do registro de cenários e coeficientes de ajuste do cálculo.
+
+    Só uma versão fica ativa por vez (``ativar``). Versões já usadas em
+    relatórios não devem ser editadas: crie uma nova (o admin oferece
+    "duplicar") para que cada relatório continue apontando para os valores
+    com que foi calculado.
+    """
+
+    descricao = models.CharField(max_length=200, blank=True, default="")
+    ativa = models.BooleanField(default=False)
+    ajuste_por_cidade = models.DecimalField(max_digits=6, decimal_places=4, default=Decimal("0.02"),
+                                            help_text="Acréscimo por cidade visitada além da primeira")
+    ajuste_cidades_max = models.DecimalField(max_digits=6, decimal_places=4, default=Decimal("0.10"),
+                                             help_text="Teto do acréscimo por diversidade de cidades")
+    dias_sem_desconto = models.PositiveSmallIntegerField(default=10, help_text="Dias de estadia sem desconto")
+    desconto_por_dia = models.DecimalField(max_digits=6, decimal_places=4, default=Decimal("0.02"),
+                                           help_text="Desconto por dia além de dias_sem_desconto")
+    desconto_max = models.DecimalField(max_digits=6, decimal_places=4, default=Decimal("0.25"),
+                                       help_text="Teto do desconto por duração")
+    criada_em = models.DateTimeField(auto_now_add=True)
+    atualizada_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "versão de coeficientes"
+        verbose_name_plural = "versões de coeficientes"
+        ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(fields=["ativa"], condition=models.Q(ativa=True), name="coeficientes_uma_ativa"),
+        ]
+
+    def __str__(self) -> str:
+        return f"v{self.id}{' (ativa)' if self.ativa else ''} {self.descricao}".strip()
+
+    def ativar(self) -> None:
+        """Torna esta a única versão ativa."""
+        with transaction.atomic():
+            VersaoCoeficientes.objects.filter(ativa=True).exclude(id=self.id).update(ativa=False)
+            self.ativa = True
+            self.save(update_fields=["ativa", "atualizada_em"])
+
+    def duplicar(self, descricao: str = "") -> "VersaoCoeficientes":
+        """Cópia inativa desta versão e de seus cenários, para edição."""
+        with transaction.atomic():
+            nova = VersaoCoeficientes.objects.create(
+                descricao=descricao or f"Cópia de v{self.id}",
+                ajuste_por_cidade=self.ajuste_por_cidade,
+                ajuste_cidades_max=self.ajuste_cidades_max,
+                dias_sem_desconto=self.dias_sem_desconto,
+                desconto_por_dia=self.desconto_por_dia,
+                desconto_max=self.desconto_max,
+            )
+            CenarioCoeficiente.objects.bulk_create([
+                CenarioCoeficiente(versao=nova, nome=c.nome, multiplicador=c.multiplicador, crescimento_anual=c.crescimento_anual)
+                for c in self.cenarios.all()
+            ])
+        return nova
+
+
+class CenarioCoeficiente(models.Model):
+    versao = models.ForeignKey(VersaoCoeficientes, on_delete=models.CASCADE, related_name="cenarios")
+    nome = models.CharField(max_length=20)
+    multiplicador = models.DecimalField(max_digits=8, decimal_places=4)
+    crescimento_anual = models.DecimalField(max_digits=6, decimal_places=4, default=Decimal("0"),
+                                            help_text="Crescimento anual do fluxo usado nas projeções")
+
+    class Meta:
+        verbose_name = "cenário"
+        ordering = ["versao", "multiplicador", "nome"]
+        constraints = [
+            models.UniqueConstraint(fields=["versao", "nome"], name="cenario_versao_nome"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.nome} ({self.multiplicador})"
+
+    def save(self, *args, **kwargs):
+        self.nome = self.nome.strip().lower()
+        super().save(*args, **kwargs)
+
 
 class Relatorio(models.Model):
+    CAMPOS_RESUMO = ("impacto_total", "gasto_total", "multiplicador", "n_cidades", "versao_coeficientes")
+
     simulacao = models.OneToOneField(Simulacao, on_delete=models.CASCADE, related_name="relatorio")
     resultado = models.JSONField()
     criado_em = models.DateTimeField(auto_now_add=True)
+    # Muda quando resultado é regravado (recálculo); entra no ETag de api_resultado
+    atualizado_em = models.DateTimeField(auto_now=True)
+    # Cópias tipadas de resultado, para filtrar/ordenar/agregar em SQL
+    impacto_total = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    gasto_total = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    multiplicador = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    n_cidades = models.PositiveIntegerField(null=True, blank=True)
+    # Versão dos coeficientes usada no cálculo (copiada de resultado["versao_coeficientes"])
+    versao_coeficientes = models.ForeignKey(
+        VersaoCoeficientes, on_delete=models.PROTECT, null=True, blank=True, related_name="relatorios",
+    )
+
+    class Meta:
+        # Índices só para as consultas que existem:
+        # - impacto_total: ranking global e impacto_min/impacto_max de api_simulacoes/api_exportar.
+        # - Top-N de uma cidade: filtra simulacao.cidade_id (índice da FK), junta por
+        #   simulacao_id (único) e ordena só as linhas da cidade. Um índice composto
+        #   (cidade, -impacto_total) exigiria copiar cidade para cá e mantê-la em todos
+        #   os caminhos de gravação (lote, fila, recálculo, admin).
+        # - gasto_total, multiplicador e n_cidades: nenhuma consulta filtra ou ordena
+        #   por eles; só são lidos junto da linha ou somados em varreduras completas
+        #   (estatisticas.reconstruir), em que um índice não ajuda e custaria em
+        #   cada inserção do lote.
+        indexes = [
+            models.Index(fields=["-impacto_total"], name="relatorio_impacto_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Relatório Simulação {self.simulacao_id}"
 
+    def preencher_resumo(self) -> None:
+        """Copia impacto_total, gasto_total, multiplicador, n_cidades e a versão dos coeficientes do JSON.
+
+        Chamado por ``save()``; quem usa ``bulk_create``/``bulk_update`` deve chamá-lo antes.
+        """
+        resumo = resumo_do_resultado(self.resultado)
+        if resumo["versao_coeficientes_id"] is None:
+            # Resultados anteriores ao registro não trazem a versão: mantém a do backfill
+            del resumo["versao_coeficientes_id"]
+        for campo, valor in resumo.items():
+            setattr(self, campo, valor)
+
+    def save(self, *args, **kwargs):
+        self.preencher_resumo()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "resultado" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *self.CAMPOS_RESUMO}
+        super().save(*args, **kwargs)
+
+
+class EstatisticaDiaria(models.Model):
+    """Agregado por cidade × cenário × dia, mantido em ``simulacao.estatisticas``."""
+
+    cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, related_name="estatisticas")
+    cenario = models.CharField(max_length=20)
+    dia = models.DateField()
+    quantidade = models.PositiveIntegerField(default=0)
+    soma_impacto = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    soma_gasto = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cidade", "cenario", "dia"], name="estatistica_cidade_cenario_dia"),
+        ]
+        indexes = [
+            models.Index(fields=["dia"], name="estatistica_dia_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.cidade_id} / {self.cenario} / {self.dia}: {self.quantidade}"
+
+
+class Comparacao(models.Model):
+    """Um pacote aplicado a todas as cidades, gravado como um único registro."""
+
+    parametros = models.JSONField()
+    estado = models.CharField(max_length=50, blank=True, default="", help_text="Filtro de estado usado (vazio = todos)")
+    criterio = models.CharField(max_length=30)
+    n_cidades = models.PositiveIntegerField()
+    impacto_total = models.DecimalField(max_digits=20, decimal_places=2)
+    resultado = models.JSONField(help_text="Ranking completo")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-criado_em", "-id"]
+
+    def __str__(self) -> str:
+        return f"Comparação {self.id} ({self.n_cidades} cidades)"
+
+
+class Projecao(models.Model):
+    """Série temporal de impacto; as séries ficam empacotadas (``projecao.empacotar``)."""
+
+    cidade = models.ForeignKey(Cidade, on_delete=models.CASCADE, null=True, blank=True, related_name="projecoes")
+    parametros = models.JSONField()
+    inicio = models.DateField(help_text="Primeiro dia da série")
+    granularidade = models.CharField(max_length=10)
+    n_pontos = models.PositiveIntegerField()
+    turistas = models.BinaryField(help_text="float64 little-endian, zlib")
+    impacto = models.BinaryField(help_text="float64 little-endian, zlib")
+    impacto_total = models.DecimalField(max_digits=22, decimal_places=2)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-criado_em", "-id"]
+
+    def __str__(self) -> str:
+        return f"Projeção {self.id} ({self.n_pontos} pontos {self.granularidade})"
+
+
+class ChaveIdempotencia(models.Model):
+    """Resposta guardada para um ``Idempotency-Key`` (ver ``simulacao.idempotencia``)."""
+
+    chave = models.CharField(max_length=255, unique=True)
+    impressao = models.CharField(max_length=64, help_text="SHA-256 de método, caminho e corpo da requisição original")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Vazio enquanto em processamento")
+    resposta = models.JSONField(null=True, blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "chave de idempotência"
+        verbose_name_plural = "chaves de idempotência"
+
+    def __str__(self) -> str:
+        return f"{self.chave} ({self.status_code or 'em processamento'})"
+
 
 ## Modelo ImpactoEconomico removido (fora do escopo atual).
\ No newline at end of file
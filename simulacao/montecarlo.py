@@ -0,0 +1,227 @@
+"""Modo Monte Carlo: propaga a incerteza dos parâmetros até o impacto_total.
+
+Cada parâmetro numérico pode ser um valor fixo ou uma distribuição
+(normal, triangular, uniforme). As amostras são geradas em blocos de tamanho
+fixo, cada um com uma semente derivada de ``SeedSequence(semente).spawn``, e os
+blocos podem ser avaliados em paralelo num pool de processos. Como a divisão em
+blocos não depende do número de workers, o resultado é reprodutível para uma
+mesma semente qualquer que seja o paralelismo usado.
+
+Este módulo não depende do Django para poder rodar dentro dos workers.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .services import COEFICIENTES_PADRAO, Coeficientes, ParametrosInvalidos, calcular_impacto_lote
+
+TAMANHO_BLOCO = 250_000
+# Abaixo disso o custo de enviar os blocos aos processos supera o ganho
+MIN_AMOSTRAS_PARALELO = 2_000_000
+PERCENTIS = (5, 50, 95)
+
+# Limites inferiores aplicados às amostras (distribuições normais podem gerar
+# valores fora do domínio do modelo)
+MINIMOS = {
+    'numero_turistas': 1,
+    'gasto_medio': 0.0,
+    'duracao_estadia': 1,
+    'multiplicador': 1e-4,
+}
+INTEIROS = {'numero_turistas', 'duracao_estadia'}
+# Valores fixos seguem as regras de calcular_impacto_economico: abaixo do
+# mínimo são recusados (só as amostras sorteadas são limitadas por MINIMOS)
+ERROS_MINIMO = {
+    'numero_turistas': "numero_turistas deve ser > 0",
+    'gasto_medio': "gasto_medio não pode ser negativo",
+    'duracao_estadia': "duracao_estadia deve ser > 0",
+    'multiplicador': "multiplicador deve ser > 0",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+
+
+def _validar_distribuicao(nome: str, espec: Any) -> Dict[str, Any]:
+    """Normaliza a especificação de um parâmetro em ``{'distribuicao': ..., ...}``."""
+    if not isinstance(espec, dict):
+        try:
+            valor = float(espec)
+        except (TypeError, ValueError):
+            raise ParametrosInvalidos(f"{nome}: valor inválido")
+        if not math.isfinite(valor):
+            raise ParametrosInvalidos(f"{nome}: valor deve ser finito")
+        abaixo = valor <= 0 if nome == 'multiplicador' else valor < MINIMOS[nome]
+        if abaixo:
+            raise ParametrosInvalidos(ERROS_MINIMO[nome])
+        return {'distribuicao': 'fixo', 'valor': valor}
+    tipo = str(espec.get('distribuicao', '')).lower()
+    campos = {
+        'normal': ('media', 'desvio'),
+        'triangular': ('minimo', 'moda', 'maximo'),
+        'uniforme': ('minimo', 'maximo'),
+    }
+    if tipo not in campos:
+        raise ParametrosInvalidos(f"{nome}: distribuicao inválida (use normal|triangular|uniforme)")
+    try:
+        valores = {c: float(espec[c]) for c in campos[tipo]}
+    except KeyError as e:
+        raise ParametrosInvalidos(f"{nome}: campo {e} ausente para distribuicao {tipo}")
+    except (TypeError, ValueError):
+        raise ParametrosInvalidos(f"{nome}: valores da distribuicao devem ser numéricos")
+    if not all(math.isfinite(v) for v in valores.values()):
+        raise ParametrosInvalidos(f"{nome}: valores da distribuicao devem ser finitos")
+    if tipo == 'normal' and valores['desvio'] < 0:
+        raise ParametrosInvalidos(f"{nome}: desvio não pode ser negativo")
+    if tipo == 'triangular' and not (valores['minimo'] <= valores['moda'] <= valores['maximo'] and valores['minimo'] < valores['maximo']):
+        raise ParametrosInvalidos(f"{nome}: use minimo <= moda <= maximo (com minimo < maximo)")
+    if tipo == 'uniforme' and valores['maximo'] < valores['minimo']:
+        raise ParametrosInvalidos(f"{nome}: maximo deve ser >= minimo")
+    return {'distribuicao': tipo, **valores}
+
+
+def montar_modelo(parametros: Dict[str, Any], coeficientes: Optional[Coeficientes] = None) -> Dict[str, Any]:
+    """Valida a especificação e devolve um modelo serializável para os workers.
+
+    Além das distribuições, aceita ``cidades_visitadas`` (int ou lista, fixo),
+    ``cenario`` (usado quando ``multiplicador`` não é informado), ``amostras``,
+    ``semente`` e ``bins`` do histograma.
+    """
+    obrigatorios = ['numero_turistas', 'gasto_medio', 'duracao_estadia', 'cidades_visitadas']
+    faltando = [c for c in obrigatorios if c not in parametros]
+    if faltando:
+        raise ParametrosInvalidos(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    coeficientes = coeficientes or COEFICIENTES_PADRAO
+    cenario = str(parametros.get('cenario', 'realista')).lower()
+    coeficientes.validar_cenario(cenario)
+
+    cidades_raw = parametros['cidades_visitadas']
+    if isinstance(cidades_raw, (list, tuple)):
+        n_cidades = len([c for c in cidades_raw if str(c).strip()])
+    else:
+        try:
+            n_cidades = int(cidades_raw)
+        except (TypeError, ValueError):
+            raise ParametrosInvalidos("cidades_visitadas deve ser int ou lista")
+    if n_cidades <= 0:
+        raise ParametrosInvalidos("cidades_visitadas deve conter pelo menos 1 cidade")
+
+    try:
+        amostras = int(parametros.get('amostras', 100_000))
+        semente = int(parametros.get('semente', 0))
+        bins = int(parametros.get('bins', 50))
+    except (TypeError, ValueError):
+        raise ParametrosInvalidos("amostras, semente e bins devem ser inteiros")
+    if amostras <= 0:
+        raise ParametrosInvalidos("amostras deve ser > 0")
+    if semente < 0:
+        raise ParametrosInvalidos("semente não pode ser negativa")
+    if not 1 <= bins <= 1000:
+        raise ParametrosInvalidos("bins deve estar entre 1 e 1000")
+
+    multiplicador = parametros.get('multiplicador')
+    if multiplicador is None:
+        multiplicador = coeficientes.cenarios[cenario]
+
+    return {
+        'distribuicoes': {
+            'numero_turistas': _validar_distribuicao('numero_turistas', parametros['numero_turistas']),
+            'gasto_medio': _validar_distribuicao('gasto_medio', parametros['gasto_medio']),
+            'duracao_estadia': _validar_distribuicao('duracao_estadia', parametros['duracao_estadia']),
+            'multiplicador': _validar_distribuicao('multiplicador', multiplicador),
+        },
+        'n_cidades': n_cidades,
+        'cenario': cenario,
+        'amostras': amostras,
+        'semente': semente,
+        'bins': bins,
+        'coeficientes': coeficientes,
+    }
+
+
+def _amostrar(rng: np.random.Generator, espec: Dict[str, Any], tamanho: int) -> np.ndarray:
+    tipo = espec['distribuicao']
+    if tipo == 'fixo':
+        return np.full(tamanho, espec['valor'])
+    if tipo == 'normal':
+        return rng.normal(espec['media'], espec['desvio'], tamanho)
+    if tipo == 'triangular':
+        return rng.triangular(espec['minimo'], espec['moda'], espec['maximo'], tamanho)
+    return rng.uniform(espec['minimo'], espec['maximo'], tamanho)
+
+
+def _avaliar_bloco(modelo: Dict[str, Any], semente_bloco: np.random.SeedSequence, tamanho: int) -> np.ndarray:
+    """Gera as amostras de um bloco e devolve os impacto_total correspondentes."""
+    rng = np.random.default_rng(semente_bloco)
+    colunas = {}
+    for nome, espec in modelo['distribuicoes'].items():
+        valores = np.maximum(_amostrar(rng, espec, tamanho), MINIMOS[nome])
+        colunas[nome] = np.rint(valores).astype(np.int64) if nome in INTEIROS else valores
+    return calcular_impacto_lote(
+        colunas['numero_turistas'],
+        colunas['gasto_medio'],
+        colunas['duracao_estadia'],
+        modelo['n_cidades'],
+        colunas['multiplicador'],
+        modelo.get('coeficientes'),
+    )['impacto_total']
+
+
+def _obter_executor(workers: int) -> ProcessPoolExecutor:
+    """Pool de processos reutilizado entre chamadas (recriado se workers mudar)."""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+def simular_monte_carlo(modelo: Dict[str, Any], workers: Optional[int] = None, tamanho_bloco: int = TAMANHO_BLOCO) -> Dict[str, Any]:
+    """Executa o Monte Carlo descrito por ``montar_modelo`` e resume impacto_total.
+
+    ``workers`` <= 1 avalia os blocos no processo atual; acima disso usa um
+    pool de processos. Sem ``workers``, usa todos os núcleos a partir de
+    MIN_AMOSTRAS_PARALELO amostras. O resultado é o mesmo em todos os casos.
+    """
+    amostras = modelo['amostras']
+    if workers is None:
+        workers = (os.cpu_count() or 1) if amostras >= MIN_AMOSTRAS_PARALELO else 1
+    tamanhos = [min(tamanho_bloco, amostras - inicio) for inicio in range(0, amostras, tamanho_bloco)]
+    sementes = np.random.SeedSequence(modelo['semente']).spawn(len(tamanhos))
+
+    if workers <= 1 or len(tamanhos) == 1:
+        blocos = [_avaliar_bloco(modelo, s, t) for s, t in zip(sementes, tamanhos)]
+    else:
+        executor = _obter_executor(min(workers, len(tamanhos)))
+        blocos = list(executor.map(_avaliar_bloco, [modelo] * len(tamanhos), sementes, tamanhos))
+    impacto = np.concatenate(blocos)
+
+    contagens, bordas = np.histogram(impacto, bins=modelo['bins'])
+    percentis = np.percentile(impacto, PERCENTIS)
+    return {
+        'amostras': int(amostras),
+        'semente': modelo['semente'],
+        'cenario': modelo['cenario'],
+        'n_cidades': modelo['n_cidades'],
+        'impacto_total': {
+            'media': round(float(impacto.mean()), 2),
+            'desvio': round(float(impacto.std()), 2),
+            'minimo': round(float(impacto.min()), 2),
+            'maximo': round(float(impacto.max()), 2),
+            **{f'p{p}': round(float(v), 2) for p, v in zip(PERCENTIS, percentis)},
+        },
+        'histograma': {
+            'bordas': [round(float(b), 2) for b in bordas],
+            'contagens': contagens.tolist(),
+        },
+        'ok': True,
+    }
@@ -0,0 +1,53 @@
+"""Paginação por keyset (cursor) em (data_criacao, id), ordem decrescente.
+
+Ao contrário de OFFSET, cada página é uma busca de intervalo no índice
+composto, com custo constante independentemente da profundidade.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado."""
+
+
+def codificar_cursor(data_criacao: datetime, pk: int) -> str:
+    bruto = json.dumps([data_criacao.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        data_iso, pk = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+        data = parse_datetime(data_iso)
+        if data is None:
+            raise ValueError(data_iso)
+        return data, int(pk)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise CursorInvalido(f"cursor inválido: {e}")
+
+
+def paginar(queryset: QuerySet, cursor: Optional[str], limite: int) -> tuple[list, Optional[str]]:
+    """Retorna ``(itens, proximo_cursor)`` de ``queryset`` após ``cursor``.
+
+    ``queryset`` é reordenado por (-data_criacao, -id); ``proximo_cursor`` é None
+    na última página. Lança CursorInvalido.
+    """
+    queryset = queryset.order_by("-data_criacao", "-id")
+    if cursor:
+        data, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(data_criacao__lt=data) | Q(data_criacao=data, id__lt=pk))
+    itens = list(queryset[:limite + 1])
+    if len(itens) <= limite:
+        return itens, None
+    itens = itens[:limite]
+    return itens, codificar_cursor(itens[-1].data_criacao, itens[-1].id)
@@ -0,0 +1,86 @@
+"""Trechos cronometrados por requisição, reportados no cabeçalho ``Server-Timing``.
+
+``PerfilMiddleware`` (ver ``simulacao.middleware``) abre uma ``Coleta`` por
+requisição num ContextVar; ``trecho(nome)`` soma a duração do bloco nessa
+coleta e o middleware soma ali também as consultas SQL e o tempo de banco.
+Fora de uma coleta (middleware desligado, comandos, workers) ``trecho``
+devolve um context manager vazio: o custo é uma leitura do ContextVar.
+
+Não depende do Django, para poder ser usado em ``services``.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
+
+
+class Coleta:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        # nome -> [segundos, chamadas], na ordem em que apareceram
+        self.trechos: Dict[str, List[float]] = {}
+        self.consultas = 0
+        self.tempo_banco = 0.0
+
+    def somar(self, nome: str, duracao: float) -> None:
+        acumulado = self.trechos.setdefault(nome, [0.0, 0])
+        acumulado[0] += duracao
+        acumulado[1] += 1
+
+    def somar_consulta(self, duracao: float) -> None:
+        self.consultas += 1
+        self.tempo_banco += duracao
+
+    def server_timing(self) -> str:
+        """Valor do cabeçalho ``Server-Timing`` (durações em ms)."""
+        metricas = []
+        for nome, (duracao, chamadas) in self.trechos.items():
+            descricao = f';desc="{chamadas}x"' if chamadas > 1 else ''
+            metricas.append(f'{nome};dur={duracao * 1000:.2f}{descricao}')
+        metricas.append(f'db;dur={self.tempo_banco * 1000:.2f};desc="{self.consultas} consultas"')
+        metricas.append(f'total;dur={(time.perf_counter() - self.inicio) * 1000:.2f}')
+        return ', '.join(metricas)
+
+
+class _Trecho:
+    __slots__ = ('coleta', 'nome', 'inicio')
+
+    def __init__(self, coleta: Coleta, nome: str):
+        self.coleta = coleta
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.coleta.somar(self.nome, time.perf_counter() - self.inicio)
+        return False
+
+
+_coleta: ContextVar[Optional[Coleta]] = ContextVar('simulacao_perfil', default=None)
+_NULO = nullcontext()
+
+
+def trecho(nome: str):
+    """Context manager que cronometra o bloco como ``nome`` na coleta da requisição."""
+    coleta = _coleta.get()
+    if coleta is None:
+        return _NULO
+    return _Trecho(coleta, nome)
+
+
+def atual() -> Optional[Coleta]:
+    return _coleta.get()
+
+
+def iniciar() -> Tuple[Coleta, Token]:
+    coleta = Coleta()
+    return coleta, _coleta.set(coleta)
+
+
+def encerrar(token: Token) -> None:
+    _coleta.reset(token)
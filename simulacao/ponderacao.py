@@ -0,0 +1,77 @@
+"""Pesos por cidade para a ponderação do impacto (populacao | pib).
+
+Os pesos vêm do catálogo em memória (uma consulta carrega todas as cidades)
+e os vetores já montados ficam num LRU indexado pela versão do catálogo, de
+modo que simulações com várias cidades não fazem consultas por cidade e uma
+recarga do catálogo (ex.: novo censo importado) descarta os vetores antigos.
+
+``resolver_pesos`` grava os pesos em ``parametros['pesos']``: o cálculo em
+``services`` continua sem depender do Django, o hash de deduplicação passa a
+refletir os dados usados e a simulação pode ser recalculada depois.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from . import catalogo
+from .services import PONDERACOES, ParametrosInvalidos
+
+PONDERACOES_CADASTRO = {'populacao', 'pib'}
+
+
+def _peso(info: catalogo.CidadeInfo, modo: str) -> float:
+    if modo == 'populacao':
+        return float(info.populacao)
+    # PIB do município = população × PIB per capita
+    return float(info.pib_per_capita * info.populacao)
+
+
+@lru_cache(maxsize=1024)
+def _vetor_pesos(versao: int, modo: str, nomes: Tuple[str, ...]) -> Tuple[Optional[float], ...]:
+    """Pesos na ordem de ``nomes`` (None para cidade fora do catálogo).
+
+    ``versao`` só entra na chave do cache: vetores de catálogos antigos
+    deixam de ser consultados e saem pelo LRU. As cidades fora do catálogo
+    são confirmadas no banco juntas, numa única consulta.
+    """
+    _, encontradas = catalogo.resolver_varios((), nomes)
+    return tuple(_peso(encontradas[nome], modo) if nome in encontradas else None for nome in nomes)
+
+
+def cidades_ponderadas(parametros: Dict[str, Any]) -> Tuple[str, ...]:
+    """Nomes que ``resolver_pesos`` vai procurar no cadastro (vazio se não houver)."""
+    ponderacao = str(parametros.get('ponderacao') or 'uniforme').strip().lower()
+    cidades = parametros.get('cidades_visitadas')
+    if ponderacao not in PONDERACOES_CADASTRO or not isinstance(cidades, (list, tuple)):
+        return ()
+    return tuple(dict.fromkeys(str(c).strip() for c in cidades if str(c).strip()))
+
+
+def resolver_pesos(parametros: Dict[str, Any],
+                   conhecidas: Optional[Dict[str, catalogo.CidadeInfo]] = None) -> Dict[str, Any]:
+    """Preenche ``pesos`` para ponderacao populacao/pib a partir do cadastro.
+
+    Devolve um novo dict (ou o mesmo, se não houver o que resolver). Lança
+    ParametrosInvalidos para modo inválido ou cidades fora do cadastro. Com
+    ``conhecidas`` (nome -> cidade, de ``catalogo.resolver_varios``) os nomes
+    são procurados só nesse dicionário, sem consultar o banco.
+    """
+    ponderacao = str(parametros.get('ponderacao') or 'uniforme').strip().lower()
+    if ponderacao not in PONDERACOES:
+        raise ParametrosInvalidos(f"ponderacao inválida (use {'|'.join(PONDERACOES)})")
+    if ponderacao not in PONDERACOES_CADASTRO:
+        return parametros
+    cidades = parametros.get('cidades_visitadas')
+    if not isinstance(cidades, (list, tuple)):
+        raise ParametrosInvalidos(f"ponderacao {ponderacao} exige cidades_visitadas como lista de nomes")
+    nomes = cidades_ponderadas(parametros)
+    if conhecidas is None:
+        pesos = _vetor_pesos(catalogo.versao(), ponderacao, nomes)
+    else:
+        pesos = tuple(_peso(conhecidas[nome], ponderacao) if nome in conhecidas else None for nome in nomes)
+    desconhecidas = [nome for nome, peso in zip(nomes, pesos) if peso is None]
+    if desconhecidas:
+        raise ParametrosInvalidos(f"Cidades não cadastradas para ponderacao {ponderacao}: {', '.join(desconhecidas)}")
+    return {**parametros, 'ponderacao': ponderacao, 'pesos': dict(zip(nomes, pesos))}
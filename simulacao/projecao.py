@@ -0,0 +1,211 @@
+"""Projeção do impacto em série temporal (mensal ou diária) com sazonalidade.
+
+``numero_turistas`` passa a ser o fluxo anual no início da projeção. O fluxo é
+repartido pelos meses conforme uma curva sazonal (12 pesos) e cresce à taxa
+anual do cenário (ou ``crescimento_anual``). Como o modelo é linear no número
+de turistas, o impacto de cada período é o impacto anual de
+``calcular_impacto_lote`` vezes a fração do fluxo anual que cai no período:
+toda a série sai de operações sobre arrays, sem laço por dia.
+
+As séries são guardadas como float64 little-endian comprimidos com zlib
+(``empacotar``) e podem ser reagregadas por período e reduzidas a N pontos
+com LTTB (Largest-Triangle-Three-Buckets) para gráficos.
+
+Este módulo não depende do Django.
+"""
+
+from __future__ import annotations
+
+import math
+import zlib
+from datetime import date
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .services import COEFICIENTES_PADRAO, Coeficientes, ParametrosInvalidos, calcular_impacto_lote
+
+# Chaves de payload próprias da projeção (além das de api_simular)
+PARAM_KEYS = {'inicio', 'horizonte_meses', 'granularidade', 'sazonalidade', 'crescimento_anual'}
+GRANULARIDADES = ('mensal', 'diaria')
+RESOLUCOES = {'diaria': 'D', 'mensal': 'M', 'trimestral': 'Q', 'anual': 'Y'}
+MAX_MESES = 600
+
+# Pesos mensais (jan..dez); normalizados para somar 1 ao longo do ano
+SAZONALIDADES = {
+    'uniforme': [1.0] * 12,
+    # Férias de janeiro e julho, Círio de Nazaré em outubro e fim de ano
+    'para': [1.1, 1.0, 0.8, 0.8, 0.8, 0.9, 1.5, 1.0, 0.8, 1.3, 0.9, 1.1],
+}
+
+
+def _curva_sazonal(especificacao: Any) -> np.ndarray:
+    if isinstance(especificacao, str):
+        if especificacao not in SAZONALIDADES:
+            raise ParametrosInvalidos(f"sazonalidade inválida (use {'|'.join(SAZONALIDADES)} ou 12 pesos)")
+        especificacao = SAZONALIDADES[especificacao]
+    try:
+        pesos = np.asarray(especificacao, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ParametrosInvalidos("sazonalidade deve ter 12 pesos numéricos")
+    if pesos.shape != (12,) or not np.isfinite(pesos).all() or (pesos < 0).any() or pesos.sum() <= 0:
+        raise ParametrosInvalidos("sazonalidade deve ter 12 pesos não negativos com soma > 0")
+    return pesos / pesos.sum()
+
+
+def _escalar(nome: str, valor: Any) -> float:
+    """Número finito; listas, objetos e NaN/inf viram ParametrosInvalidos."""
+    if isinstance(valor, (list, tuple, dict)):
+        raise ParametrosInvalidos(f"{nome} deve ser um único número")
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ParametrosInvalidos(f"{nome} deve ser numérico")
+    if not math.isfinite(numero):
+        raise ParametrosInvalidos(f"{nome} deve ser finito")
+    return numero
+
+
+def montar_projecao(parametros: Dict[str, Any], hoje: Optional[date] = None,
+                    coeficientes: Optional[Coeficientes] = None) -> Dict[str, Any]:
+    """Valida a especificação da projeção e resolve defaults.
+
+    Além dos parâmetros de ``calcular_impacto_economico`` aceita ``inicio``
+    (AAAA-MM; padrão mês atual), ``horizonte_meses`` (1..MAX_MESES, padrão 36),
+    ``granularidade`` (mensal|diaria), ``sazonalidade`` (nome ou 12 pesos) e
+    ``crescimento_anual`` (fração, ex.: 0.03; padrão o do cenário em
+    ``coeficientes``).
+    """
+    coeficientes = coeficientes or COEFICIENTES_PADRAO
+    obrigatorios = ['numero_turistas', 'gasto_medio', 'duracao_estadia', 'cidades_visitadas']
+    faltando = [c for c in obrigatorios if c not in parametros]
+    if faltando:
+        raise ParametrosInvalidos(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+    # A projeção é de um único fluxo: sem listas que o cálculo em lote espalharia
+    turistas = _escalar('numero_turistas', parametros['numero_turistas'])
+    gasto_medio = _escalar('gasto_medio', parametros['gasto_medio'])
+    duracao = _escalar('duracao_estadia', parametros['duracao_estadia'])
+
+    cenario = str(parametros.get('cenario', 'realista')).lower()
+    coeficientes.validar_cenario(cenario)
+    granularidade = str(parametros.get('granularidade', 'mensal')).lower()
+    if granularidade not in GRANULARIDADES:
+        raise ParametrosInvalidos("granularidade inválida (use mensal|diaria)")
+
+    try:
+        inicio_raw = parametros.get('inicio') or (hoje or date.today()).strftime('%Y-%m')
+        inicio = np.datetime64(str(inicio_raw)[:7], 'M')
+        horizonte = int(parametros.get('horizonte_meses', 36))
+        crescimento = _escalar('crescimento_anual', parametros.get('crescimento_anual', coeficientes.crescimento.get(cenario, 0.0)))
+        cidades_raw = parametros['cidades_visitadas']
+        if isinstance(cidades_raw, (list, tuple)):
+            n_cidades = len([c for c in cidades_raw if str(c).strip()])
+        else:
+            n_cidades = int(cidades_raw)
+        multiplicador = _escalar('multiplicador', parametros['multiplicador']) if parametros.get('multiplicador') is not None else coeficientes.cenarios[cenario]
+    except (TypeError, ValueError) as e:
+        raise ParametrosInvalidos(f"Erro ao converter parâmetros: {e}")
+    if not 1 <= horizonte <= MAX_MESES:
+        raise ParametrosInvalidos(f"horizonte_meses deve estar entre 1 e {MAX_MESES}")
+    if not -0.99 < crescimento <= 10:
+        raise ParametrosInvalidos("crescimento_anual fora do intervalo (-0.99, 10]")
+
+    # Impacto de um ano de fluxo base (valida os demais parâmetros como a função escalar)
+    base = calcular_impacto_lote(turistas, gasto_medio, duracao, n_cidades, multiplicador, coeficientes)
+    return {
+        'inicio': inicio,
+        'horizonte_meses': horizonte,
+        'granularidade': granularidade,
+        'sazonalidade': _curva_sazonal(parametros.get('sazonalidade', 'uniforme')),
+        'crescimento_anual': crescimento,
+        'turistas_ano': turistas,
+        'impacto_ano': float(base['impacto_total']),
+        'cenario': cenario,
+    }
+
+
+def datas_serie(inicio: np.datetime64, n_pontos: int, granularidade: str) -> np.ndarray:
+    """Datas (início de cada período) de uma série com ``n_pontos``."""
+    if granularidade == 'diaria':
+        return inicio.astype('datetime64[D]') + np.arange(n_pontos)
+    return inicio + np.arange(n_pontos)
+
+
+def projetar(modelo: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Gera as séries ``datas``, ``turistas`` e ``impacto`` do modelo."""
+    inicio = modelo['inicio']
+    meses = inicio + np.arange(modelo['horizonte_meses'])
+    crescimento = np.log1p(modelo['crescimento_anual'])
+    if modelo['granularidade'] == 'mensal':
+        datas = meses
+        fracao = modelo['sazonalidade'][meses.astype(np.int64) % 12]
+        anos = np.arange(datas.size) / 12.0
+    else:
+        fim = (inicio + modelo['horizonte_meses']).astype('datetime64[D]')
+        datas = np.arange(inicio.astype('datetime64[D]'), fim)
+        mes_de = datas.astype('datetime64[M]')
+        dias_no_mes = ((mes_de + 1).astype('datetime64[D]') - mes_de.astype('datetime64[D]')).astype(np.float64)
+        fracao = modelo['sazonalidade'][mes_de.astype(np.int64) % 12] / dias_no_mes
+        anos = (datas - datas[0]).astype(np.float64) / 365.25
+    fator = fracao * np.exp(crescimento * anos)
+    return {
+        'datas': datas,
+        'turistas': modelo['turistas_ano'] * fator,
+        'impacto': modelo['impacto_ano'] * fator,
+    }
+
+
+def agregar(datas: np.ndarray, colunas: Dict[str, np.ndarray], resolucao: str):
+    """Soma as colunas por período do calendário (mensal, trimestral, anual).
+
+    Retorna ``(datas_agregadas, colunas_agregadas)``; resoluções iguais ou mais
+    finas que a da série a devolvem sem alteração.
+    """
+    unidade = RESOLUCOES[resolucao]
+    if unidade == 'D' or (unidade == 'M' and datas.dtype == np.dtype('datetime64[M]')):
+        return datas, colunas
+    meses = datas.astype('datetime64[M]')
+    if unidade == 'M':
+        periodos = meses
+    elif unidade == 'Q':
+        indice = meses.astype(np.int64)
+        periodos = (indice - indice % 3).astype('datetime64[M]')
+    else:
+        periodos = datas.astype('datetime64[Y]').astype('datetime64[M]')
+    rotulos, inverso = np.unique(periodos, return_inverse=True)
+    agregadas = {nome: np.bincount(inverso, weights=valores, minlength=rotulos.size) for nome, valores in colunas.items()}
+    return rotulos, agregadas
+
+
+def lttb(y: np.ndarray, n_pontos: int) -> np.ndarray:
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets (x = posição).
+
+    Preserva picos e vales da série ao reduzir para ``n_pontos`` (>= 3);
+    séries menores são devolvidas inteiras.
+    """
+    total = y.size
+    if n_pontos >= total or n_pontos < 3:
+        return np.arange(total)
+    x = np.arange(total, dtype=np.float64)
+    limites = np.linspace(1, total - 1, n_pontos - 1).astype(np.int64)
+    indices = np.empty(n_pontos, dtype=np.int64)
+    indices[0], indices[-1] = 0, total - 1
+    anterior = 0
+    for b in range(n_pontos - 2):
+        inicio, fim = limites[b], limites[b + 1]
+        # Média do próximo bucket (ou o último ponto) como terceiro vértice
+        prox_inicio, prox_fim = fim, (limites[b + 2] if b + 2 < limites.size else total)
+        mx, my = x[prox_inicio:prox_fim].mean(), y[prox_inicio:prox_fim].mean()
+        areas = np.abs((x[anterior] - mx) * (y[inicio:fim] - y[anterior]) - (x[anterior] - x[inicio:fim]) * (my - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[b + 1] = anterior
+    return indices
+
+
+def empacotar(valores: np.ndarray) -> bytes:
+    """float64 little-endian comprimido (zlib) — ~8 bytes/ponto antes da compressão."""
+    return zlib.compress(np.ascontiguousarray(valores, dtype='<f8').tobytes(), 6)
+
+
+def desempacotar(dados: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(bytes(dados)), dtype='<f8')
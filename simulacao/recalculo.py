@@ -0,0 +1,207 @@
+"""Recálculo em massa de relatórios gravados (após mudança de coeficientes ou da fórmula).
+
+Os relatórios são percorridos por keyset (``id > último``) em lotes de
+``tamanho_lote``: cada lote é lido com uma consulta, recalculado (no próprio
+processo ou repartido entre processos de trabalho, que rodam só
+``services.recalcular_resultados``) e regravado com um ``bulk_update`` numa
+transação curta, junto com a correção de ``EstatisticaDiaria``. Nenhuma
+transação abrange mais que um lote, então as tabelas não ficam travadas e a
+memória usada depende só do tamanho do lote. Com processos, o lote seguinte é
+lido enquanto o atual é calculado.
+
+Depois de cada lote gravado o progresso (último id e totais) pode ser salvo
+num arquivo de checkpoint, do qual uma execução interrompida é retomada.
+Com ``simular`` nada é gravado e o resumo traz só as diferenças.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, estatisticas
+from .models import Relatorio, resumo_do_resultado
+from .services import Coeficientes, recalcular_resultados
+
+TAMANHO_LOTE = 1000
+MAX_AMOSTRAS = 20
+
+CAMPOS_LIDOS = (
+    'id', 'resultado', 'versao_coeficientes_id', 'simulacao__parametros', 'simulacao__parametros_hash',
+    'simulacao__cidade_id', 'simulacao__cenario', 'simulacao__data_criacao', 'simulacao_id',
+)
+
+
+class CheckpointInvalido(ValueError):
+    """Arquivo de checkpoint ilegível ou de outro recálculo (versão/escopo diferentes)."""
+
+
+@dataclass
+class ResumoRecalculo:
+    ultimo_id: int = 0
+    lidos: int = 0
+    alterados: int = 0
+    inalterados: int = 0
+    erros: int = 0
+    # Soma das diferenças de impacto_total (novo - anterior) e a maior em valor absoluto
+    delta_impacto: str = '0'
+    maior_delta: str = '0'
+    maior_delta_id: Optional[int] = None
+    amostras: List[Dict[str, Any]] = field(default_factory=list)
+
+    def como_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def somar_delta(self, relatorio_id: int, delta: Decimal) -> None:
+        self.delta_impacto = str(Decimal(self.delta_impacto) + delta)
+        if abs(delta) > abs(Decimal(self.maior_delta)):
+            self.maior_delta, self.maior_delta_id = str(delta), relatorio_id
+
+
+def consulta(coeficientes: Coeficientes, todos: bool = False):
+    """Relatórios a recalcular: os de outra versão de coeficientes (ou todos)."""
+    queryset = Relatorio.objects.all()
+    if not todos and coeficientes.versao is not None:
+        queryset = queryset.exclude(versao_coeficientes_id=coeficientes.versao)
+    return queryset
+
+
+def ler_checkpoint(caminho: str, coeficientes: Coeficientes, todos: bool) -> ResumoRecalculo:
+    """Resumo salvo em ``caminho`` (vazio se o arquivo não existe)."""
+    if not os.path.exists(caminho):
+        return ResumoRecalculo()
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        resumo = ResumoRecalculo(**dados['resumo'])
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        raise CheckpointInvalido(f"Checkpoint ilegível ({caminho}): {e}")
+    if dados.get('versao') != coeficientes.versao or dados.get('todos') != todos:
+        raise CheckpointInvalido(
+            f"Checkpoint {caminho} é de outro recálculo (versao={dados.get('versao')}, todos={dados.get('todos')})."
+        )
+    return resumo
+
+
+def salvar_checkpoint(caminho: str, resumo: ResumoRecalculo, coeficientes: Coeficientes, todos: bool) -> None:
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump({'versao': coeficientes.versao, 'todos': todos, 'resumo': resumo.como_dict()}, arquivo, ensure_ascii=False)
+    # Substituição atômica: uma interrupção no meio da escrita não corrompe o checkpoint anterior
+    os.replace(temporario, caminho)
+
+
+def _lotes(queryset, ultimo_id: int, tamanho_lote: int) -> Iterator[List[tuple]]:
+    while True:
+        lote = list(queryset.filter(id__gt=ultimo_id).order_by('id').values_list(*CAMPOS_LIDOS)[:tamanho_lote])
+        if not lote:
+            return
+        yield lote
+        ultimo_id = lote[-1][0]
+
+
+def _calcular(lote: List[tuple], coeficientes: Coeficientes, executor: Optional[ProcessPoolExecutor], partes: int):
+    """Resultados do lote (ou, com executor, uma função que espera por eles)."""
+    entradas = [(linha[0], linha[3], linha[1]) for linha in lote]
+    if executor is None:
+        calculados = recalcular_resultados(entradas, coeficientes)
+        return lambda: calculados
+    tamanho = -(-len(entradas) // partes)
+    futuros = [executor.submit(recalcular_resultados, entradas[i:i + tamanho], coeficientes) for i in range(0, len(entradas), tamanho)]
+    return lambda: [item for futuro in futuros for item in futuro.result()]
+
+
+def _aplicar_lote(lote: List[tuple], calculados: List[tuple], resumo: ResumoRecalculo, simular: bool) -> None:
+    relatorios, diferencas, chaves, simulacoes = [], [], [], []
+    agora = timezone.now()
+    for linha, (relatorio_id, novo, erro) in zip(lote, calculados):
+        _, anterior, versao_id, _, chave, cidade_id, cenario, data_criacao, simulacao_id = linha
+        resumo.lidos += 1
+        if novo is None:
+            resumo.erros += 1
+            if len(resumo.amostras) < MAX_AMOSTRAS:
+                resumo.amostras.append({'relatorio_id': relatorio_id, 'erro': erro})
+            continue
+        if novo == anterior:
+            resumo.inalterados += 1
+            continue
+        resumo.alterados += 1
+        antes, depois = resumo_do_resultado(anterior), resumo_do_resultado(novo)
+        delta_impacto = (depois['impacto_total'] or 0) - (antes['impacto_total'] or 0)
+        delta_gasto = (depois['gasto_total'] or 0) - (antes['gasto_total'] or 0)
+        resumo.somar_delta(relatorio_id, delta_impacto)
+        if delta_impacto and len(resumo.amostras) < MAX_AMOSTRAS:
+            resumo.amostras.append({
+                'relatorio_id': relatorio_id,
+                'impacto_anterior': str(antes['impacto_total']),
+                'impacto_novo': str(depois['impacto_total']),
+            })
+        relatorio = Relatorio(id=relatorio_id, resultado=novo, versao_coeficientes_id=versao_id, atualizado_em=agora)
+        relatorio.preencher_resumo()  # bulk_update não chama save()
+        relatorios.append(relatorio)
+        diferencas.append((cidade_id, cenario, data_criacao, delta_impacto, delta_gasto))
+        simulacoes.append(simulacao_id)
+        if chave:
+            chaves += [(chave, versao_id), (chave, novo.get('versao_coeficientes'))]
+    resumo.ultimo_id = lote[-1][0]
+    if simular or not relatorios:
+        return
+    with transaction.atomic():
+        Relatorio.objects.bulk_update(relatorios, ['resultado', 'atualizado_em', *Relatorio.CAMPOS_RESUMO])
+        estatisticas.ajustar(diferencas)
+    for chave, versao in chaves:
+        cache.descartar_resultado(chave, versao)
+    cache.descartar_respostas(*simulacoes)
+
+
+def recalcular(
+    coeficientes: Coeficientes,
+    todos: bool = False,
+    tamanho_lote: int = TAMANHO_LOTE,
+    workers: int = 1,
+    pausa: float = 0.0,
+    simular: bool = False,
+    checkpoint: Optional[str] = None,
+    ao_concluir_lote: Optional[Callable[[ResumoRecalculo], None]] = None,
+) -> ResumoRecalculo:
+    """Recalcula os relatórios de ``consulta(coeficientes, todos)`` lote a lote.
+
+    ``workers`` > 1 usa um pool de processos; ``pausa`` (segundos) é dormida
+    entre lotes para limitar a carga no banco. Com ``checkpoint`` retoma do
+    último lote gravado e salva o progresso após cada lote (não com ``simular``).
+    Lança CheckpointInvalido se o checkpoint for de outro recálculo.
+    """
+    resumo = ler_checkpoint(checkpoint, coeficientes, todos) if checkpoint and not simular else ResumoRecalculo()
+    queryset = consulta(coeficientes, todos)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        pendente = None
+        for lote in _lotes(queryset, resumo.ultimo_id, tamanho_lote):
+            calculo = _calcular(lote, coeficientes, executor, workers)
+            if pendente is not None:
+                _concluir(*pendente, resumo, simular, checkpoint, coeficientes, todos, pausa, ao_concluir_lote)
+            pendente = (lote, calculo)
+        if pendente is not None:
+            _concluir(*pendente, resumo, simular, checkpoint, coeficientes, todos, 0.0, ao_concluir_lote)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return resumo
+
+
+def _concluir(lote, calculo, resumo, simular, checkpoint, coeficientes, todos, pausa, ao_concluir_lote) -> None:
+    _aplicar_lote(lote, calculo(), resumo, simular)
+    if checkpoint and not simular:
+        salvar_checkpoint(checkpoint, resumo, coeficientes, todos)
+    if ao_concluir_lote is not None:
+        ao_concluir_lote(resumo)
+    if pausa > 0:
+        time.sleep(pausa)
@@ -0,0 +1,133 @@
+"""Roteamento de leituras para réplicas, com leitura das próprias escritas.
+
+``ReplicaRouter`` manda escritas para ``default`` e leituras para um dos
+aliases de ``SIMULACAO_REPLICAS`` (sorteado entre os disponíveis), exceto
+quando o contexto atual está fixado no primário:
+
+- durante requisições que escrevem (métodos não seguros) e, por
+  ``SIMULACAO_REPLICA_ATRASO`` segundos depois delas, nas requisições do mesmo
+  cliente (cookie posto por ``middleware.ReplicaMiddleware``), para que uma
+  simulação recém-criada não suma por atraso de replicação;
+- depois de qualquer escrita no mesmo contexto (comandos, workers);
+- dentro de ``primario()``.
+
+Uma réplica que não conecta fica fora do sorteio por
+``SIMULACAO_REPLICA_PAUSA`` segundos e a leitura vai para o primário; uma
+réplica SQLite cujo arquivo não existe conta como falha (o sqlite3 criaria um
+banco vazio em vez de recusar a conexão). Sem
+réplicas configuradas tudo vai para ``default``.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+PRIMARIO = "default"
+
+_fixado: ContextVar[bool] = ContextVar("simulacao_primario", default=False)
+
+
+def replicas() -> list[str]:
+    return list(getattr(settings, "SIMULACAO_REPLICAS", ()))
+
+
+def fixar(valor: bool = True) -> Token:
+    """Fixa (ou libera) o contexto atual no primário; devolva o token a ``liberar``."""
+    return _fixado.set(valor)
+
+
+def liberar(token: Token) -> None:
+    _fixado.reset(token)
+
+
+@contextmanager
+def primario():
+    """Leituras do bloco vão para o primário."""
+    token = fixar()
+    try:
+        yield
+    finally:
+        liberar(token)
+
+
+def _arquivo_sqlite_ausente(conexao) -> bool:
+    """SQLite em arquivo cujo arquivo não existe (bancos em memória não contam)."""
+    if conexao.vendor != "sqlite":
+        return False
+    nome = str(conexao.settings_dict.get("NAME") or "")
+    if not nome or nome == ":memory:" or nome.startswith("file:") or conexao.is_in_memory_db():
+        return False
+    return not os.path.exists(nome)
+
+
+class _Saude:
+    """Réplicas que falharam ao conectar, e até quando ficam fora do sorteio."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fora_ate: Dict[str, float] = {}
+
+    def disponiveis(self, aliases: list[str]) -> list[str]:
+        agora = time.monotonic()
+        with self._lock:
+            return [alias for alias in aliases if self._fora_ate.get(alias, 0.0) <= agora]
+
+    def conecta(self, alias: str) -> bool:
+        conexao = connections[alias]
+        try:
+            if conexao.connection is None and _arquivo_sqlite_ausente(conexao):
+                raise DatabaseError(f"Arquivo da réplica {alias} não existe.")
+            # Sem custo se a conexão (persistente) já está aberta nesta thread
+            conexao.ensure_connection()
+            return True
+        except DatabaseError:
+            with self._lock:
+                self._fora_ate[alias] = time.monotonic() + getattr(settings, "SIMULACAO_REPLICA_PAUSA", 30)
+            return False
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._fora_ate.clear()
+
+
+saude = _Saude()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or _fixado.get():
+            return PRIMARIO
+        candidatas = saude.disponiveis(aliases)
+        random.shuffle(candidatas)
+        for alias in candidatas:
+            if saude.conecta(alias):
+                return alias
+        return PRIMARIO
+
+    def db_for_write(self, model, **hints):
+        if replicas():
+            # Leituras seguintes no mesmo contexto enxergam esta escrita
+            _fixado.set(True)
+        return PRIMARIO
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {PRIMARIO, *replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Réplicas recebem o schema do primário (replicação ou sincronizar_replicas)
+        if db in replicas():
+            return False
+        return None
@@ -1,21 +1,80 @@
-"""Serviços de simulação (scaffolding)
+"""Cálculo do impacto econômico do turismo (sem dependência do Django).
 
-Preencha aqui a lógica de negócio quando forem implementar.
+``calcular_impacto_economico`` é a referência: valida os parâmetros de uma
+simulação e calcula em Decimal, com breakdown por cidade (compacto para
+``cidades_visitadas`` inteiro; ``expandir_resultado`` gera o mapa completo) e
+ponderação opcional por pesos. ``calcular_impacto_lote`` é a versão vetorizada
+em NumPy, usada por varredura, Monte Carlo e projeção, e coincide
+com a escalar ao centavo. ``Coeficientes`` reúne a tabela de cenários e os
+ajustes; ``COEFICIENTES_PADRAO`` tem os valores originais e o registro em
+``simulacao.coeficientes`` fornece a versão vigente.
 """
 
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
 from decimal import Decimal, ROUND_HALF_UP, getcontext
 
+import numpy as np
+
+from . import perfil
+
 # Ajusta precisão global (suficiente para valores grandes)
 getcontext().prec = 28
 
+# Acima disso expandir_resultado recusa gerar o mapa por cidade
+LIMITE_EXPANSAO = 10_000
+
+# Modos de repartir impacto_total entre as cidades visitadas
+PONDERACOES = ('uniforme', 'populacao', 'pib', 'custom')
+
+# Multiplicadores por cenário (usados quando multiplicador não é informado)
+TABELA_CENARIOS = {
+    'conservador': 0.9,
+    'realista': 1.0,
+    'otimista': 1.15,
+}
+
+# Crescimento anual do fluxo por cenário (projeção, quando crescimento_anual não é informado)
+TABELA_CRESCIMENTO = {
+    'conservador': 0.01,
+    'realista': 0.03,
+    'otimista': 0.06,
+}
+
+
+@dataclass(frozen=True)
+class Coeficientes:
+    """Cenários e coeficientes de ajuste usados no cálculo.
+
+    ``versao`` é o id da versão do registro (``VersaoCoeficientes``) de onde
+    vieram; None para os valores padrão deste módulo.
+    """
+    cenarios: Dict[str, float] = field(default_factory=lambda: dict(TABELA_CENARIOS))
+    crescimento: Dict[str, float] = field(default_factory=lambda: dict(TABELA_CRESCIMENTO))
+    # Ajuste por diversidade: + ajuste_por_cidade a cada cidade além da primeira, até ajuste_cidades_max
+    ajuste_por_cidade: float = 0.02
+    ajuste_cidades_max: float = 0.10
+    # Ajuste de estadia: - desconto_por_dia a cada dia além de dias_sem_desconto, até desconto_max
+    dias_sem_desconto: int = 10
+    desconto_por_dia: float = 0.02
+    desconto_max: float = 0.25
+    versao: Optional[int] = None
+
+    def validar_cenario(self, cenario: str) -> None:
+        if cenario not in self.cenarios:
+            raise ParametrosInvalidos(f"cenario inválido (use {'|'.join(self.cenarios)})")
+
+
+COEFICIENTES_PADRAO = Coeficientes()
+
 
 class ParametrosInvalidos(ValueError):
     """Erro de validação de parâmetros da simulação."""
     pass
 
 
-def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
+def calcular_impacto_economico(parametros: Dict[str, Any], expandir: bool = False,
+                               coeficientes: Optional[Coeficientes] = None) -> Dict[str, Any]:
     """Calcula o impacto econômico a partir de parâmetros.
 
     Parâmetros esperados:
@@ -25,10 +84,24 @@ def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
       cidades_visitadas (list[str] | int) – lista de nomes ou quantidade
       cenario (str) – conservador | realista | otimista (default: realista)
       multiplicador (float) – opcional; se não fornecido usa tabela de cenários
+      ponderacao (str) – uniforme (default) | populacao | pib | custom
+      pesos (dict[str, float] | list[float]) – peso de cada cidade, exigido
+        quando ponderacao não é uniforme (para populacao/pib a view preenche
+        a partir do cadastro de cidades)
 
-    Retorna dicionário com valores agregados e breakdown por cidade.
+    Retorna dicionário com valores agregados e breakdown por cidade. Quando
+    cidades_visitadas é um inteiro o breakdown é compacto: em vez da lista
+    "Cidade 1..N" e do mapa com N valores idênticos, o resultado traz
+    ``distribuicao = {'tipo': 'uniforme', 'n_cidades': N, 'valor_por_cidade': v}``.
+    Com ``expandir=True`` (ou via ``expandir_resultado``) gera o formato por cidade.
+    Com ponderação, cidades_visitadas deve ser lista e ``impacto_por_cidade``
+    reparte impacto_total proporcionalmente aos pesos (somando exatamente o
+    total, em centavos).
+    ``coeficientes`` substitui a tabela de cenários e os ajustes padrão; se
+    tiver versão, ela sai em ``versao_coeficientes``.
     Lança ParametrosInvalidos em caso de erro de validação.
     """
+    coeficientes = coeficientes or COEFICIENTES_PADRAO
 
     # --- Normalização de entradas ---
     try:
@@ -39,7 +112,7 @@ def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
         cidades_raw = parametros.get('cidades_visitadas', [])
         if isinstance(cidades_raw, int):
             n_cidades = cidades_raw
-            lista_cidades = [f"Cidade {i+1}" for i in range(n_cidades)]
+            lista_cidades = None
         elif isinstance(cidades_raw, (list, tuple)):
             lista_cidades = [str(c).strip() for c in cidades_raw if str(c).strip()]
             n_cidades = len(lista_cidades)
@@ -49,6 +122,7 @@ def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
 
         cenario = str(parametros.get('cenario', 'realista')).lower()
         multiplicador_input = parametros.get('multiplicador')
+        ponderacao = str(parametros.get('ponderacao') or 'uniforme').strip().lower()
     except (ValueError, TypeError) as e:
         raise ParametrosInvalidos(f"Erro ao converter parâmetros: {e}")
 
@@ -61,35 +135,41 @@ def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
         raise ParametrosInvalidos("duracao_estadia deve ser > 0")
     if n_cidades <= 0:
         raise ParametrosInvalidos("cidades_visitadas deve conter pelo menos 1 cidade")
-    if cenario not in {"conservador", "realista", "otimista"}:
-        raise ParametrosInvalidos("cenario inválido (use conservador|realista|otimista)")
+    coeficientes.validar_cenario(cenario)
+    if ponderacao not in PONDERACOES:
+        raise ParametrosInvalidos(f"ponderacao inválida (use {'|'.join(PONDERACOES)})")
+    pesos = None
+    if ponderacao != 'uniforme':
+        if lista_cidades is None:
+            raise ParametrosInvalidos(f"ponderacao {ponderacao} exige cidades_visitadas como lista de nomes")
+        pesos = _pesos_por_cidade(lista_cidades, parametros.get('pesos'))
 
     # --- Multiplicadores por cenário (se não fornecido explicitamente) ---
-    tabela_cenarios = {
-        'conservador': 0.9,
-        'realista': 1.0,
-        'otimista': 1.15,
-    }
-    multiplicador = Decimal(str(multiplicador_input)) if multiplicador_input is not None else Decimal(str(tabela_cenarios[cenario]))
+    multiplicador = Decimal(str(multiplicador_input)) if multiplicador_input is not None else Decimal(str(coeficientes.cenarios[cenario]))
     if multiplicador <= 0:
         raise ParametrosInvalidos("multiplicador deve ser > 0")
 
-    # Ajuste leve por diversidade (mais cidades => + até 10%)
-    ajuste_cidades = Decimal('1') + Decimal(str(min(0.10, 0.02 * (n_cidades - 1))))
-    # Ajuste de estadia (diminui gasto marginal após 10 dias)
-    fator_duracao = Decimal('1') - Decimal(str(min(0.25, max(0, duracao_estadia - 10) * 0.02)))
+    with perfil.trecho('decimal'):
+        # Ajuste leve por diversidade (mais cidades => + até 10% nos coeficientes padrão)
+        ajuste_cidades = Decimal('1') + min(
+            Decimal(str(coeficientes.ajuste_cidades_max)), Decimal(str(coeficientes.ajuste_por_cidade)) * (n_cidades - 1)
+        )
+        # Ajuste de estadia (diminui gasto marginal após 10 dias nos coeficientes padrão)
+        fator_duracao = Decimal('1') - min(
+            Decimal(str(coeficientes.desconto_max)),
+            Decimal(str(coeficientes.desconto_por_dia)) * max(0, duracao_estadia - coeficientes.dias_sem_desconto),
+        )
 
-    gasto_total = (Decimal(numero_turistas) * gasto_medio * Decimal(duracao_estadia))
-    gasto_ajustado = (gasto_total * ajuste_cidades * fator_duracao)
-    impacto_total = (gasto_ajustado * multiplicador)
+        gasto_total = (Decimal(numero_turistas) * gasto_medio * Decimal(duracao_estadia))
+        gasto_ajustado = (gasto_total * ajuste_cidades * fator_duracao)
+        impacto_total = (gasto_ajustado * multiplicador)
 
-    impacto_por_cidade = impacto_total / Decimal(n_cidades)
+        impacto_por_cidade = impacto_total / Decimal(n_cidades)
     TWO_PLACES = Decimal('0.01')
     def q(v: Decimal, places=TWO_PLACES):
         return float(v.quantize(places, rounding=ROUND_HALF_UP))
-    breakdown_cidades = {nome: q(impacto_por_cidade) for nome in lista_cidades}
 
-    return {
+    resultado = {
         'impacto_total': q(impacto_total),
         'gasto_total': q(gasto_total),
         'gasto_total_ajustado': q(gasto_ajustado),
@@ -100,8 +180,199 @@ def calcular_impacto_economico(parametros: Dict[str, Any]) -> Dict[str, Any]:
         'numero_turistas': numero_turistas,
         'duracao_estadia': duracao_estadia,
         'gasto_medio': float(gasto_medio),
-        'cidades_visitadas': lista_cidades,
-        'impacto_por_cidade': breakdown_cidades,
         'n_cidades': n_cidades,
         'ok': True
-    }
\ No newline at end of file
+    }
+    if coeficientes.versao is not None:
+        resultado['versao_coeficientes'] = coeficientes.versao
+    if lista_cidades is None:
+        resultado['distribuicao'] = {'tipo': 'uniforme', 'n_cidades': n_cidades, 'valor_por_cidade': q(impacto_por_cidade)}
+        return expandir_resultado(resultado) if expandir else resultado
+    resultado['cidades_visitadas'] = lista_cidades
+    if pesos is None:
+        resultado['impacto_por_cidade'] = {nome: q(impacto_por_cidade) for nome in lista_cidades}
+        return resultado
+    resultado['ponderacao'] = ponderacao
+    resultado['impacto_por_cidade'] = {}
+    for nome, valor in zip(lista_cidades, _repartir_centavos(impacto_total.quantize(TWO_PLACES, rounding=ROUND_HALF_UP), pesos)):
+        resultado['impacto_por_cidade'][nome] = round(resultado['impacto_por_cidade'].get(nome, 0.0) + valor, 2)
+    return resultado
+
+
+def _pesos_por_cidade(lista_cidades, pesos_raw) -> list:
+    """Alinha ``pesos`` (dict por nome ou lista na ordem das cidades) à lista de cidades."""
+    if isinstance(pesos_raw, dict):
+        por_nome = {str(k).strip().casefold(): v for k, v in pesos_raw.items()}
+        faltando = [nome for nome in lista_cidades if nome.casefold() not in por_nome]
+        if faltando:
+            raise ParametrosInvalidos(f"pesos ausentes para: {', '.join(faltando)}")
+        valores = [por_nome[nome.casefold()] for nome in lista_cidades]
+    elif isinstance(pesos_raw, (list, tuple)):
+        if len(pesos_raw) != len(lista_cidades):
+            raise ParametrosInvalidos("pesos deve ter um valor por cidade em cidades_visitadas")
+        valores = list(pesos_raw)
+    else:
+        raise ParametrosInvalidos("pesos deve ser um objeto {cidade: peso} ou uma lista")
+    try:
+        pesos = [Decimal(str(v)) for v in valores]
+    except (ArithmeticError, ValueError, TypeError):
+        raise ParametrosInvalidos("pesos devem ser numéricos")
+    if any(not p.is_finite() or p < 0 for p in pesos):
+        raise ParametrosInvalidos("pesos não podem ser negativos")
+    if sum(pesos) <= 0:
+        raise ParametrosInvalidos("a soma dos pesos deve ser > 0")
+    return pesos
+
+
+def _repartir_centavos(total: Decimal, pesos) -> list:
+    """Divide ``total`` (2 casas) proporcionalmente a ``pesos`` pelo maior resto.
+
+    Cada parcela é um valor em centavos e a soma das parcelas é exatamente ``total``.
+    """
+    centavos = int(total * 100)
+    soma = sum(pesos)
+    cotas = [Decimal(centavos) * p / soma for p in pesos]
+    partes = [int(c) for c in cotas]
+    restantes = centavos - sum(partes)
+    for i in sorted(range(len(cotas)), key=lambda i: cotas[i] - partes[i], reverse=True)[:restantes]:
+        partes[i] += 1
+    return [p / 100 for p in partes]
+
+
+def expandir_resultado(resultado: Dict[str, Any], limite: int = LIMITE_EXPANSAO) -> Dict[str, Any]:
+    """Converte um resultado com breakdown compacto para o formato por cidade.
+
+    Resultados já expandidos (ou gravados antes do formato compacto) são
+    devolvidos sem alteração. Lança ParametrosInvalidos se a distribuição tiver
+    mais de ``limite`` cidades.
+    """
+    distribuicao = resultado.get('distribuicao')
+    if not distribuicao or distribuicao.get('tipo') != 'uniforme':
+        return resultado
+    n_cidades = int(distribuicao['n_cidades'])
+    if n_cidades > limite:
+        raise ParametrosInvalidos(f"Expansão limitada a {limite} cidades (resultado tem {n_cidades}).")
+    expandido = {k: v for k, v in resultado.items() if k != 'distribuicao'}
+    expandido['cidades_visitadas'] = [f"Cidade {i+1}" for i in range(n_cidades)]
+    expandido['impacto_por_cidade'] = dict.fromkeys(expandido['cidades_visitadas'], distribuicao['valor_por_cidade'])
+    return expandido
+
+
+def recalcular_resultados(linhas, coeficientes: Optional[Coeficientes] = None) -> list:
+    """Recalcula resultados gravados: ``(id, parametros, anterior)`` -> ``(id, novo, erro)``.
+
+    ``novo`` é None (com ``erro``) se os parâmetros deixaram de ser válidos.
+    Resultados gravados no formato expandido continuam expandidos. Usado pelo
+    recálculo em massa, inclusive dentro de processos de trabalho.
+    """
+    saida = []
+    for id_, parametros, anterior in linhas:
+        try:
+            novo = calcular_impacto_economico(parametros or {}, coeficientes=coeficientes)
+            if isinstance(anterior, dict) and 'distribuicao' not in anterior and 'impacto_por_cidade' in anterior:
+                novo = expandir_resultado(novo)
+        except ParametrosInvalidos as e:
+            saida.append((id_, None, str(e)))
+            continue
+        saida.append((id_, novo, ''))
+    return saida
+
+
+def multiplicadores_cenario(cenarios, coeficientes: Optional[Coeficientes] = None) -> np.ndarray:
+    """Converte um array de nomes de cenário no array de multiplicadores da tabela."""
+    coeficientes = coeficientes or COEFICIENTES_PADRAO
+    nomes = np.char.lower(np.asarray(cenarios, dtype=str))
+    invalidos = ~np.isin(nomes, list(coeficientes.cenarios))
+    if invalidos.any():
+        coeficientes.validar_cenario(str(nomes[invalidos].flat[0]))
+    multiplicadores = np.empty(nomes.shape, dtype=np.float64)
+    for nome, valor in coeficientes.cenarios.items():
+        multiplicadores[nomes == nome] = valor
+    return multiplicadores
+
+
+def _arredondar(valores: np.ndarray, casas: int = 2) -> np.ndarray:
+    """Arredonda no modo ROUND_HALF_UP (valores não negativos).
+
+    Empates ``x.5`` que o float64 representa como ``x.4999999...`` são detectados
+    com tolerância relativa ao valor e arredondados para cima, como no Decimal.
+    """
+    escala = 10.0 ** casas
+    escalado = valores * escala
+    base = np.floor(escalado)
+    tolerancia = np.maximum(1e-7, escalado * 4e-16)
+    return (base + (escalado - base >= 0.5 - tolerancia)) / escala
+
+
+def calcular_impacto_lote(
+    numero_turistas,
+    gasto_medio,
+    duracao_estadia,
+    n_cidades,
+    multiplicador,
+    coeficientes: Optional[Coeficientes] = None,
+) -> Dict[str, np.ndarray]:
+    """Versão vetorizada (NumPy) de ``calcular_impacto_economico``.
+
+    Cada argumento é um escalar ou array (com broadcasting entre eles) e o
+    retorno é um dicionário de arrays float64 com as colunas ajuste_cidades,
+    fator_duracao, gasto_total, gasto_total_ajustado, impacto_total e
+    impacto_por_cidade. O multiplicador já deve estar resolvido (use
+    ``multiplicadores_cenario`` para converter cenários); ``coeficientes``
+    fornece os ajustes por cidades e por duração.
+
+    Concordância com a função escalar: os valores monetários são arredondados
+    ao centavo com ROUND_HALF_UP e coincidem exatamente com
+    ``calcular_impacto_economico`` para totais de até ~R$ 1 bilhão. Acima disso
+    a precisão do float64 pode gerar diferença de R$ 0,01 em empates de
+    arredondamento (até ~R$ 10 trilhões, a partir de onde o próprio float
+    retornado pela função escalar deixa de representar centavos).
+    ajuste_cidades e fator_duracao coincidem exatamente (4 casas).
+
+    Lança ParametrosInvalidos se qualquer linha violar as mesmas validações ou
+    sair do intervalo de int64/float64.
+    """
+    try:
+        turistas = np.asarray(numero_turistas, dtype=np.int64)
+        gasto = np.asarray(gasto_medio, dtype=np.float64)
+        duracao = np.asarray(duracao_estadia, dtype=np.int64)
+        cidades = np.asarray(n_cidades, dtype=np.int64)
+        mult = np.asarray(multiplicador, dtype=np.float64)
+        turistas, gasto, duracao, cidades, mult = np.broadcast_arrays(turistas, gasto, duracao, cidades, mult)
+    except OverflowError:
+        raise ParametrosInvalidos("Parâmetros fora do intervalo suportado (inteiros de 64 bits)")
+    except (ValueError, TypeError) as e:
+        raise ParametrosInvalidos(f"Erro ao converter parâmetros: {e}")
+
+    # --- Validações (mesmas regras da função escalar) ---
+    if (turistas <= 0).any():
+        raise ParametrosInvalidos("numero_turistas deve ser > 0")
+    if (gasto < 0).any():
+        raise ParametrosInvalidos("gasto_medio não pode ser negativo")
+    if (duracao <= 0).any():
+        raise ParametrosInvalidos("duracao_estadia deve ser > 0")
+    if (cidades <= 0).any():
+        raise ParametrosInvalidos("cidades_visitadas deve conter pelo menos 1 cidade")
+    if (mult <= 0).any():
+        raise ParametrosInvalidos("multiplicador deve ser > 0")
+
+    c = coeficientes or COEFICIENTES_PADRAO
+    ajuste_cidades = 1.0 + np.minimum(c.ajuste_cidades_max, c.ajuste_por_cidade * (cidades - 1))
+    fator_duracao = 1.0 - np.minimum(c.desconto_max, np.maximum(0, duracao - c.dias_sem_desconto) * c.desconto_por_dia)
+
+    # Estouro vira inf (sem RuntimeWarning) e é recusado logo abaixo
+    with np.errstate(over='ignore', invalid='ignore'):
+        gasto_total = turistas * gasto * duracao
+        gasto_ajustado = gasto_total * ajuste_cidades * fator_duracao
+        impacto_total = gasto_ajustado * mult
+    if not np.isfinite(impacto_total).all():
+        raise ParametrosInvalidos("Parâmetros fora do intervalo suportado (impacto não cabe em float64)")
+
+    return {
+        'impacto_total': _arredondar(impacto_total),
+        'gasto_total': _arredondar(gasto_total),
+        'gasto_total_ajustado': _arredondar(gasto_ajustado),
+        'ajuste_cidades': _arredondar(ajuste_cidades, 4),
+        'fator_duracao': _arredondar(fator_duracao, 4),
+        'impacto_por_cidade': _arredondar(impacto_total / cidades),
+    }
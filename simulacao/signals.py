@@ -0,0 +1,50 @@
+"""Receivers de sinais do app de simulação."""
+
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save, pre_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, catalogo, coeficientes, roteamento
+from .models import CenarioCoeficiente, Cidade, Relatorio, Simulacao, VersaoCoeficientes
+
+
+@receiver(post_save, sender=Cidade)
+@receiver(post_delete, sender=Cidade)
+def invalidar_catalogo(sender, **kwargs) -> None:
+    catalogo.invalidar()
+
+
+@receiver(post_delete, sender=Simulacao)
+def descartar_cache_simulacao(sender, instance: Simulacao, **kwargs) -> None:
+    if instance.parametros_hash:
+        # Entradas de versões antigas de coeficientes não são mais consultadas e expiram pelo TTL
+        cache.descartar_resultado(instance.parametros_hash, coeficientes.atual().versao)
+    cache.descartar_respostas(instance.id)
+
+
+@receiver(post_save, sender=Relatorio)
+@receiver(post_delete, sender=Relatorio)
+def descartar_resposta_resultado(sender, instance: Relatorio, **kwargs) -> None:
+    cache.descartar_respostas(instance.simulacao_id)
+
+
+@receiver(post_save, sender=VersaoCoeficientes)
+@receiver(post_delete, sender=VersaoCoeficientes)
+def invalidar_coeficientes(sender, **kwargs) -> None:
+    coeficientes.invalidar()
+
+
+@receiver(post_save, sender=CenarioCoeficiente)
+@receiver(post_delete, sender=CenarioCoeficiente)
+def marcar_versao_alterada(sender, instance: CenarioCoeficiente, **kwargs) -> None:
+    # Muda a marca da versão para que outros processos recarreguem os cenários
+    VersaoCoeficientes.objects.filter(id=instance.versao_id).update(atualizada_em=timezone.now())
+    coeficientes.invalidar()
+
+
+@receiver(pre_migrate)
+def fixar_primario_na_migracao(sender, **kwargs) -> None:
+    # Migrações de dados (RunPython) leem sem .using(): não podem ir para uma réplica
+    roteamento.fixar()
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
-from django.test import TestCase
+import io
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
-from .models import Cidade, Simulacao, Relatorio
+from .models import CenarioCoeficiente, Cidade, Comparacao, EstatisticaDiaria, Projecao, Simulacao, Relatorio, VersaoCoeficientes
 
-from .services import calcular_impacto_economico, ParametrosInvalidos
+from . import cache, catalogo, coeficientes, estatisticas, exportacao, fila, importacao, metricas, montecarlo, ponderacao, projecao, recalculo, roteamento
+from .forms import SimulacaoForm
+from .services import COEFICIENTES_PADRAO, calcular_impacto_economico, calcular_impacto_lote, expandir_resultado, multiplicadores_cenario, ParametrosInvalidos
 import json
 
+import numpy as np
+
 
 class TestCalculoImpacto(TestCase):
     def setUp(self):
@@ -61,7 +71,23 @@ class TestCalculoImpacto(TestCase):
     def test_cidades_inteiro(self):
         res = calcular_impacto_economico({**self.base, 'cidades_visitadas': 2})
         self.assertEqual(res['n_cidades'], 2)
-        self.assertEqual(len(res['cidades_visitadas']), 2)
+        self.assertEqual(res['distribuicao'], {'tipo': 'uniforme', 'n_cidades': 2, 'valor_por_cidade': res['impacto_total'] / 2})
+        self.assertNotIn('impacto_por_cidade', res)
+        expandido = calcular_impacto_economico({**self.base, 'cidades_visitadas': 2}, expandir=True)
+        self.assertEqual(len(expandido['cidades_visitadas']), 2)
+        self.assertEqual(expandido, expandir_resultado(res))
+
+    def test_cidades_inteiro_grande_compacto(self):
+        res = calcular_impacto_economico({**self.base, 'cidades_visitadas': 2_000_000})
+        self.assertLess(len(json.dumps(res)), 1000)
+        with self.assertRaises(ParametrosInvalidos):
+            expandir_resultado(res)
+
+    def test_lista_de_cidades_mantem_mapa(self):
+        res = calcular_impacto_economico({**self.base, 'cidades_visitadas': ['Belém', 'Marabá']})
+        self.assertNotIn('distribuicao', res)
+        self.assertEqual(list(res['impacto_por_cidade']), ['Belém', 'Marabá'])
+        self.assertIs(expandir_resultado(res), res)
 
     def test_limite_ajuste_cidades(self):
         muitas = calcular_impacto_economico({**self.base, 'cidades_visitadas': ['A','B','C','D','E','F']})
@@ -70,6 +96,7 @@ class TestCalculoImpacto(TestCase):
 
 class TestAPIs(TestCase):
     def setUp(self):
+        cache.cache_local.clear()
         self.cidade = Cidade.objects.create(nome="Santarém", populacao=300000, pib_per_capita=40000)
 
     def test_api_simular_cria_simulacao_e_relatorio(self):
@@ -99,6 +126,16 @@ class TestAPIs(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json()['simulacao_id'], sim.id)
 
+    def test_api_resultado_expandir(self):
+        sim = Simulacao.objects.create(cidade=self.cidade, parametros={})
+        Relatorio.objects.create(simulacao=sim, resultado=calcular_impacto_economico({
+            "numero_turistas": 10, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 3}))
+        url = reverse('api_resultado', args=[sim.id])
+        compacto = self.client.get(url).json()['resultado']
+        self.assertEqual(compacto['distribuicao']['n_cidades'], 3)
+        expandido = self.client.get(url + '?expandir=1').json()['resultado']
+        self.assertEqual(list(expandido['impacto_por_cidade']), ['Cidade 1', 'Cidade 2', 'Cidade 3'])
+
     def test_api_simular_cidade_inexistente(self):
         url = reverse('api_simular')
         payload = {
@@ -124,3 +161,1457 @@ class TestAPIs(TestCase):
         resp = self.client.post(url, data=json.dumps(payload), content_type='application/json')
         self.assertEqual(resp.status_code, 400)
         self.assertIn('erro', resp.json())
+
+
+class TestAPISimularLote(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.belem = Cidade.objects.create(nome="Belém", populacao=1300000, pib_per_capita=25000)
+        self.santarem = Cidade.objects.create(nome="Santarém", populacao=300000, pib_per_capita=40000)
+        self.base = {
+            "numero_turistas": 50,
+            "gasto_medio": 200,
+            "duracao_estadia": 3,
+            "cidades_visitadas": 2,
+        }
+
+    def test_lote_cria_simulacoes_e_reporta_erros_por_item(self):
+        payload = [
+            {**self.base, "cidade_id": self.belem.id},
+            {**self.base, "cidade_nome": "santarém", "cenario": "otimista"},
+            {**self.base, "cidade_id": 9999},
+            {**self.base, "cidade_id": self.belem.id, "numero_turistas": 0},
+        ]
+        resp = self.client.post(reverse('api_simular_lote'), data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['criadas'], 2)
+        self.assertEqual(data['erros'], 2)
+        self.assertEqual([i['ok'] for i in data['itens']], [True, True, False, False])
+        self.assertEqual(data['itens'][1]['cidade'], "Santarém")
+        self.assertEqual(Simulacao.objects.count(), 2)
+        self.assertEqual(Relatorio.objects.count(), 2)
+        for item in data['itens'][:2]:
+            self.assertTrue(Relatorio.objects.filter(simulacao_id=item['simulacao_id']).exists())
+
+    def test_lote_resolve_cidades_em_uma_consulta(self):
+        payload = [{**self.base, "cidade_id": self.belem.id}] * 10 + [{**self.base, "cidade_nome": "Santarém"}] * 10
+        coeficientes.atual()
+        # carga do catálogo + 1 consulta de hashes existentes + savepoint/insert de simulações e relatórios
+        # + update/savepoint/insert/release por linha nova de estatística (uma por cidade)
+        with self.assertNumQueries(6 + 2 * 4):
+            resp = self.client.post(reverse('api_simular_lote'), data=json.dumps(payload), content_type='application/json')
+        data = resp.json()
+        # Itens idênticos no mesmo lote viram uma única simulação por cidade
+        self.assertEqual(data['criadas'], 2)
+        self.assertEqual(data['reutilizadas'], 18)
+        self.assertEqual(len({i['simulacao_id'] for i in data['itens']}), 2)
+
+    def test_lote_confirma_cidades_desconhecidas_em_uma_consulta(self):
+        payload = (
+            [{**self.base, "cidade_id": 9000 + i} for i in range(10)]
+            + [{**self.base, "cidade_nome": f"Inexistente {i}"} for i in range(10)]
+            + [{**self.base, "cidade_id": self.belem.id, "ponderacao": "populacao", "cidades_visitadas": [f"Fora {i}", "Belém"]} for i in range(10)]
+        )
+        catalogo.invalidar()
+        coeficientes.atual()
+        # carga do catálogo + uma confirmação para todas as faltas
+        with self.assertNumQueries(2):
+            resp = self.client.post(reverse('api_simular_lote'), data=json.dumps(payload), content_type='application/json')
+        data = resp.json()
+        self.assertEqual(data['erros'], 30)
+        self.assertTrue(all(i['erro'].startswith("Cidade não encontrada") for i in data['itens'][:20]))
+        self.assertIn("Fora 0", data['itens'][20]['erro'])
+
+    def test_lote_encontra_cidade_criada_depois_da_carga(self):
+        catalogo.todas()
+        # bulk_create não dispara o sinal que invalida o catálogo
+        Cidade.objects.bulk_create([Cidade(nome="Altamira", nome_normalizado="altamira", populacao=1, pib_per_capita=1)])
+        payload = [{**self.base, "cidade_nome": "altamira"}, {**self.base, "cidade_id": self.belem.id, "ponderacao": "pib", "cidades_visitadas": ["Altamira", "Belém"]}]
+        data = self.client.post(reverse('api_simular_lote'), data=json.dumps(payload), content_type='application/json').json()
+        self.assertEqual([i['ok'] for i in data['itens']], [True, True])
+
+    def test_lote_payload_invalido(self):
+        resp = self.client.post(reverse('api_simular_lote'), data=json.dumps({"foo": 1}), content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('erro', resp.json())
+
+
+class TestCalculoImpactoLote(TestCase):
+    def _escalar(self, turistas, gasto, duracao, n, mult):
+        return calcular_impacto_economico({
+            'numero_turistas': int(turistas),
+            'gasto_medio': float(gasto),
+            'duracao_estadia': int(duracao),
+            'cidades_visitadas': int(n),
+            'multiplicador': float(mult),
+        })
+
+    def test_concorda_com_funcao_escalar_ao_centavo(self):
+        rng = np.random.default_rng(42)
+        tamanho = 2000
+        turistas = rng.integers(1, 100_000, tamanho)
+        gasto = np.round(rng.uniform(0, 2_000, tamanho), 2)
+        duracao = rng.integers(1, 40, tamanho)
+        n = rng.integers(1, 10, tamanho)
+        mult = np.round(rng.uniform(0.5, 2.0, tamanho), 4)
+        lote = calcular_impacto_lote(turistas, gasto, duracao, n, mult)
+        for i in range(tamanho):
+            esc = self._escalar(turistas[i], gasto[i], duracao[i], n[i], mult[i])
+            for chave in ('impacto_total', 'gasto_total', 'gasto_total_ajustado', 'ajuste_cidades', 'fator_duracao'):
+                self.assertEqual(lote[chave][i], esc[chave], chave)
+            self.assertEqual(lote['impacto_por_cidade'][i], esc['distribuicao']['valor_por_cidade'])
+
+    def test_valores_grandes_diferem_no_maximo_um_centavo(self):
+        turistas = np.array([9_999_999, 12_345_678, 50_000_000])
+        gasto = np.array([1234.57, 999.99, 2_000.01])
+        lote = calcular_impacto_lote(turistas, gasto, 7, 3, 1.15)
+        for i in range(3):
+            esc = self._escalar(turistas[i], gasto[i], 7, 3, 1.15)
+            self.assertLessEqual(abs(lote['impacto_total'][i] - esc['impacto_total']), 0.0101)
+
+    def test_multiplicadores_cenario_e_validacao(self):
+        mult = multiplicadores_cenario(['conservador', 'Realista', 'otimista'])
+        np.testing.assert_array_equal(mult, [0.9, 1.0, 1.15])
+        with self.assertRaises(ParametrosInvalidos):
+            multiplicadores_cenario(['foo'])
+        with self.assertRaises(ParametrosInvalidos):
+            calcular_impacto_lote([10, 0], 100, 3, 1, 1.0)
+
+
+class TestAPIVarredura(TestCase):
+    def _post(self, payload, formato=''):
+        url = reverse('api_varredura') + (f'?formato={formato}' if formato else '')
+        return self.client.post(url, data=json.dumps(payload), content_type='application/json')
+
+    def test_varredura_ndjson_produto_cartesiano(self):
+        payload = {
+            "numero_turistas": {"inicio": 1000, "fim": 1_000_000, "pontos": 4, "escala": "log"},
+            "gasto_medio": [150, 250.5],
+            "duracao_estadia": {"inicio": 1, "fim": 30, "passo": 1},
+            "cidades_visitadas": 2,
+            "cenario": ["conservador", "realista", "otimista"],
+        }
+        resp = self._post(payload)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['X-Total-Pontos'], str(4 * 2 * 30 * 3))
+        linhas = [json.loads(l) for l in b''.join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(len(linhas), 4 * 2 * 30 * 3)
+        self.assertEqual(linhas[0]['numero_turistas'], 1000)
+        ultima = linhas[-1]
+        esperado = calcular_impacto_economico({
+            'numero_turistas': ultima['numero_turistas'],
+            'gasto_medio': ultima['gasto_medio'],
+            'duracao_estadia': ultima['duracao_estadia'],
+            'cidades_visitadas': 2,
+            'cenario': ultima['cenario'],
+        })
+        self.assertEqual(ultima['cenario'], 'otimista')
+        self.assertEqual(ultima['impacto_total'], esperado['impacto_total'])
+
+    def test_varredura_csv(self):
+        payload = {"numero_turistas": [10, 20], "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 1, "multiplicador": [1.0, 2.0]}
+        resp = self._post(payload, formato='csv')
+        self.assertEqual(resp.status_code, 200)
+        linhas = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertTrue(linhas[0].startswith('numero_turistas,'))
+        self.assertEqual(len(linhas), 1 + 4)
+
+    def test_varredura_invalida(self):
+        base = {"numero_turistas": 10, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 1}
+        self.assertEqual(self._post({**base, "duracao_estadia": [0, 1]}).status_code, 400)
+        self.assertEqual(self._post({**base, "cenario": ["foo"]}).status_code, 400)
+        self.assertEqual(self._post({"numero_turistas": 10}).status_code, 400)
+        with self.settings(SIMULACAO_VARREDURA_MAX_PONTOS=10):
+            self.assertEqual(self._post({**base, "numero_turistas": {"inicio": 1, "fim": 100}}).status_code, 400)
+
+    def test_eixo_gigante_recusado_antes_de_alocar(self):
+        # Sem a checagem prévia o np.arange abaixo tentaria alocar ~80 TB
+        base = {"numero_turistas": 10, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 1}
+        resp = self._post({**base, "gasto_medio": {"inicio": 1, "fim": 1e13}})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("limite", resp.json()["erro"])
+        # O limite vale para o que sobra depois dos eixos anteriores
+        with self.settings(SIMULACAO_VARREDURA_MAX_PONTOS=10):
+            resp = self._post({**base, "cenario": ["realista", "otimista"], "gasto_medio": {"inicio": 1, "fim": 2, "pontos": 6}})
+            self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self._post({**base, "gasto_medio": {"inicio": 1, "fim": float("inf")}}).status_code, 400)
+
+    def test_valores_nao_finitos_em_lista_ou_valor_unico(self):
+        base = {"numero_turistas": 10, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 1}
+        for extra in ({"gasto_medio": ["nan"]}, {"gasto_medio": "inf"}, {"multiplicador": [1.0, "-inf"]}, {"numero_turistas": ["nan"]}):
+            resp = self._post({**base, **extra})
+            self.assertEqual(resp.status_code, 400, extra)
+            self.assertIn("finitos", resp.json()["erro"])
+
+
+class TestMonteCarlo(TestCase):
+    def setUp(self):
+        self.payload = {
+            "numero_turistas": 1000,
+            "gasto_medio": {"distribuicao": "normal", "media": 250, "desvio": 40},
+            "duracao_estadia": {"distribuicao": "triangular", "minimo": 2, "moda": 4, "maximo": 12},
+            "multiplicador": {"distribuicao": "uniforme", "minimo": 0.9, "maximo": 1.2},
+            "cidades_visitadas": 2,
+            "amostras": 60_000,
+            "semente": 7,
+            "bins": 20,
+        }
+
+    def test_reprodutivel_e_independente_de_workers(self):
+        modelo = montecarlo.montar_modelo(self.payload)
+        inline = montecarlo.simular_monte_carlo(modelo, workers=1, tamanho_bloco=25_000)
+        paralelo = montecarlo.simular_monte_carlo(modelo, workers=2, tamanho_bloco=25_000)
+        self.assertEqual(inline, paralelo)
+        outra_semente = montecarlo.simular_monte_carlo({**modelo, 'semente': 8}, workers=1, tamanho_bloco=25_000)
+        self.assertNotEqual(inline['impacto_total']['media'], outra_semente['impacto_total']['media'])
+
+    def test_parametros_fixos_sem_dispersao(self):
+        modelo = montecarlo.montar_modelo({
+            "numero_turistas": 100, "gasto_medio": 250, "duracao_estadia": 4, "cidades_visitadas": 1, "amostras": 10,
+        })
+        res = montecarlo.simular_monte_carlo(modelo, workers=1)
+        esperado = calcular_impacto_economico({'numero_turistas': 100, 'gasto_medio': 250, 'duracao_estadia': 4, 'cidades_visitadas': 1})
+        self.assertEqual(res['impacto_total']['p5'], esperado['impacto_total'])
+        self.assertEqual(res['impacto_total']['p95'], esperado['impacto_total'])
+
+    def test_api_montecarlo(self):
+        with self.settings(SIMULACAO_MONTECARLO_WORKERS=1):
+            resp = self.client.post(reverse('api_montecarlo'), data=json.dumps(self.payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        impacto = data['impacto_total']
+        self.assertLessEqual(impacto['p5'], impacto['p50'])
+        self.assertLessEqual(impacto['p50'], impacto['p95'])
+        self.assertEqual(sum(data['histograma']['contagens']), 60_000)
+        self.assertEqual(len(data['histograma']['bordas']), 21)
+
+    def test_api_montecarlo_distribuicao_invalida(self):
+        payload = {**self.payload, "gasto_medio": {"distribuicao": "beta", "a": 1}}
+        resp = self.client.post(reverse('api_montecarlo'), data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        payload = {**self.payload, "duracao_estadia": {"distribuicao": "triangular", "minimo": 5, "moda": 1, "maximo": 3}}
+        resp = self.client.post(reverse('api_montecarlo'), data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_api_montecarlo_recusa_nao_finitos_e_fixos_abaixo_do_minimo(self):
+        casos = (
+            {"gasto_medio": "nan"},
+            {"gasto_medio": {"distribuicao": "normal", "media": "nan", "desvio": 1}},
+            {"multiplicador": {"distribuicao": "uniforme", "minimo": 1, "maximo": "inf"}},
+            {"numero_turistas": 0},
+            {"gasto_medio": -10},
+            {"duracao_estadia": 0.5},
+            {"multiplicador": 0},
+        )
+        for extra in casos:
+            payload = {**self.payload, "amostras": 100, **extra}
+            resp = self.client.post(reverse('api_montecarlo'), data=json.dumps(payload), content_type='application/json')
+            self.assertEqual(resp.status_code, 400, extra)
+        # Amostras sorteadas abaixo do mínimo continuam sendo limitadas, não recusadas
+        modelo = montecarlo.montar_modelo({**self.payload, "gasto_medio": {"distribuicao": "normal", "media": 0, "desvio": 50}, "amostras": 1000})
+        self.assertTrue((montecarlo.simular_monte_carlo(modelo, workers=1)['impacto_total']['media']) >= 0)
+
+
+class TestDeduplicacao(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Marabá", populacao=280000, pib_per_capita=30000)
+        self.payload = {
+            "cidade_id": self.cidade.id,
+            "numero_turistas": 50,
+            "gasto_medio": 200,
+            "duracao_estadia": 3,
+            "cidades_visitadas": ["Marabá", "Belém"],
+            "cenario": "Realista",
+        }
+
+    def _post(self, payload):
+        return self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+
+    def test_hash_canonico_normaliza_parametros(self):
+        a = cache.hash_parametros(1, {**self.payload, "gasto_medio": 200})
+        b = cache.hash_parametros(1, {**self.payload, "gasto_medio": "200.00", "cenario": "realista",
+                                      "cidades_visitadas": ["belém", "MARABÁ"]})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, cache.hash_parametros(2, self.payload))
+        self.assertNotEqual(a, cache.hash_parametros(1, {**self.payload, "multiplicador": 1.0}))
+        self.assertIsNone(cache.hash_parametros(1, {**self.payload, "numero_turistas": "abc"}))
+
+    def test_parametros_identicos_reutilizam_relatorio(self):
+        primeira = self._post(self.payload)
+        self.assertEqual(primeira.status_code, 201)
+        with self.assertNumQueries(0):  # cidade vem do catálogo e resultado do cache
+            segunda = self._post({**self.payload, "gasto_medio": 200.0})
+        self.assertEqual(segunda.status_code, 200)
+        self.assertTrue(segunda.json()['reutilizado'])
+        self.assertEqual(segunda.json()['simulacao_id'], primeira.json()['simulacao_id'])
+        self.assertEqual(Simulacao.objects.count(), 1)
+        self.assertEqual(Relatorio.objects.count(), 1)
+
+    def test_reutiliza_do_banco_quando_cache_vazio(self):
+        primeira = self._post(self.payload).json()
+        cache.cache_local.clear()
+        segunda = self._post(self.payload)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.json()['simulacao_id'], primeira['simulacao_id'])
+        Simulacao.objects.all().delete()
+        self.assertEqual(self._post(self.payload).status_code, 201)
+
+
+class TestFilaAssincrona(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Altamira", populacao=120000, pib_per_capita=20000)
+        self.payload = {
+            "cidade_id": self.cidade.id,
+            "numero_turistas": 80,
+            "gasto_medio": 150,
+            "duracao_estadia": 5,
+            "cidades_visitadas": 2,
+            "async": True,
+        }
+
+    def _post(self, payload):
+        return self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+
+    def test_async_enfileira_e_worker_grava_relatorio(self):
+        resp = self._post(self.payload)
+        self.assertEqual(resp.status_code, 202)
+        sim_id = resp.json()['simulacao_id']
+        self.assertFalse(Relatorio.objects.exists())
+        self.assertNotIn('async', Simulacao.objects.get(id=sim_id).parametros)
+
+        pendente = self.client.get(resp.json()['resultado_url'])
+        self.assertEqual(pendente.status_code, 202)
+        self.assertEqual(pendente.json()['status'], 'pendente')
+
+        # Requisição idêntica enquanto pendente reaproveita o mesmo item da fila
+        self.assertEqual(self._post(self.payload).json()['simulacao_id'], sim_id)
+
+        call_command('processar_simulacoes', '--once', stdout=io.StringIO())
+        pronto = self.client.get(reverse('api_resultado', args=[sim_id]))
+        self.assertEqual(pronto.status_code, 200)
+        self.assertEqual(pronto.json()['status'], 'concluida')
+        esperado = calcular_impacto_economico(
+            {k: v for k, v in self.payload.items() if k not in {'cidade_id', 'async'}}, coeficientes=coeficientes.atual(),
+        )
+        self.assertEqual(pronto.json()['resultado'], esperado)
+
+    def test_worker_registra_erro(self):
+        resp = self._post({**self.payload, "numero_turistas": 0})
+        sim_id = resp.json()['simulacao_id']
+        self.assertEqual(fila.processar_pendentes(), 1)
+        erro = self.client.get(reverse('api_resultado', args=[sim_id]))
+        self.assertEqual(erro.status_code, 422)
+        self.assertIn('numero_turistas', erro.json()['erro'])
+
+    def test_reivindicacao_unica(self):
+        sim = fila.enfileirar(self.cidade, {"numero_turistas": 1, "gasto_medio": 1, "duracao_estadia": 1, "cidades_visitadas": 1})
+        self.assertTrue(fila.reivindicar(sim.id))
+        self.assertFalse(fila.reivindicar(sim.id))
+        self.assertEqual(fila.processar_pendentes(), 0)
+
+    def test_worker_devolve_travadas_a_fila(self):
+        from django.utils import timezone
+        sim = fila.enfileirar(self.cidade, {"numero_turistas": 1, "gasto_medio": 1, "duracao_estadia": 1, "cidades_visitadas": 1})
+        self.assertTrue(fila.reivindicar(sim.id))
+        Simulacao.objects.filter(id=sim.id).update(iniciado_em=timezone.now() - timedelta(minutes=20))
+        saida = io.StringIO()
+        call_command('processar_simulacoes', '--once', stdout=saida)
+        self.assertIn("1 simulação(ões) travada(s) devolvida(s)", saida.getvalue())
+        self.assertEqual(Simulacao.objects.get(id=sim.id).status, Simulacao.Status.CONCLUIDA)
+
+
+class TestCatalogoCidades(TestCase):
+    def setUp(self):
+        self.belem = Cidade.objects.create(nome="Belém", populacao=1300000, pib_per_capita=25000)
+        self.maraba = Cidade.objects.create(nome="Marabá", populacao=280000, pib_per_capita=30000, estado="PA")
+
+    def test_nome_normalizado(self):
+        self.assertEqual(self.belem.nome_normalizado, "belem")
+        self.assertEqual(Cidade.objects.get(nome_normalizado="maraba"), self.maraba)
+
+    def test_busca_sem_acento_e_sem_consulta(self):
+        catalogo.todas()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogo.por_nome("  BELEM ").id, self.belem.id)
+            self.assertEqual(catalogo.por_nome("marabá").estado, "PA")
+            self.assertEqual(catalogo.por_id(self.maraba.id).nome, "Marabá")
+
+    def test_invalidado_por_save_e_delete(self):
+        catalogo.todas()
+        self.belem.nome = "Belém do Pará"
+        self.belem.save()
+        self.assertEqual(catalogo.por_id(self.belem.id).nome, "Belém do Pará")
+        self.maraba.delete()
+        self.assertIsNone(catalogo.por_nome("Marabá"))
+
+    def test_cidade_criada_fora_do_processo_e_encontrada(self):
+        catalogo.todas()
+        Cidade.objects.bulk_create([Cidade(nome="Santarém", nome_normalizado="santarem", populacao=1, pib_per_capita=1)])
+        self.assertEqual(catalogo.por_nome("santarem").nome, "Santarém")
+
+    def test_form_usa_catalogo(self):
+        catalogo.todas()
+        coeficientes.atual()  # cenários do form vêm do registro em memória
+        with self.assertNumQueries(0):
+            html = str(SimulacaoForm()['cidade_principal'])
+            form = SimulacaoForm({
+                'cidade_principal': str(self.maraba.id), 'numero_turistas': 10, 'gasto_medio': 100,
+                'duracao_estadia': 2, 'cidades_visitadas': 'Belém', 'cenario': 'realista',
+            })
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertIn("Marabá", html)
+        self.assertEqual(form.build_parametros()['cidades_visitadas'], ['Marabá', 'Belém'])
+        self.assertFalse(SimulacaoForm({**form.data, 'cidade_principal': '9999'}).is_valid())
+
+
+class TestViewsAssincronas(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Bragança", populacao=130000, pib_per_capita=15000)
+        self.payload = {
+            "cidade_nome": "braganca",
+            "numero_turistas": 70,
+            "gasto_medio": 180,
+            "duracao_estadia": 3,
+            "cidades_visitadas": ["Bragança"],
+        }
+
+    def _post(self, payload):
+        return self.client.post(reverse('api_simular_async'), data=json.dumps(payload), content_type='application/json')
+
+    def test_api_simular_async_cria_e_reutiliza(self):
+        resp = self._post(self.payload)
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()
+        self.assertEqual(data['cidade'], "Bragança")
+        esperado = calcular_impacto_economico(
+            {k: v for k, v in self.payload.items() if k != 'cidade_nome'}, coeficientes=coeficientes.atual(),
+        )
+        self.assertEqual(data['resultado'], esperado)
+        self.assertTrue(Relatorio.objects.filter(simulacao_id=data['simulacao_id']).exists())
+
+        cache.cache_local.clear()
+        repetida = self._post(self.payload)
+        self.assertEqual(repetida.status_code, 200)
+        self.assertEqual(repetida.json()['simulacao_id'], data['simulacao_id'])
+
+        resultado = self.client.get(reverse('api_resultado_async', args=[data['simulacao_id']]))
+        self.assertEqual(resultado.status_code, 200)
+        self.assertEqual(resultado.json(), self.client.get(reverse('api_resultado', args=[data['simulacao_id']])).json())
+
+    def test_api_simular_async_erros_e_fila(self):
+        self.assertEqual(self._post({**self.payload, "cidade_nome": "Nenhuma"}).status_code, 400)
+        self.assertEqual(self._post({**self.payload, "numero_turistas": 0}).status_code, 400)
+        enfileirada = self._post({**self.payload, "async": True})
+        self.assertEqual(enfileirada.status_code, 202)
+        self.assertEqual(self.client.get(reverse('api_resultado_async', args=[enfileirada.json()['simulacao_id']])).status_code, 202)
+        self.assertEqual(self.client.get(reverse('api_resultado_async', args=[9999])).status_code, 404)
+
+    async def test_ponderacao_consulta_catalogo_fora_do_event_loop(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        url = reverse('api_simular_async')
+        # Catálogo expirado: recarrega do banco ao resolver os pesos
+        await sync_to_async(catalogo.invalidar)()
+        payload = {**self.payload, "cidade_nome": None, "cidade_id": self.cidade.id, "ponderacao": "populacao"}
+        resp = await cliente.post(url, data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        # Cidade fora do catálogo: confirmada no banco antes do 400
+        desconhecida = {**payload, "cidades_visitadas": ["Bragança", "Atlântida"]}
+        resp = await cliente.post(url, data=json.dumps(desconhecida), content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Atlântida", resp.json()["erro"])
+
+    async def test_cache_e_fila_rodam_fora_do_event_loop(self):
+        import asyncio
+        from unittest import mock
+        from django.test import AsyncClient
+
+        no_loop = []
+
+        def espiar(funcao):
+            def chamada(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    no_loop.append(funcao.__name__)
+                except RuntimeError:
+                    pass
+                return funcao(*args, **kwargs)
+            return chamada
+
+        cliente = AsyncClient()
+        url = reverse('api_simular_async')
+        with mock.patch.object(cache, "obter_resultado", espiar(cache.obter_resultado)), \
+                mock.patch.object(cache, "guardar_resultado", espiar(cache.guardar_resultado)), \
+                mock.patch.object(fila, "pendente_com_hash", espiar(fila.pendente_com_hash)), \
+                mock.patch.object(fila, "enfileirar", espiar(fila.enfileirar)):
+            criada = await cliente.post(url, data=json.dumps(self.payload), content_type='application/json')
+            self.assertEqual(criada.status_code, 201)
+            cache.cache_local.clear()
+            repetida = await cliente.post(url, data=json.dumps(self.payload), content_type='application/json')
+            self.assertEqual(repetida.status_code, 200)
+            enfileirada = {**self.payload, "numero_turistas": 71, "async": True}
+            primeira = await cliente.post(url, data=json.dumps(enfileirada), content_type='application/json')
+            segunda = await cliente.post(url, data=json.dumps(enfileirada), content_type='application/json')
+        self.assertEqual(primeira.status_code, 202)
+        self.assertEqual(primeira.json()['simulacao_id'], segunda.json()['simulacao_id'])
+        self.assertEqual(no_loop, [])
+
+
+class TestAPISimulacoes(TestCase):
+    def setUp(self):
+        self.belem = Cidade.objects.create(nome="Belém", populacao=1300000, pib_per_capita=25000)
+        self.maraba = Cidade.objects.create(nome="Marabá", populacao=280000, pib_per_capita=30000)
+        base = datetime(2025, 1, 1, 12, tzinfo=dt_timezone.utc)
+        self.ids = []
+        for i in range(7):
+            cidade = self.belem if i % 2 == 0 else self.maraba
+            parametros = {"numero_turistas": 10 + i, "cenario": "otimista"} if i == 3 else {"numero_turistas": 10 + i}
+            sim = Simulacao.objects.create(cidade=cidade, parametros=parametros)
+            Relatorio.objects.create(simulacao=sim, resultado={"impacto_total": 100.0 * i})
+            # Duas simulações com o mesmo instante exercitam o desempate por id
+            Simulacao.objects.filter(id=sim.id).update(data_criacao=base + timedelta(days=min(i, 5)))
+            self.ids.append(sim.id)
+
+    def _get(self, **params):
+        return self.client.get(reverse('api_simulacoes'), params)
+
+    def test_paginacao_por_cursor_percorre_tudo_sem_repetir(self):
+        vistos = []
+        cursor = None
+        paginas = 0
+        while True:
+            params = {"limite": 3, **({"cursor": cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                data = self._get(**params).json()
+            vistos += [r['simulacao_id'] for r in data['resultados']]
+            paginas += 1
+            cursor = data['proximo']
+            if not cursor:
+                break
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, [self.ids[6], self.ids[5], self.ids[4], self.ids[3], self.ids[2], self.ids[1], self.ids[0]])
+
+    def test_filtros(self):
+        catalogo.todas()
+        por_cidade = self._get(cidade="maraba").json()['resultados']
+        self.assertEqual({r['simulacao_id'] for r in por_cidade}, {self.ids[1], self.ids[3], self.ids[5]})
+        otimista = self._get(cenario="otimista").json()['resultados']
+        self.assertEqual([r['simulacao_id'] for r in otimista], [self.ids[3]])
+        self.assertEqual(len(self._get(cenario="realista").json()['resultados']), 6)
+        janela = self._get(desde="2025-01-02", ate="2025-01-03").json()['resultados']
+        self.assertEqual([r['simulacao_id'] for r in janela], [self.ids[2], self.ids[1]])
+        self.assertEqual(janela[0]['impacto_total'], 200.0)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self._get(cursor="xyz").status_code, 400)
+        self.assertEqual(self._get(desde="ontem").status_code, 400)
+        self.assertEqual(self._get(cidade="Nenhuma").status_code, 400)
+        self.assertEqual(self._get(impacto_min="muito").status_code, 400)
+        for valor in ("nan", "NaN", "inf", "-Infinity", "sNaN"):
+            self.assertEqual(self._get(impacto_min=valor).status_code, 400, valor)
+            self.assertEqual(self._get(impacto_max=valor).status_code, 400, valor)
+
+    def test_filtro_por_impacto(self):
+        resultados = self._get(impacto_min="200", impacto_max="500").json()['resultados']
+        self.assertEqual([r['simulacao_id'] for r in resultados], [self.ids[5], self.ids[4], self.ids[3], self.ids[2]])
+
+
+class TestColunasResumo(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.belem = Cidade.objects.create(nome="Belém", populacao=1300000, pib_per_capita=25000)
+        self.base = {"numero_turistas": 1000, "gasto_medio": 200, "duracao_estadia": 3}
+
+    def test_api_simular_preenche_colunas(self):
+        payload = {"cidade_id": self.belem.id, **self.base, "cidades_visitadas": 2, "cenario": "Otimista"}
+        resp = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+        sim = Simulacao.objects.select_related("relatorio").get(id=resp.json()['simulacao_id'])
+        self.assertEqual(sim.cenario, "otimista")
+        self.assertEqual(float(sim.relatorio.impacto_total), resp.json()['resultado']['impacto_total'])
+        self.assertEqual(float(sim.relatorio.multiplicador), 1.15)
+        self.assertEqual(sim.relatorio.n_cidades, 2)
+
+    def test_lote_preenche_colunas_e_top_n_em_sql(self):
+        lote = [{"cidade_id": self.belem.id, **self.base, "numero_turistas": n, "cidades_visitadas": 1} for n in (300, 100, 200)]
+        self.client.post(reverse('api_simular_lote'), data=json.dumps(lote), content_type='application/json')
+        self.assertFalse(Relatorio.objects.filter(impacto_total__isnull=True).exists())
+        top = list(
+            Relatorio.objects.filter(simulacao__cidade=self.belem)
+            .order_by("-impacto_total").values_list("simulacao__parametros__numero_turistas", flat=True)[:2]
+        )
+        self.assertEqual(top, [300, 200])
+
+
+class TestEstatisticas(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.belem = Cidade.objects.create(nome="Belém", populacao=1300000, pib_per_capita=25000)
+        self.maraba = Cidade.objects.create(nome="Marabá", populacao=280000, pib_per_capita=30000)
+
+    def _simular(self, cidade, numero_turistas, **extra):
+        payload = {"cidade_id": cidade.id, "numero_turistas": numero_turistas, "gasto_medio": 100,
+                   "duracao_estadia": 2, "cidades_visitadas": 1, **extra}
+        resp = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+        return resp.json()['resultado']['impacto_total']
+
+    def test_incremental_igual_a_reconstrucao(self):
+        impactos = [self._simular(self.belem, 10), self._simular(self.belem, 20), self._simular(self.maraba, 30, cenario="otimista")]
+        lote = [{"cidade_id": self.maraba.id, "numero_turistas": n, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 1} for n in (40, 50)]
+        self.client.post(reverse('api_simular_lote'), data=json.dumps(lote), content_type='application/json')
+
+        linha = EstatisticaDiaria.objects.get(cidade=self.belem)
+        self.assertEqual(linha.quantidade, 2)
+        self.assertAlmostEqual(float(linha.soma_impacto), impactos[0] + impactos[1], places=2)
+        campos = ("cidade_id", "cenario", "dia", "quantidade", "soma_impacto", "soma_gasto")
+        incremental = sorted(EstatisticaDiaria.objects.values_list(*campos))
+        self.assertEqual(len(incremental), 3)
+        out = io.StringIO()
+        call_command("reconstruir_estatisticas", stdout=out)
+        self.assertIn("3 linha(s)", out.getvalue())
+        self.assertEqual(sorted(EstatisticaDiaria.objects.values_list(*campos)), incremental)
+
+    def test_api_agrupa_e_filtra(self):
+        self._simular(self.belem, 10)
+        self._simular(self.belem, 20, cenario="otimista")
+        self._simular(self.maraba, 30)
+        catalogo.todas()
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('api_estatisticas')).json()
+        self.assertEqual([(r['cidade'], r['quantidade']) for r in data['resultados']], [("Belém", 2), ("Marabá", 1)])
+        data = self.client.get(reverse('api_estatisticas'), {"agrupar": "cenario", "cidade": "belem"}).json()
+        self.assertEqual([(r['cenario'], r['quantidade']) for r in data['resultados']], [("otimista", 1), ("realista", 1)])
+        hoje = EstatisticaDiaria.objects.first().dia.isoformat()
+        data = self.client.get(reverse('api_estatisticas'), {"agrupar": "dia", "desde": hoje, "ate": hoje}).json()
+        self.assertEqual(data['resultados'][0]['quantidade'], 3)
+        self.assertEqual(self.client.get(reverse('api_estatisticas'), {"agrupar": "mes"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_estatisticas'), {"desde": "ontem"}).status_code, 400)
+
+
+class TestExportacao(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.belem = Cidade.objects.create(nome="Belém, PA", populacao=1300000, pib_per_capita=25000)
+        for n in (10, 20, 30):
+            payload = {"cidade_id": self.belem.id, "numero_turistas": n, "gasto_medio": 100, "duracao_estadia": 2,
+                       "cidades_visitadas": 1, "cenario": "otimista" if n == 30 else "realista"}
+            self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+        Simulacao.objects.create(cidade=self.belem, parametros={"numero_turistas": 40}, status=Simulacao.Status.PENDENTE)
+
+    def test_endpoint_csv_e_ndjson(self):
+        import csv
+
+        resp = self.client.get(reverse('api_exportar'), {"formato": "csv"})
+        self.assertTrue(resp.streaming)
+        linhas = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual([int(l['numero_turistas']) for l in linhas], [10, 20, 30, 40])
+        self.assertEqual(linhas[0]['cidade'], "Belém, PA")
+        self.assertEqual(linhas[3]['impacto_total'], "")
+
+        resp = self.client.get(reverse('api_exportar'), {"cenario": "otimista", "completo": "1"})
+        objetos = [json.loads(l) for l in b"".join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(len(objetos), 1)
+        self.assertEqual(objetos[0]['impacto_total'], objetos[0]['resultado']['impacto_total'])
+        self.assertEqual(self.client.get(reverse('api_exportar'), {"formato": "xml"}).status_code, 400)
+
+    def test_blocos_pequenos_sem_perder_linhas(self):
+        blocos = list(exportacao.iterar_blocos(exportacao.consulta(), tamanho_bloco=3))
+        self.assertEqual([len(b) for b in blocos], [3, 1])
+
+    def test_parametros_em_texto_saem_tipados(self):
+        # Valores do payload guardados como texto precisam casar com as colunas int64/float64 do Parquet
+        Simulacao.objects.create(
+            cidade=self.belem, status=Simulacao.Status.PENDENTE,
+            parametros={"numero_turistas": "100", "gasto_medio": "150.5", "duracao_estadia": "3"},
+        )
+        Simulacao.objects.create(
+            cidade=self.belem, status=Simulacao.Status.PENDENTE,
+            parametros={"numero_turistas": "muitos", "gasto_medio": "nan", "duracao_estadia": 2.5},
+        )
+        linhas = [l for b in exportacao.iterar_blocos(exportacao.consulta()) for l in b]
+        tipados, invalidos = linhas[-2], linhas[-1]
+        self.assertEqual((tipados['numero_turistas'], tipados['gasto_medio'], tipados['duracao_estadia']), (100, 150.5, 3))
+        self.assertIsInstance(tipados['numero_turistas'], int)
+        self.assertIsInstance(linhas[0]['gasto_medio'], float)
+        self.assertEqual((invalidos['numero_turistas'], invalidos['gasto_medio'], invalidos['duracao_estadia']), (None, None, None))
+
+    def test_comando(self):
+        out = io.StringIO()
+        call_command("exportar_simulacoes", "--formato", "ndjson", "--status", "concluida", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class TestImportacaoCidades(TestCase):
+    CSV = (
+        "Nome do Município;UF;População;PIB per capita\n"
+        "Belém;PA;1.303.389;25.123,45\n"
+        "Marabá;PA;266932;30000\n"
+        ";PA;10;10\n"
+        "Bom Jesus;PI;25000;12.000,00\n"
+        "Bom Jesus;RS;11000;40000\n"
+        "Santarém;PA;muitos;1\n"
+    )
+
+    def _importar(self, texto, **kwargs):
+        return importacao.importar_cidades(importacao.ler_csv(io.StringIO(texto)), **kwargs)
+
+    def test_upsert_idempotente(self):
+        Cidade.objects.create(nome="Belém", populacao=1, pib_per_capita=1)
+        catalogo.todas()
+        resultado = self._importar(self.CSV, tamanho_lote=2)
+        self.assertEqual((resultado.inseridas, resultado.atualizadas, resultado.inalteradas, resultado.ignoradas), (2, 1, 0, 3))
+        belem = Cidade.objects.get(nome="Belém")
+        self.assertEqual((belem.populacao, str(belem.pib_per_capita), belem.estado), (1303389, "25123.45", "PA"))
+        self.assertEqual(Cidade.objects.get(nome="Bom Jesus").estado, "PI")
+        # nome_normalizado preenchido e catálogo invalidado
+        self.assertEqual(catalogo.por_nome("MARABA").populacao, 266932)
+
+        with self.assertNumQueries(3):  # savepoint, consulta do lote, release
+            resultado = self._importar(self.CSV)
+        self.assertEqual((resultado.inseridas, resultado.atualizadas, resultado.inalteradas), (0, 0, 3))
+
+    def test_comando_dry_run_e_cabecalho_invalido(self):
+        import tempfile
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as f:
+            f.write("nome,populacao,pib_per_capita\nAltamira,115000,20000.50\n")
+        out = io.StringIO()
+        call_command("importar_cidades", f.name, "--dry-run", stdout=out, stderr=io.StringIO())
+        self.assertIn("1 inserida(s)", out.getvalue())
+        self.assertFalse(Cidade.objects.exists())
+        call_command("importar_cidades", f.name, "--estado", "PA", stdout=io.StringIO())
+        self.assertEqual(Cidade.objects.get().estado, "PA")
+        os.unlink(f.name)
+        with self.assertRaises(ValueError):
+            self._importar("cidade;habitantes\nBelém;1\n")
+
+    def test_admin_importar_csv(self):
+        from django.contrib.auth.models import User
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "x"))
+        url = reverse("admin:simulacao_cidade_importar_csv")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        arquivo = SimpleUploadedFile("cidades.csv", self.CSV.encode("latin-1"))
+        resp = self.client.post(url, {"arquivo": arquivo, "encoding": "latin-1"})
+        self.assertRedirects(resp, reverse("admin:simulacao_cidade_changelist"))
+        self.assertEqual(Cidade.objects.count(), 3)
+
+
+class TestPonderacao(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.belem = Cidade.objects.create(nome="Belém", populacao=300, pib_per_capita=10)
+        Cidade.objects.create(nome="Marabá", populacao=100, pib_per_capita=60)
+        self.base = {"numero_turistas": 1000, "gasto_medio": 100.333, "duracao_estadia": 3}
+
+    def test_custom_reparte_em_centavos_exatos(self):
+        parametros = {**self.base, "cidades_visitadas": ["A", "B", "C"], "ponderacao": "custom", "pesos": {"a": 1, "B": 1, "c": 1}}
+        resultado = calcular_impacto_economico(parametros)
+        self.assertEqual(resultado['ponderacao'], 'custom')
+        self.assertAlmostEqual(sum(resultado['impacto_por_cidade'].values()), resultado['impacto_total'], places=6)
+        with self.assertRaises(ParametrosInvalidos):
+            calcular_impacto_economico({**parametros, "pesos": [1, 2]})
+        with self.assertRaises(ParametrosInvalidos):
+            calcular_impacto_economico({**parametros, "cidades_visitadas": 3})
+        # Sem ponderação o resultado não muda
+        self.assertNotIn('ponderacao', calcular_impacto_economico({**self.base, "cidades_visitadas": ["A", "B"]}))
+
+    def test_api_pondera_por_cadastro_sem_consulta_por_cidade(self):
+        catalogo.todas()
+        coeficientes.atual()
+        payload = {"cidade_id": self.belem.id, **self.base, "cidades_visitadas": ["Belem", "Marabá"], "ponderacao": "populacao"}
+        # Só a consulta de hash (antes e dentro do voo) e as gravações (simulação, relatório, estatística):
+        # nenhuma por cidade
+        with self.assertNumQueries(10):
+            data = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json').json()
+        por_cidade = data['resultado']['impacto_por_cidade']
+        self.assertAlmostEqual(por_cidade['Belem'], 3 * por_cidade['Marabá'], delta=0.02)
+        self.assertEqual(data['parametros']['pesos'], {"Belem": 300.0, "Marabá": 100.0})
+
+        payload['ponderacao'] = "pib"
+        data = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json').json()
+        self.assertFalse(data.get('reutilizado'))
+        self.assertAlmostEqual(data['resultado']['impacto_por_cidade']['Belem'] * 2, data['resultado']['impacto_por_cidade']['Marabá'], delta=0.02)
+
+        payload['cidades_visitadas'] = ["Belém", "Atlântida"]
+        resp = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Atlântida", resp.json()['erro'])
+
+    def test_cidades_desconhecidas_confirmadas_numa_consulta(self):
+        catalogo.todas()
+        ponderacao._vetor_pesos.cache_clear()
+        parametros = {**self.base, "cidades_visitadas": ["Belém", "Atlântida", "Eldorado", "Shangri-La"], "ponderacao": "pib"}
+        with self.assertNumQueries(1):
+            with self.assertRaisesMessage(ParametrosInvalidos, "Atlântida, Eldorado, Shangri-La"):
+                ponderacao.resolver_pesos(parametros)
+
+    def test_pesos_do_cadastro_mudam_o_hash(self):
+        payload = {"cidade_id": self.belem.id, **self.base, "cidades_visitadas": ["Belém", "Marabá"], "ponderacao": "populacao"}
+        primeira = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json').json()
+        Cidade.objects.filter(nome="Marabá").update(populacao=300)
+        catalogo.invalidar()
+        segunda = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json').json()
+        self.assertNotEqual(primeira['simulacao_id'], segunda['simulacao_id'])
+        self.assertEqual(segunda['resultado']['impacto_por_cidade']['Belém'], segunda['resultado']['impacto_por_cidade']['Marabá'])
+
+
+class TestComparacao(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        Cidade.objects.create(nome="Belém", estado="PA", populacao=1_300_000, pib_per_capita=25_000)
+        Cidade.objects.create(nome="Soure", estado="Pará", populacao=25_000, pib_per_capita=12_000)
+        Cidade.objects.create(nome="Marabá", estado="PA", populacao=280_000, pib_per_capita=40_000)
+        Cidade.objects.create(nome="Manaus", estado="AM", populacao=2_000_000, pib_per_capita=40_000)
+        self.payload = {"numero_turistas": 1000, "gasto_medio": 200, "duracao_estadia": 3, "cidades_visitadas": 1}
+
+    def _comparar(self, **extra):
+        return self.client.post(reverse('api_comparar'), data=json.dumps({**self.payload, **extra}), content_type='application/json')
+
+    def test_ranking_por_estado_sem_gravar_simulacoes(self):
+        catalogo.todas()
+        coeficientes.atual()
+        with self.assertNumQueries(0):
+            data = self._comparar(estado="pa").json()
+        self.assertEqual(data['n_cidades'], 3)
+        self.assertEqual([r['cidade'] for r in data['ranking']], ["Soure", "Marabá", "Belém"])
+        soure = data['ranking'][0]
+        self.assertAlmostEqual(soure['participacao_pib'], 100 * data['impacto_total'] / (25_000 * 12_000), places=6)
+        por_capita = self._comparar(criterio="impacto_per_capita", limite=2).json()
+        self.assertEqual([r['cidade'] for r in por_capita['ranking']], ["Soure", "Marabá"])
+        self.assertEqual(por_capita['n_cidades'], 4)
+        self.assertFalse(Simulacao.objects.exists())
+
+    def test_salvar_um_registro_agrupado(self):
+        resp = self._comparar(salvar=True, limite=1)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(resp.json()['ranking']), 1)
+        registro = Comparacao.objects.get()
+        self.assertEqual(len(registro.resultado['ranking']), 4)
+        data = self.client.get(resp.json()['url'], {"limite": 2}).json()
+        self.assertEqual([r['posicao'] for r in data['ranking']], [1, 2])
+
+    def test_erros(self):
+        self.assertEqual(self._comparar(criterio="area").status_code, 400)
+        self.assertEqual(self._comparar(estado="XX").status_code, 400)
+        self.assertEqual(self._comparar(numero_turistas=0).status_code, 400)
+
+
+class TestProjecao(TestCase):
+    def setUp(self):
+        self.payload = {"numero_turistas": 120_000, "gasto_medio": 200, "duracao_estadia": 3, "cidades_visitadas": 1,
+                        "inicio": "2025-01", "horizonte_meses": 24}
+
+    def test_serie_respeita_sazonalidade_e_crescimento(self):
+        modelo = projecao.montar_projecao({**self.payload, "sazonalidade": "para", "crescimento_anual": 0})
+        mensal = projecao.projetar(modelo)
+        self.assertEqual(mensal['datas'].size, 24)
+        self.assertAlmostEqual(mensal['impacto'][:12].sum(), modelo['impacto_ano'], places=4)
+        self.assertAlmostEqual(mensal['impacto'][6] / mensal['impacto'][0], 1.5 / 1.1)
+        diaria = projecao.projetar({**modelo, 'granularidade': 'diaria'})
+        self.assertEqual(diaria['datas'].size, 365 + 365)
+        self.assertAlmostEqual(diaria['impacto'][:31].sum(), mensal['impacto'][0], places=4)
+        # Crescimento: o segundo ano é (1 + g) vezes o primeiro (mensal, sem sazonalidade)
+        crescente = projecao.projetar(projecao.montar_projecao({**self.payload, "crescimento_anual": 0.05}))
+        self.assertAlmostEqual(crescente['impacto'][12:].sum() / crescente['impacto'][:12].sum(), 1.05)
+
+    def test_lttb_preserva_extremos(self):
+        y = np.zeros(1000)
+        y[437] = 10.0
+        indices = projecao.lttb(y, 20)
+        self.assertEqual(indices.size, 20)
+        self.assertIn(437, indices.tolist())
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+
+    def test_api_grava_empacotado_e_reamostra(self):
+        resp = self.client.post(reverse('api_projetar'), data=json.dumps({**self.payload, "granularidade": "diaria", "resolucao": "mensal"}),
+                                content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        data = resp.json()
+        self.assertEqual(len(data['datas']), 24)
+        registro = Projecao.objects.get()
+        self.assertEqual(registro.n_pontos, 730)
+        self.assertEqual(projecao.desempacotar(registro.impacto).size, 730)
+
+        anual = self.client.get(data['url'], {"resolucao": "anual"}).json()
+        self.assertEqual(anual['datas'], ["2025-01", "2026-01"])
+        self.assertAlmostEqual(sum(anual['impacto']), anual['impacto_total'], places=1)
+        reduzida = self.client.get(data['url'], {"pontos": 50}).json()
+        self.assertEqual(len(reduzida['datas']), 50)
+        self.assertEqual(reduzida['datas'][0], "2025-01-01")
+        self.assertEqual(self.client.get(data['url'], {"resolucao": "semanal"}).status_code, 400)
+
+    def test_parametros_invalidos(self):
+        for extra in ({"horizonte_meses": 0}, {"sazonalidade": [1, 2]}, {"granularidade": "horaria"}, {"inicio": "jan"}):
+            resp = self.client.post(reverse('api_projetar'), data=json.dumps({**self.payload, **extra}), content_type='application/json')
+            self.assertEqual(resp.status_code, 400, extra)
+
+    def test_campos_numericos_devem_ser_escalares(self):
+        for extra in ({"numero_turistas": [1000, 2000]}, {"gasto_medio": [200]}, {"crescimento_anual": [0.1, 0.2]},
+                      {"duracao_estadia": {"a": 1}}, {"multiplicador": [1.1]}, {"gasto_medio": "muito"}):
+            resp = self.client.post(reverse('api_projetar'), data=json.dumps({**self.payload, **extra}), content_type='application/json')
+            self.assertEqual(resp.status_code, 400, extra)
+            self.assertIn(next(iter(extra)), resp.json()["erro"])
+        self.assertFalse(Projecao.objects.exists())
+
+    def test_opcoes_de_serie_invalidas_nao_gravam(self):
+        for extra in ({"resolucao": ["mensal"]}, {"resolucao": "semanal"}, {"resolucao": "diaria"},
+                      {"pontos": "muitos"}, {"pontos": 2}, {"pontos": [10]}, {"pontos": 10.5}):
+            resp = self.client.post(reverse('api_projetar'), data=json.dumps({**self.payload, **extra}), content_type='application/json')
+            self.assertEqual(resp.status_code, 400, extra)
+        self.assertFalse(Projecao.objects.exists())
+
+    def test_valores_fora_do_intervalo(self):
+        for extra in ({"numero_turistas": 1e30}, {"duracao_estadia": 2 ** 70}, {"gasto_medio": 1e308}):
+            resp = self.client.post(reverse('api_projetar'), data=json.dumps({**self.payload, **extra}), content_type='application/json')
+            self.assertEqual(resp.status_code, 400, extra)
+            self.assertIn("fora do intervalo", resp.json()["erro"])
+        self.assertFalse(Projecao.objects.exists())
+
+
+class TestRegistroCoeficientes(TestCase):
+    def setUp(self):
+        coeficientes.invalidar()
+        self.cidade = Cidade.objects.create(nome="Soure", populacao=25000, pib_per_capita=12000)
+        self.payload = {
+            "cidade_id": self.cidade.id, "numero_turistas": 40, "gasto_medio": 200, "duracao_estadia": 12,
+            "cidades_visitadas": ["Soure", "Salvaterra"], "cenario": "otimista",
+        }
+
+    def tearDown(self):
+        coeficientes.invalidar()
+
+    def _post(self, payload):
+        return self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+
+    def test_versao_inicial_reproduz_valores_padrao(self):
+        vigentes = coeficientes.atual()
+        self.assertEqual(vigentes.versao, VersaoCoeficientes.objects.get(ativa=True).id)
+        self.assertEqual(vigentes.cenarios, COEFICIENTES_PADRAO.cenarios)
+        self.assertEqual(vigentes.crescimento, COEFICIENTES_PADRAO.crescimento)
+        parametros = {k: v for k, v in self.payload.items() if k != "cidade_id"}
+        com_registro = calcular_impacto_economico(parametros, coeficientes=vigentes)
+        self.assertEqual(com_registro.pop('versao_coeficientes'), vigentes.versao)
+        self.assertEqual(com_registro, calcular_impacto_economico(parametros))
+
+    def test_calculo_nao_consulta_banco_com_cache_valido(self):
+        coeficientes.atual()
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                coeficientes.atual()
+
+    def test_nova_versao_invalida_reuso_e_fica_no_relatorio(self):
+        primeira = self._post(self.payload).json()
+        v1 = VersaoCoeficientes.objects.get(ativa=True)
+        self.assertEqual(Relatorio.objects.get(simulacao_id=primeira["simulacao_id"]).versao_coeficientes, v1)
+        self.assertTrue(self._post(self.payload).json()["reutilizado"])
+
+        v2 = v1.duplicar("Otimista revisado")
+        CenarioCoeficiente.objects.filter(versao=v2, nome="otimista").update(multiplicador="1.3000")
+        v2.ativar()
+
+        nova = self._post(self.payload).json()
+        self.assertFalse(nova["reutilizado"])
+        self.assertEqual(nova["resultado"]["versao_coeficientes"], v2.id)
+        self.assertEqual(nova["resultado"]["multiplicador"], 1.3)
+        self.assertEqual(Relatorio.objects.get(simulacao_id=nova["simulacao_id"]).versao_coeficientes, v2)
+        self.assertEqual(Relatorio.objects.get(simulacao_id=primeira["simulacao_id"]).versao_coeficientes, v1)
+        self.assertEqual(VersaoCoeficientes.objects.filter(ativa=True).count(), 1)
+
+    def test_edicao_de_cenario_e_novo_cenario(self):
+        versao = VersaoCoeficientes.objects.get(ativa=True)
+        marca = versao.atualizada_em
+        CenarioCoeficiente.objects.create(versao=versao, nome="Pessimista", multiplicador="0.7500", crescimento_anual="-0.0100")
+        versao.refresh_from_db()
+        self.assertGreater(versao.atualizada_em, marca)
+        self.assertEqual(coeficientes.atual().cenarios["pessimista"], 0.75)
+
+        resposta = self._post({**self.payload, "cenario": "pessimista"})
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json()["resultado"]["multiplicador"], 0.75)
+        erro = self._post({**self.payload, "cenario": "foo"}).json()["erro"]
+        self.assertIn("pessimista", erro)
+
+        form = SimulacaoForm({
+            'cidade_principal': str(self.cidade.id), 'numero_turistas': 10, 'gasto_medio': 100,
+            'duracao_estadia': 2, 'cenario': 'pessimista',
+        })
+        self.assertIn(('pessimista', 'Pessimista'), list(form.fields['cenario'].choices))
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+
+class TestRecalculoRelatorios(TestCase):
+    def setUp(self):
+        coeficientes.invalidar()
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Santarém", populacao=330000, pib_per_capita=20000)
+        self.ids = []
+        for n in (10, 20, 30):
+            payload = {"cidade_id": self.cidade.id, "numero_turistas": n, "gasto_medio": 100, "duracao_estadia": 2,
+                       "cidades_visitadas": 1, "cenario": "otimista"}
+            resp = self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json')
+            self.ids.append(resp.json()["simulacao_id"])
+        self.v1 = VersaoCoeficientes.objects.get(ativa=True)
+        self.v2 = self.v1.duplicar()
+        CenarioCoeficiente.objects.filter(versao=self.v2, nome="otimista").update(multiplicador="2.0000")
+        self.v2.ativar()
+
+    def tearDown(self):
+        coeficientes.invalidar()
+
+    def _recalcular(self, *args):
+        out = io.StringIO()
+        call_command("recalcular_relatorios", *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_dry_run_resume_sem_gravar(self):
+        saida = self._recalcular("--dry-run")
+        self.assertIn("3 relatório(s) lido(s)", saida)
+        self.assertIn("3 alterado(s)", saida)
+        self.assertIn("dry-run", saida)
+        self.assertEqual(Relatorio.objects.filter(versao_coeficientes=self.v1).count(), 3)
+
+    def test_recalcula_em_lotes_com_checkpoint(self):
+        import tempfile
+
+        soma_antes = EstatisticaDiaria.objects.get(cidade=self.cidade).soma_impacto
+        with tempfile.TemporaryDirectory() as pasta:
+            checkpoint = os.path.join(pasta, "recalculo.json")
+            # Interrompido depois do primeiro relatório: a retomada pula o que já foi gravado
+            primeiro = Relatorio.objects.get(simulacao_id=self.ids[0])
+            recalculo.salvar_checkpoint(checkpoint, recalculo.ResumoRecalculo(ultimo_id=primeiro.id, lidos=1), coeficientes.atual(), False)
+            saida = self._recalcular("--lote", "1", "--checkpoint", checkpoint)
+            self.assertIn("3 relatório(s) lido(s)", saida)
+            with open(checkpoint, encoding="utf-8") as arquivo:
+                self.assertEqual(json.load(arquivo)["resumo"]["ultimo_id"], Relatorio.objects.order_by("id").last().id)
+
+        relatorios = Relatorio.objects.order_by("id")
+        self.assertEqual([r.versao_coeficientes_id for r in relatorios], [self.v1.id, self.v2.id, self.v2.id])
+        recalculado = relatorios[1]
+        self.assertEqual(recalculado.resultado["multiplicador"], 2.0)
+        self.assertEqual(float(recalculado.impacto_total), recalculado.resultado["impacto_total"])
+        # Estatísticas corrigidas pela diferença, sem alterar a quantidade
+        linha = EstatisticaDiaria.objects.get(cidade=self.cidade)
+        self.assertEqual(linha.quantidade, 3)
+        self.assertEqual(linha.soma_impacto, soma_antes + Decimal("8500.00"))  # (8000 - 4600) + (12000 - 6900)
+
+        # Já na versão alvo: nada mais a recalcular
+        self.assertIn("1 relatório(s) lido(s)", self._recalcular())
+        self.assertIn("0 relatório(s) lido(s)", self._recalcular())
+
+
+class TestIdempotenciaECoalescencia(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Altamira", populacao=115000, pib_per_capita=30000)
+        self.payload = {"cidade_id": self.cidade.id, "numero_turistas": 15, "gasto_medio": 90, "duracao_estadia": 3, "cidades_visitadas": 1}
+
+    def _post(self, payload, chave=None):
+        extra = {"HTTP_IDEMPOTENCY_KEY": chave} if chave else {}
+        return self.client.post(reverse('api_simular'), data=json.dumps(payload), content_type='application/json', **extra)
+
+    def test_repeticao_devolve_resposta_original(self):
+        primeira = self._post(self.payload, "pedido-1")
+        self.assertEqual(primeira.status_code, 201)
+        cache.cache_local.clear()
+        repetida = self._post(self.payload, "pedido-1")
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida["Idempotent-Replayed"], "true")
+        self.assertEqual(repetida.json(), primeira.json())
+        self.assertEqual(Simulacao.objects.count(), 1)
+        # Sem a chave, a deduplicação por hash responde 200 com reutilizado
+        self.assertTrue(self._post(self.payload).json()["reutilizado"])
+
+    def test_chave_com_outro_corpo_ou_em_processamento(self):
+        self._post(self.payload, "pedido-2")
+        self.assertEqual(self._post({**self.payload, "numero_turistas": 16}, "pedido-2").status_code, 422)
+        self.assertEqual(self._post(self.payload, "x" * 256).status_code, 400)
+
+        from django.utils import timezone
+        from .idempotencia import _impressao
+        from .models import ChaveIdempotencia
+
+        request = RequestFactory().post(reverse('api_simular'), data=json.dumps(self.payload), content_type='application/json')
+        ChaveIdempotencia.objects.create(chave="pedido-3", impressao=_impressao(request), expira_em=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(self._post(self.payload, "pedido-3").status_code, 409)
+        # Reserva abandonada expira e a chave pode ser usada de novo
+        ChaveIdempotencia.objects.filter(chave="pedido-3").update(expira_em=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._post(self.payload, "pedido-3").status_code, 200)  # reutiliza a simulação de pedido-2
+
+    def test_coalesce_execucoes_simultaneas(self):
+        import threading
+        import time
+
+        from .coalescencia import SingleFlight
+
+        voos = SingleFlight()
+        chamadas, resultados = [], []
+        barreira = threading.Barrier(5)
+
+        def calcular():
+            chamadas.append(1)
+            time.sleep(0.2)
+            return 42
+
+        def requisicao():
+            barreira.wait()
+            resultados.append(voos.executar("mesma-chave", calcular))
+
+        threads = [threading.Thread(target=requisicao) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(sorted(resultados), [(42, False)] + [(42, True)] * 4)
+        self.assertEqual(voos.em_andamento(), 0)
+
+    def test_coalesce_corrotinas(self):
+        import asyncio
+
+        from .coalescencia import SingleFlight
+
+        voos = SingleFlight()
+        chamadas = []
+
+        async def calcular():
+            chamadas.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def rodar():
+            return await asyncio.gather(*(voos.aexecutar("k", calcular) for _ in range(3)))
+
+        self.assertEqual(asyncio.run(rodar()), [("ok", False), ("ok", True), ("ok", True)])
+        self.assertEqual(len(chamadas), 1)
+
+    def test_lider_confere_simulacao_gravada_por_lider_anterior(self):
+        from unittest import mock
+
+        from . import views
+
+        primeira = self._post(self.payload).json()
+        cache.cache_local.clear()
+        real = views._simulacao_existente
+        chamadas = []
+
+        def existente(chave, versao):
+            # A consulta de reuso não vê a simulação (o líder anterior ainda não tinha
+            # gravado); a conferência dentro do voo vê
+            chamadas.append(chave)
+            return None if len(chamadas) == 1 else real(chave, versao)
+
+        with mock.patch.object(views, "_simulacao_existente", side_effect=existente):
+            resp = self._post(self.payload)
+        self.assertEqual(len(chamadas), 2)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["simulacao_id"], primeira["simulacao_id"])
+        self.assertTrue(resp.json()["reutilizado"])
+        self.assertEqual(Simulacao.objects.count(), 1)
+        self.assertEqual(Relatorio.objects.count(), 1)
+
+
+class TestBenchmark(TestCase):
+    def test_casos_medem_tempo_e_consultas(self):
+        from . import benchmark
+
+        cidade = Cidade.objects.create(nome="Benchmark", populacao=1, pib_per_capita=1)
+        catalogo.invalidar()
+        resultado = benchmark.executar(cidade.id, repeticoes=2, tempo_max=0.5)
+        casos = resultado['casos']
+        self.assertIn('calcular_lista_10000', casos)
+        self.assertIn('formulario_validacao', casos)
+        self.assertGreater(casos['api_simular_nova']['consultas'], 0)
+        self.assertEqual(casos['api_simular_reutilizada']['consultas'], 0)
+        self.assertEqual(casos['api_resultado']['execucoes'], 2)
+        self.assertGreater(casos['calcular_lista_1']['mediana_us'], 0)
+
+    def test_comparar_acusa_regressao(self):
+        from . import benchmark
+
+        baseline = {'casos': {'a': {'mediana_us': 100.0}, 'b': {'mediana_us': 100.0, 'consultas': 2}, 'c': {'mediana_us': 100.0}}}
+        atual = {'casos': {
+            'a': {'mediana_us': 120.0},
+            'b': {'mediana_us': 90.0, 'consultas': 3},
+            'c': {'mediana_us': 200.0},
+            'novo': {'mediana_us': 1.0},
+        }}
+        comparacoes = {c['caso']: c for c in benchmark.comparar(baseline, atual, limite=0.25)}
+        self.assertEqual(set(comparacoes), {'a', 'b', 'c'})
+        self.assertFalse(comparacoes['a']['regrediu'])
+        self.assertTrue(comparacoes['b']['regrediu'])
+        self.assertTrue(comparacoes['c']['regrediu'])
+        self.assertEqual(comparacoes['c']['razao'], 2.0)
+
+    def test_modos_invalidos_falham(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaisesMessage(CommandError, "Modos inválidos: foo"):
+            call_command("benchmark_asgi", "--modos", "asgi,foo", stdout=io.StringIO())
+
+
+class TestPerfilRequisicao(TestCase):
+    def setUp(self):
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Marabá", populacao=280000, pib_per_capita=30000)
+        catalogo.invalidar()
+        coeficientes.atual()
+        self.payload = {"cidade_id": self.cidade.id, "numero_turistas": 40, "gasto_medio": 90, "duracao_estadia": 2, "cidades_visitadas": 2}
+
+    def _metricas(self, resposta) -> dict:
+        metricas = {}
+        for item in resposta["Server-Timing"].split(", "):
+            nome, *atributos = item.split(";")
+            metricas[nome] = dict(a.split("=", 1) for a in atributos)
+        return metricas
+
+    def test_desligado_sem_cabecalho(self):
+        resp = self.client.post(reverse('api_simular'), data=json.dumps(self.payload), content_type='application/json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertNotIn("Server-Timing", resp)
+
+    def test_server_timing_com_trechos_e_consultas(self):
+        with override_settings(SIMULACAO_PERFIL=True):
+            resp = self.client.post(reverse('api_simular'), data=json.dumps(self.payload), content_type='application/json')
+            resultado = self.client.get(reverse('api_resultado', args=[resp.json()['simulacao_id']]))
+            assincrona = self.client.get(reverse('api_resultado_async', args=[resp.json()['simulacao_id']]))
+        self.assertEqual(resp.status_code, 201)
+        metricas = self._metricas(resp)
+        for nome in ("json", "cidade", "parametros", "reuso", "calculo", "decimal", "gravacao", "db", "total"):
+            self.assertIn(nome, metricas)
+        # SAVEPOINT/INSERTs da gravação e a busca por simulação existente
+        self.assertGreaterEqual(int(metricas["db"]["desc"].strip('"').split()[0]), 3)
+        self.assertEqual(self._metricas(resultado)["db"]["desc"], '"1 consultas"')
+        self.assertEqual(self._metricas(assincrona)["db"]["desc"], '"1 consultas"')
+
+    def test_amostra_grava_cprofile(self):
+        import pstats
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            with override_settings(SIMULACAO_PERFIL=True, SIMULACAO_PERFIL_AMOSTRA=1.0, SIMULACAO_PERFIL_DIR=diretorio):
+                resp = self.client.post(reverse('api_simular'), data=json.dumps(self.payload), content_type='application/json')
+            self.assertEqual(os.listdir(diretorio), [resp["X-Perfil"]])
+            estatisticas_perfil = pstats.Stats(os.path.join(diretorio, resp["X-Perfil"]))
+            self.assertTrue(any(f[2] == "calcular_impacto_economico" for f in estatisticas_perfil.stats))
+
+
+class TestMetricas(TestCase):
+    def setUp(self):
+        metricas.registro.limpar()
+        cache.cache_local.clear()
+        self.cidade = Cidade.objects.create(nome="Altamira", populacao=110000, pib_per_capita=20000)
+        catalogo.invalidar()
+        self.payload = {"cidade_id": self.cidade.id, "numero_turistas": 30, "gasto_medio": 100, "duracao_estadia": 2,
+                        "cidades_visitadas": 1, "cenario": "otimista"}
+
+    def _linhas(self) -> list[str]:
+        resp = self.client.get(reverse('metricas'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return resp.content.decode().splitlines()
+
+    def test_requisicoes_calculo_erros_e_gravacao(self):
+        criada = self.client.post(reverse('api_simular'), data=json.dumps(self.payload), content_type='application/json')
+        self.client.get(reverse('api_resultado', args=[criada.json()['simulacao_id']]))
+        self.client.get(reverse('api_resultado', args=[999999]))
+        invalido = {**self.payload, "numero_turistas": 0}
+        self.assertEqual(self.client.post(reverse('api_simular'), data=json.dumps(invalido), content_type='application/json').status_code, 400)
+
+        linhas = self._linhas()
+        self.assertIn('simulacao_requisicoes_total{cenario="otimista",status="201",view="api_simular"} 1', linhas)
+        self.assertIn('simulacao_requisicoes_total{cenario="otimista",status="200",view="api_resultado"} 1', linhas)
+        self.assertIn('simulacao_requisicoes_total{cenario="nenhum",status="404",view="api_resultado"} 1', linhas)
+        self.assertIn('simulacao_requisicoes_total{cenario="otimista",status="400",view="api_simular"} 1', linhas)
+        self.assertIn('simulacao_erros_validacao_total{classe="numero_turistas deve ser > N"} 1', linhas)
+        self.assertIn('simulacao_calculo_segundos_count{cenario="otimista"} 1', linhas)
+        self.assertIn('simulacao_gravacao_segundos_count 1', linhas)
+        self.assertIn('simulacao_requisicao_segundos_bucket{cenario="otimista",status="201",view="api_simular",le="+Inf"} 1', linhas)
+        self.assertIn('# TYPE simulacao_requisicao_segundos histogram', linhas)
+
+    def test_soma_arquivos_de_outros_processos(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as diretorio, override_settings(SIMULACAO_METRICAS_DIR=diretorio):
+            metricas.incrementar("simulacao_erros_validacao_total", classe="x")
+            metricas.observar("simulacao_gravacao_segundos", 0.002)
+            # Outro worker: mesmo formato gravado por registro.gravar()
+            outro = metricas._Registro()
+            outro.incrementar("simulacao_erros_validacao_total", valor=2, classe="x")
+            outro.observar("simulacao_gravacao_segundos", 0.2)
+            with open(os.path.join(diretorio, "metricas-1.json"), "w", encoding="utf-8") as arquivo:
+                json.dump(outro.instantaneo(), arquivo)
+            linhas = self._linhas()
+        self.assertIn('simulacao_erros_validacao_total{classe="x"} 3', linhas)
+        self.assertIn('simulacao_gravacao_segundos_count 2', linhas)
+        self.assertIn('simulacao_gravacao_segundos_bucket{le="0.0025"} 1', linhas)
+        self.assertIn('simulacao_gravacao_segundos_bucket{le="0.25"} 2', linhas)
+
+    def test_classe_erro(self):
+        self.assertEqual(metricas.classe_erro("pesos ausentes para: Belém, Tomé-Açu"), "pesos ausentes para")
+        self.assertEqual(metricas.classe_erro("cenario inválido (use a|b)"), "cenario inválido")
+        self.assertEqual(metricas.classe_erro("Erro ao converter parâmetros: invalid literal"), "Erro ao converter parâmetros")
+
+
+class TestCacheHTTPResultado(TestCase):
+    def setUp(self):
+        self.cidade = Cidade.objects.create(nome="Soure", populacao=25000, pib_per_capita=12000)
+        parametros = {"numero_turistas": 10, "gasto_medio": 100, "duracao_estadia": 2, "cidades_visitadas": 3, "cenario": "otimista"}
+        self.sim = Simulacao.objects.create(cidade=self.cidade, parametros=parametros)
+        Relatorio.objects.create(simulacao=self.sim, resultado=calcular_impacto_economico(parametros))
+        self.url = reverse('api_resultado', args=[self.sim.id])
+
+    def test_etag_e_304_sem_ler_o_relatorio(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("max-age=86400", resp["Cache-Control"])
+        self.assertIn("public", resp["Cache-Control"])
+        self.assertNotEqual(self.client.get(self.url + "?expandir=1")["ETag"], etag)
+
+        with CaptureQueriesContext(connection) as consultas:
+            nao_modificado = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"outro", W/{etag}')
+        self.assertEqual(nao_modificado.status_code, 304)
+        self.assertEqual(nao_modificado["ETag"], etag)
+        self.assertEqual(nao_modificado.content, b"")
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('"resultado"', consultas[0]["sql"])
+
+        with self.assertNumQueries(2):  # validação e carga completa
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"outro"').status_code, 200)
+        assincrona = self.client.get(reverse('api_resultado_async', args=[self.sim.id]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(assincrona.status_code, 304)
+
+    def test_recalculo_muda_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        versao = VersaoCoeficientes.objects.get(ativa=True).duplicar("Nova")
+        CenarioCoeficiente.objects.filter(versao=versao, nome="otimista").update(multiplicador=Decimal("3.0"))
+        self.assertEqual(recalculo.recalcular(coeficientes.da_versao(versao.id), todos=True).alterados, 1)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_pendente_nao_e_cacheado(self):
+        pendente = Simulacao.objects.create(cidade=self.cidade, parametros={}, status=Simulacao.Status.PENDENTE)
+        resp = self.client.get(reverse('api_resultado', args=[pendente.id]))
+        self.assertEqual(resp.status_code, 202)
+        self.assertNotIn("ETag", resp)
+        self.assertIn("no-store", resp["Cache-Control"])
+
+    @override_settings(
+        SIMULACAO_RESULTADO_CACHE_ALIAS="default",
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "respostas-teste"}},
+    )
+    def test_corpo_serializado_no_cache(self):
+        primeira = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+            nao_modificado = self.client.get(self.url, HTTP_IF_NONE_MATCH=primeira["ETag"])
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertEqual(segunda["ETag"], primeira["ETag"])
+        self.assertEqual(nao_modificado.status_code, 304)
+
+        self.sim.relatorio.save()  # regravado: sai do cache
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+
+class TestRoteamentoReplicas(TestCase):
+    """Réplica em arquivo SQLite com o schema do banco de teste, fora das transações do TestCase."""
+
+    def setUp(self):
+        import shutil
+        import sqlite3
+        import tempfile
+
+        from django.db import connections
+
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        caminho = os.path.join(diretorio, "replica.sqlite3")
+        with connections["default"].cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type DESC")
+            schema = [linha[0] for linha in cursor.fetchall()]
+        destino = sqlite3.connect(caminho)
+        for comando in schema:
+            destino.execute(comando)
+        destino.close()
+        novos = connections.configure_settings({
+            "default": dict(connections.settings["default"]),
+            "replica_teste": {"ENGINE": "django.db.backends.sqlite3", "NAME": caminho},
+            "replica_quebrada": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(diretorio, "nao", "existe.sqlite3")},
+            "replica_ausente": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(diretorio, "ausente.sqlite3")},
+        })
+        for alias in ("replica_teste", "replica_quebrada", "replica_ausente"):
+            connections.settings[alias] = novos[alias]
+            self.addCleanup(self._remover_alias, alias)
+        # Aliases criados depois do setUpClass: libera a conexão a eles neste teste
+        bancos = type(self).databases
+        type(self).databases = bancos | {"replica_teste", "replica_quebrada", "replica_ausente"}
+        self.addCleanup(setattr, type(self), "databases", bancos)
+        roteamento.saude.limpar()
+        token = roteamento.fixar(False)
+        self.addCleanup(roteamento.liberar, token)
+
+    @staticmethod
+    def _remover_alias(alias):
+        from django.db import connections
+
+        if hasattr(connections._connections, alias):
+            connections[alias].close()
+            del connections[alias]
+        del connections.settings[alias]
+
+    @override_settings(SIMULACAO_REPLICAS=["replica_teste"])
+    def test_leituras_na_replica_ate_a_primeira_escrita(self):
+        Cidade.objects.using("replica_teste").create(nome="Só na réplica", populacao=1, pib_per_capita=1)
+        self.assertTrue(Cidade.objects.filter(nome="Só na réplica").exists())
+        Cidade.objects.create(nome="Primária", populacao=1, pib_per_capita=1)
+        # Depois de escrever, o contexto lê do primário
+        self.assertFalse(Cidade.objects.filter(nome="Só na réplica").exists())
+        self.assertTrue(Cidade.objects.filter(nome="Primária").exists())
+        with roteamento.primario():
+            self.assertEqual(Cidade.objects.db, "default")
+
+    @override_settings(SIMULACAO_REPLICAS=["replica_teste"])
+    def test_post_fixa_o_cliente_no_primario(self):
+        cidade = Cidade.objects.using("replica_teste").create(nome="Réplica", populacao=1, pib_per_capita=1)
+        sim = Simulacao.objects.using("replica_teste").create(cidade=cidade, parametros={})
+        Relatorio.objects.using("replica_teste").create(simulacao=sim, resultado={"impacto_total": 1})
+        url = reverse('api_resultado', args=[sim.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        resp = self.client.post(reverse('api_simular'), data="{", content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.cookies["simulacao_primario"]["max-age"], 5)
+        # Com o cookie as leituras vão ao primário, onde a simulação da réplica não existe
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(SIMULACAO_REPLICAS=["replica_quebrada"], SIMULACAO_REPLICA_PAUSA=60)
+    def test_replica_indisponivel_cai_no_primario(self):
+        router = roteamento.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Cidade), "default")
+        self.assertEqual(roteamento.saude.disponiveis(["replica_quebrada", "replica_teste"]), ["replica_teste"])
+        self.assertFalse(router.allow_migrate("replica_quebrada", "simulacao"))
+        self.assertIsNone(router.allow_migrate("default", "simulacao"))
+
+    @override_settings(SIMULACAO_REPLICAS=["replica_ausente"])
+    def test_replica_sqlite_sem_arquivo_nao_e_criada(self):
+        # O diretório existe: conectar criaria um banco vazio e as leituras achariam tabelas ausentes
+        caminho = roteamento.connections["replica_ausente"].settings_dict["NAME"]
+        self.assertEqual(roteamento.ReplicaRouter().db_for_read(Cidade), "default")
+        self.assertFalse(os.path.exists(caminho))
+        self.assertEqual(roteamento.saude.disponiveis(["replica_ausente"]), [])
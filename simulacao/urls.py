@@ -1,10 +1,24 @@
 from __future__ import annotations
 
 from django.urls import path
-from . import views
+from . import views, views_async
 
 urlpatterns = [
     path("simular/", views.simulacao_view, name="simular"),
     path("api/simular/", views.api_simular, name="api_simular"),
+    path("api/simular/lote/", views.api_simular_lote, name="api_simular_lote"),
+    path("api/simular/varredura/", views.api_varredura, name="api_varredura"),
+    path("api/simular/montecarlo/", views.api_montecarlo, name="api_montecarlo"),
+    path("api/simular/comparar/", views.api_comparar, name="api_comparar"),
+    path("api/comparacoes/<int:comparacao_id>/", views.api_comparacao, name="api_comparacao"),
+    path("api/projecoes/", views.api_projetar, name="api_projetar"),
+    path("api/projecoes/<int:projecao_id>/", views.api_projecao, name="api_projecao"),
+    path("api/simulacoes/", views.api_simulacoes, name="api_simulacoes"),
+    path("api/exportar/", views.api_exportar, name="api_exportar"),
+    path("api/estatisticas/", views.api_estatisticas, name="api_estatisticas"),
     path("api/resultados/<int:simulacao_id>/", views.api_resultado, name="api_resultado"),
+    path("metrics", views.metricas_view, name="metricas"),
+    # Versões nativas assíncronas (para servir via ecoimpact.asgi)
+    path("api/async/simular/", views_async.api_simular, name="api_simular_async"),
+    path("api/async/resultados/<int:simulacao_id>/", views_async.api_resultado, name="api_resultado_async"),
 ]
@@ -0,0 +1,191 @@
+"""Varredura de sensibilidade: avalia o produto cartesiano de faixas de parâmetros.
+
+A grade nunca é materializada por inteiro: os pontos são enumerados por índice
+linear e avaliados em blocos com ``calcular_impacto_lote``, de modo que a
+memória usada depende apenas do tamanho do bloco.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .services import COEFICIENTES_PADRAO, Coeficientes, ParametrosInvalidos, calcular_impacto_lote
+
+TAMANHO_BLOCO = 10_000
+
+COLUNAS = [
+    'numero_turistas', 'gasto_medio', 'duracao_estadia', 'n_cidades', 'cenario', 'multiplicador',
+    'ajuste_cidades', 'fator_duracao', 'gasto_total', 'gasto_total_ajustado', 'impacto_total',
+]
+
+
+def _verificar_tamanho(nome: str, tamanho: int, limite: Optional[int]) -> None:
+    if limite is not None and tamanho > limite:
+        raise ParametrosInvalidos(f"{nome}: {tamanho} pontos excedem o limite restante da grade ({limite})")
+
+
+def _eixo_numerico(nome: str, especificacao: Any, inteiro: bool, limite: Optional[int] = None) -> np.ndarray:
+    """Converte valor único, lista ou faixa ``{inicio, fim, passo|pontos, escala}`` em array.
+
+    O tamanho da faixa é calculado antes de alocá-la: acima de ``limite`` pontos
+    lança ParametrosInvalidos sem chamar o numpy.
+    """
+    try:
+        if isinstance(especificacao, dict):
+            inicio = float(especificacao['inicio'])
+            fim = float(especificacao['fim'])
+            if not (math.isfinite(inicio) and math.isfinite(fim)):
+                raise ParametrosInvalidos(f"{nome}: inicio e fim devem ser finitos")
+            if fim < inicio:
+                raise ParametrosInvalidos(f"{nome}: fim deve ser >= inicio")
+            if 'pontos' in especificacao:
+                pontos = int(especificacao['pontos'])
+                if pontos <= 0:
+                    raise ParametrosInvalidos(f"{nome}: pontos deve ser > 0")
+                _verificar_tamanho(nome, pontos, limite)
+                if especificacao.get('escala', 'linear') == 'log':
+                    if inicio <= 0:
+                        raise ParametrosInvalidos(f"{nome}: escala log exige inicio > 0")
+                    valores = np.geomspace(inicio, fim, pontos)
+                else:
+                    valores = np.linspace(inicio, fim, pontos)
+            else:
+                passo = float(especificacao.get('passo', 1))
+                if not passo > 0:
+                    raise ParametrosInvalidos(f"{nome}: passo deve ser > 0")
+                # Mesmo tamanho que np.arange produz abaixo
+                _verificar_tamanho(nome, max(math.ceil((fim + passo * 1e-9 - inicio) / passo), 0), limite)
+                # Tolerância para incluir ``fim`` quando (fim - inicio) é múltiplo de passo
+                valores = np.arange(inicio, fim + passo * 1e-9, passo)
+        elif isinstance(especificacao, (list, tuple)):
+            _verificar_tamanho(nome, len(especificacao), limite)
+            valores = np.asarray([float(v) for v in especificacao], dtype=np.float64)
+        else:
+            valores = np.asarray([float(especificacao)], dtype=np.float64)
+    except (KeyError, TypeError, ValueError, OverflowError) as e:
+        raise ParametrosInvalidos(f"{nome}: especificação inválida ({e})")
+    if valores.size == 0:
+        raise ParametrosInvalidos(f"{nome}: nenhum valor informado")
+    if not np.isfinite(valores).all():
+        # NaN/inf também em listas e valores únicos ("nan" passa por float())
+        raise ParametrosInvalidos(f"{nome}: valores devem ser finitos")
+    if inteiro:
+        valores = np.unique(np.rint(valores).astype(np.int64))
+    else:
+        valores = np.round(valores, 4)
+    return valores
+
+
+def _eixo_cidades(especificacao: Any, limite: Optional[int] = None) -> np.ndarray:
+    # Lista de nomes equivale a um único ponto com n = len(lista), como na função escalar
+    if isinstance(especificacao, (list, tuple)) and any(isinstance(c, str) for c in especificacao):
+        return np.asarray([len([c for c in especificacao if str(c).strip()])], dtype=np.int64)
+    return _eixo_numerico('cidades_visitadas', especificacao, inteiro=True, limite=limite)
+
+
+def montar_grade(parametros: Dict[str, Any], coeficientes: Optional[Coeficientes] = None,
+                 max_pontos: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Valida a especificação da varredura e devolve um array por eixo.
+
+    Cada parâmetro aceito por ``calcular_impacto_economico`` pode ser um valor,
+    uma lista ou uma faixa. ``cenario`` aceita nome ou lista de nomes; se
+    ``multiplicador`` for informado ele sobrescreve o cenário, como na função
+    escalar. Lança ParametrosInvalidos para especificações inválidas e, com
+    ``max_pontos``, para grades maiores que isso; cada eixo é conferido contra o
+    que sobra do limite antes de ser alocado.
+    """
+    obrigatorios = ['numero_turistas', 'gasto_medio', 'duracao_estadia', 'cidades_visitadas']
+    faltando = [c for c in obrigatorios if c not in parametros]
+    if faltando:
+        raise ParametrosInvalidos(f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    cenarios_raw = parametros.get('cenario', 'realista')
+    if not isinstance(cenarios_raw, (list, tuple)):
+        cenarios_raw = [cenarios_raw]
+    cenarios = [str(c).lower() for c in cenarios_raw]
+    for cenario in cenarios or ['']:
+        (coeficientes or COEFICIENTES_PADRAO).validar_cenario(cenario)
+
+    grade = {'cenario': np.asarray(list(dict.fromkeys(cenarios)))}
+
+    def restante() -> Optional[int]:
+        return None if max_pontos is None else max_pontos // total_pontos(grade)
+
+    grade['numero_turistas'] = _eixo_numerico('numero_turistas', parametros['numero_turistas'], True, restante())
+    grade['gasto_medio'] = _eixo_numerico('gasto_medio', parametros['gasto_medio'], False, restante())
+    grade['duracao_estadia'] = _eixo_numerico('duracao_estadia', parametros['duracao_estadia'], True, restante())
+    grade['n_cidades'] = _eixo_cidades(parametros['cidades_visitadas'], restante())
+    if parametros.get('multiplicador') is not None:
+        grade['multiplicador'] = _eixo_numerico('multiplicador', parametros['multiplicador'], False, restante())
+    # Mesma ordem de eixos de antes (define a ordem das linhas da varredura)
+    grade = {nome: grade[nome] for nome in ('numero_turistas', 'gasto_medio', 'duracao_estadia', 'n_cidades', 'cenario', 'multiplicador') if nome in grade}
+
+    if (grade['numero_turistas'] <= 0).any():
+        raise ParametrosInvalidos("numero_turistas deve ser > 0")
+    if (grade['gasto_medio'] < 0).any():
+        raise ParametrosInvalidos("gasto_medio não pode ser negativo")
+    if (grade['duracao_estadia'] <= 0).any():
+        raise ParametrosInvalidos("duracao_estadia deve ser > 0")
+    if (grade['n_cidades'] <= 0).any():
+        raise ParametrosInvalidos("cidades_visitadas deve conter pelo menos 1 cidade")
+    if 'multiplicador' in grade and (grade['multiplicador'] <= 0).any():
+        raise ParametrosInvalidos("multiplicador deve ser > 0")
+    total = total_pontos(grade)
+    if max_pontos is not None and total > max_pontos:
+        raise ParametrosInvalidos(f"Grade com {total} pontos excede o limite de {max_pontos}.")
+    return grade
+
+
+def total_pontos(grade: Dict[str, np.ndarray]) -> int:
+    total = 1
+    for eixo in grade.values():
+        total *= int(eixo.size)
+    return total
+
+
+def iterar_blocos(grade: Dict[str, np.ndarray], tamanho_bloco: int = TAMANHO_BLOCO,
+                  coeficientes: Optional[Coeficientes] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """Percorre o produto cartesiano em blocos de colunas, sem materializá-lo."""
+    coeficientes = coeficientes or COEFICIENTES_PADRAO
+    nomes = list(grade)
+    forma = tuple(grade[n].size for n in nomes)
+    total = total_pontos(grade)
+    tabela = np.asarray([coeficientes.cenarios[c] for c in grade['cenario']], dtype=np.float64)
+    for inicio in range(0, total, tamanho_bloco):
+        indices = np.unravel_index(np.arange(inicio, min(inicio + tamanho_bloco, total)), forma)
+        colunas = {nome: grade[nome][idx] for nome, idx in zip(nomes, indices)}
+        if 'multiplicador' not in colunas:
+            colunas['multiplicador'] = tabela[indices[nomes.index('cenario')]]
+        colunas.update(calcular_impacto_lote(
+            colunas['numero_turistas'],
+            colunas['gasto_medio'],
+            colunas['duracao_estadia'],
+            colunas['n_cidades'],
+            colunas['multiplicador'],
+            coeficientes,
+        ))
+        colunas.pop('impacto_por_cidade')
+        yield colunas
+
+
+def _linhas(bloco: Dict[str, np.ndarray]) -> List[tuple]:
+    return list(zip(*(bloco[c].tolist() for c in COLUNAS)))
+
+
+def gerar_ndjson(grade: Dict[str, np.ndarray], tamanho_bloco: int = TAMANHO_BLOCO,
+                 coeficientes: Optional[Coeficientes] = None) -> Iterator[str]:
+    """Gera a varredura como NDJSON (um objeto por linha), um bloco por vez."""
+    for bloco in iterar_blocos(grade, tamanho_bloco, coeficientes):
+        yield ''.join(json.dumps(dict(zip(COLUNAS, linha)), ensure_ascii=False) + '\n' for linha in _linhas(bloco))
+
+
+def gerar_csv(grade: Dict[str, np.ndarray], tamanho_bloco: int = TAMANHO_BLOCO,
+              coeficientes: Optional[Coeficientes] = None) -> Iterator[str]:
+    """Gera a varredura como CSV com cabeçalho, um bloco por vez."""
+    yield ','.join(COLUNAS) + '\n'
+    for bloco in iterar_blocos(grade, tamanho_bloco, coeficientes):
+        yield ''.join(','.join(map(str, linha)) + '\n' for linha in _linhas(bloco))
@@ -1,30 +1,61 @@
 from __future__ import annotations
 
-from django.http import HttpRequest, HttpResponse, JsonResponse
+import hashlib
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Sum
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 
-from .models import Cidade, Simulacao, Relatorio
-from .services import calcular_impacto_economico, ParametrosInvalidos
+from .models import Comparacao, EstatisticaDiaria, Projecao, Simulacao, Relatorio, cenario_dos_parametros
+from .services import calcular_impacto_economico, expandir_resultado, ParametrosInvalidos
 
 from .forms import SimulacaoForm
+from . import cache, catalogo, coalescencia, coeficientes, comparacao, estatisticas, fila, idempotencia
+from . import exportacao, filtros, metricas, montecarlo, paginacao, perfil, ponderacao, projecao, varredura
+
+
+def _calcular_impacto(parametros: dict, vigentes) -> dict:
+    """``calcular_impacto_economico`` com as métricas de tempo por cenário e de erros de validação."""
+    inicio = time.perf_counter()
+    try:
+        with perfil.trecho("calculo"):
+            resultado = calcular_impacto_economico(parametros, coeficientes=vigentes)
+    except ParametrosInvalidos as e:
+        metricas.incrementar("simulacao_erros_validacao_total", classe=metricas.classe_erro(str(e)))
+        raise
+    metricas.observar("simulacao_calculo_segundos", time.perf_counter() - inicio, cenario=resultado["cenario"])
+    return resultado
 
 
 @require_http_methods(["GET", "POST"])
+@metricas.instrumentar("simulacao_view")
 def simulacao_view(request: HttpRequest) -> HttpResponse:
     form = SimulacaoForm(request.POST or None)
     contexto = {"form": form}
-    if request.method == "POST" and form.is_valid():
+    with perfil.trecho("formulario"):
+        valido = request.method == "POST" and form.is_valid()
+    if valido:
+        metricas.anotar_cenario(request, form.cleaned_data["cenario"])
         try:
-            params = form.build_parametros()
-            resultado = calcular_impacto_economico(params)
+            params = ponderacao.resolver_pesos(form.build_parametros())
+            resultado = _calcular_impacto(params, coeficientes.atual())
             contexto.update({
                 "resultado": resultado,
                 "params": params,
             })
-            return render(request, "simulacao/resultado.html", contexto)
+            with perfil.trecho("render"):
+                return render(request, "simulacao/resultado.html", contexto)
         except ParametrosInvalidos as e:
             contexto["erro"] = str(e)
         except Exception as e:  # fallback
@@ -32,70 +63,863 @@ def simulacao_view(request: HttpRequest) -> HttpResponse:
     return render(request, "simulacao/form.html", contexto)
 
 
+PARAM_KEYS = {
+    "numero_turistas", "gasto_medio", "duracao_estadia", "cidades_visitadas", "cenario", "multiplicador",
+    "ponderacao", "pesos",
+}
+OBRIGATORIOS = ["numero_turistas", "gasto_medio", "duracao_estadia", "cidades_visitadas"]
+ERRO_CIDADE = "Cidade não encontrada (informe cidade_id ou cidade_nome válido)."
+
+
+def _extrair_parametros(payload: dict, conhecidas: dict | None = None) -> tuple[dict, str | None]:
+    """Separa os parâmetros de simulação do payload (retirando chaves de cidade).
+
+    ``conhecidas`` (nome -> cidade) é repassado a ``ponderacao.resolver_pesos``.
+    """
+    parametros_simulacao = {k: v for k, v in payload.items() if k in PARAM_KEYS}
+    faltando = [c for c in OBRIGATORIOS if c not in parametros_simulacao]
+    if faltando:
+        return parametros_simulacao, f"Campos obrigatórios ausentes: {', '.join(faltando)}"
+    try:
+        # Pesos de populacao/pib vêm do catálogo e ficam gravados nos parâmetros
+        parametros_simulacao = ponderacao.resolver_pesos(parametros_simulacao, conhecidas)
+    except ParametrosInvalidos as e:
+        metricas.incrementar("simulacao_erros_validacao_total", classe=metricas.classe_erro(str(e)))
+        return parametros_simulacao, str(e)
+    return parametros_simulacao, None
+
+
+def _resolver_cidade(payload: dict) -> catalogo.CidadeInfo | None:
+    """Resolve cidade_id ou cidade_nome pelo catálogo em memória (sem consulta ao banco)."""
+    cid = payload.get("cidade_id")
+    if cid is not None:
+        return catalogo.por_id(cid)
+    return catalogo.por_nome(payload.get("cidade_nome"))
+
+
+def _resolver_cidade_em(payload: dict, por_id: dict, por_nome: dict) -> catalogo.CidadeInfo | None:
+    """Como ``_resolver_cidade``, mas nos dicionários de ``catalogo.resolver_varios``."""
+    cid = payload.get("cidade_id")
+    if cid is not None:
+        try:
+            return por_id.get(int(cid))
+        except (TypeError, ValueError):
+            return None
+    nome = payload.get("cidade_nome")
+    return por_nome.get(nome.strip()) if isinstance(nome, str) else None
+
+
+def _simulacao_existente(chave: str | None, versao: int | None) -> dict | None:
+    """Procura uma simulação já calculada com o mesmo hash e a mesma versão de coeficientes (cache e depois banco)."""
+    if not chave:
+        return None
+    existente = cache.obter_resultado(chave, versao)
+    if existente is not None:
+        return existente
+    return _guardar_existente(chave, _consulta_existente(chave, versao).first())
+
+
+def _consulta_existente(chave: str, versao: int | None):
+    return (
+        Simulacao.objects.filter(parametros_hash=chave, relatorio__isnull=False, relatorio__versao_coeficientes=versao)
+        .select_related("relatorio").order_by("id")
+    )
+
+
+def _guardar_existente(chave: str, simulacao: Simulacao | None) -> dict | None:
+    if simulacao is None:
+        return None
+    relatorio = simulacao.relatorio
+    cache.guardar_resultado(chave, simulacao.id, relatorio.resultado, relatorio.versao_coeficientes_id)
+    return {"simulacao_id": simulacao.id, "resultado": relatorio.resultado}
+
+
+def _persistir_simulacao(cidade: catalogo.CidadeInfo, parametros: dict, chave: str | None, resultado: dict) -> Simulacao:
+    """Grava simulação e relatório na mesma transação e alimenta o cache."""
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        simulacao = Simulacao.objects.create(cidade_id=cidade.id, parametros=parametros, parametros_hash=chave or "")
+        estatisticas.registrar([Relatorio.objects.create(simulacao=simulacao, resultado=resultado)])
+    metricas.observar("simulacao_gravacao_segundos", time.perf_counter() - inicio)
+    if chave:
+        cache.guardar_resultado(chave, simulacao.id, resultado)
+    return simulacao
+
+
+def _calcular_e_persistir(cidade: catalogo.CidadeInfo, parametros: dict, chave: str | None, vigentes) -> tuple[dict, bool]:
+    """Calcula e grava; requisições idênticas simultâneas esperam a primeira.
+
+    Retorna ``({simulacao_id, resultado}, reutilizado)``; ``reutilizado`` é
+    True quando o resultado veio de outra requisição.
+    """
+    def calcular():
+        # Um líder anterior pode ter gravado depois da consulta de reuso desta requisição
+        existente = _simulacao_existente(chave, vigentes.versao)
+        if existente is not None:
+            return existente, True
+        resultado = _calcular_impacto(parametros, vigentes)
+        with perfil.trecho("gravacao"):
+            simulacao = _persistir_simulacao(cidade, parametros, chave, resultado)
+        return {"simulacao_id": simulacao.id, "resultado": resultado}, False
+
+    if not chave:
+        return calcular()
+    (existente, reutilizado), compartilhado = coalescencia.voos.executar(f"{chave}:{vigentes.versao}", calcular)
+    return existente, reutilizado or compartilhado
+
+
+def _resposta_existente(cidade: catalogo.CidadeInfo, parametros: dict, existente: dict) -> JsonResponse:
+    return JsonResponse({
+        "simulacao_id": existente["simulacao_id"],
+        "cidade": cidade.nome,
+        "parametros": parametros,
+        "resultado": existente["resultado"],
+        "reutilizado": True,
+    })
+
+
+def _resposta_enfileirada(cidade: catalogo.CidadeInfo, parametros: dict, simulacao: Simulacao) -> JsonResponse:
+    return JsonResponse({
+        "simulacao_id": simulacao.id,
+        "cidade": cidade.nome,
+        "parametros": parametros,
+        "status": simulacao.status,
+        "progresso": simulacao.progresso,
+        "resultado_url": reverse("api_resultado", args=[simulacao.id]),
+    }, status=202)
+
+
+def _resposta_criada(cidade: catalogo.CidadeInfo, parametros: dict, criada: dict) -> JsonResponse:
+    return JsonResponse({
+        "simulacao_id": criada["simulacao_id"],
+        "cidade": cidade.nome,
+        "parametros": parametros,
+        "resultado": criada["resultado"],
+        "reutilizado": False,
+    }, status=201)
+
+
+def _pedido_assincrono(request: HttpRequest, payload: dict) -> bool:
+    return payload.get("async") is True or request.GET.get("async") in {"1", "true"}
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@metricas.instrumentar("api_simular")
+@idempotencia.idempotente
 def api_simular(request: HttpRequest) -> JsonResponse:
     """Cria uma simulação persistindo parâmetros e relatório.
 
     Payload JSON esperado:
       cidade_id (ou cidade_nome)
       numero_turistas, gasto_medio, duracao_estadia, cidades_visitadas (int|lista), opcional cenario, multiplicador
+
+    Com ``"async": true`` (ou ``?async=true``) a simulação é apenas enfileirada
+    e a resposta é 202 com o id; o worker ``processar_simulacoes`` grava o
+    relatório, que pode ser consultado em ``api/resultados/<id>/``.
+
+    Com o cabeçalho ``Idempotency-Key`` repetições da mesma requisição recebem
+    a resposta original; requisições idênticas simultâneas calculam uma vez.
     """
     import json
 
     try:
-        payload = json.loads(request.body or '{}')
+        with perfil.trecho("json"):
+            payload = json.loads(request.body or '{}')
     except json.JSONDecodeError:
         return JsonResponse({"erro": "JSON inválido."}, status=400)
 
-    # Cidade
-    cidade = None
-    cid = payload.get("cidade_id")
-    if cid is not None:
-        cidade = Cidade.objects.filter(id=cid).first()
-    elif payload.get("cidade_nome"):
-        cidade = Cidade.objects.filter(nome__iexact=payload["cidade_nome"].strip()).first()
+    with perfil.trecho("cidade"):
+        cidade = _resolver_cidade(payload)
     if not cidade:
-        return JsonResponse({"erro": "Cidade não encontrada (informe cidade_id ou cidade_nome válido)."}, status=400)
+        return JsonResponse({"erro": ERRO_CIDADE}, status=400)
 
-    # Parâmetros de simulação (retirando chaves de cidade)
-    param_keys = {"numero_turistas", "gasto_medio", "duracao_estadia", "cidades_visitadas", "cenario", "multiplicador"}
-    parametros_simulacao = {k: v for k, v in payload.items() if k in param_keys}
+    with perfil.trecho("parametros"):
+        parametros_simulacao, erro = _extrair_parametros(payload)
+    if erro:
+        return JsonResponse({"erro": erro}, status=400)
 
-    obrigatorios = ["numero_turistas", "gasto_medio", "duracao_estadia", "cidades_visitadas"]
-    faltando = [c for c in obrigatorios if c not in parametros_simulacao]
-    if faltando:
-        return JsonResponse({"erro": f"Campos obrigatórios ausentes: {', '.join(faltando)}"}, status=400)
+    # Parâmetros idênticos reaproveitam o relatório já calculado com os coeficientes vigentes
+    with perfil.trecho("reuso"):
+        vigentes = coeficientes.atual()
+        chave = cache.hash_parametros(cidade.id, parametros_simulacao)
+        existente = _simulacao_existente(chave, vigentes.versao)
+    cenario = cenario_dos_parametros(parametros_simulacao)
+    if cenario in vigentes.cenarios:
+        metricas.anotar_cenario(request, cenario)
+    if existente is not None:
+        return _resposta_existente(cidade, parametros_simulacao, existente)
+
+    if _pedido_assincrono(request, payload):
+        simulacao = fila.pendente_com_hash(chave) or fila.enfileirar(cidade, parametros_simulacao, chave or "")
+        return _resposta_enfileirada(cidade, parametros_simulacao, simulacao)
 
     try:
-        resultado = calcular_impacto_economico(parametros_simulacao)
+        existente, reutilizado = _calcular_e_persistir(cidade, parametros_simulacao, chave, vigentes)
     except ParametrosInvalidos as e:
         return JsonResponse({"erro": str(e)}, status=400)
     except Exception as e:  # proteção genérica
         return JsonResponse({"erro": f"Falha ao calcular: {e}"}, status=500)
 
-    with transaction.atomic():
-        simulacao = Simulacao.objects.create(cidade=cidade, parametros=parametros_simulacao)
-        Relatorio.objects.create(simulacao=simulacao, resultado=resultado)
+    if reutilizado:
+        return _resposta_existente(cidade, parametros_simulacao, existente)
+    return _resposta_criada(cidade, parametros_simulacao, existente)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_simular_lote(request: HttpRequest) -> JsonResponse:
+    """Cria várias simulações em uma única requisição.
+
+    Payload JSON esperado: lista de objetos no mesmo formato de ``api_simular``
+    (ou ``{"simulacoes": [...]}``). As cidades são resolvidas pelo catálogo,
+    todos os resultados são calculados e os válidos são persistidos com
+    ``bulk_create`` em uma única transação. Itens com o mesmo hash de
+    parâmetros de uma simulação existente (ou repetidos no lote) a reutilizam.
+    A resposta traz uma entrada por item, na mesma ordem do payload, com
+    ``ok`` e ``simulacao_id`` ou ``erro``.
+    """
+    import json
+
+    try:
+        payload = json.loads(request.body or '[]')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+    if isinstance(payload, dict):
+        payload = payload.get("simulacoes")
+    if not isinstance(payload, list) or not payload:
+        return JsonResponse({"erro": "Envie uma lista não vazia de simulações."}, status=400)
+    limite = getattr(settings, "SIMULACAO_LOTE_MAX", 5000)
+    if len(payload) > limite:
+        return JsonResponse({"erro": f"Lote excede o limite de {limite} simulações."}, status=400)
+
+    # Cidades e cidades ponderadas de todos os itens: as faltas são confirmadas numa consulta só
+    ids, nomes = [], []
+    for item in payload:
+        if isinstance(item, dict):
+            if item.get("cidade_id") is not None:
+                ids.append(item["cidade_id"])
+            else:
+                nomes.append(item.get("cidade_nome"))
+            nomes.extend(ponderacao.cidades_ponderadas(item))
+    por_id, por_nome = catalogo.resolver_varios(ids, nomes)
 
+    itens = []
+    pendentes = []
+    for indice, item in enumerate(payload):
+        if not isinstance(item, dict):
+            itens.append({"indice": indice, "ok": False, "erro": "Item deve ser um objeto JSON."})
+            continue
+        cidade = _resolver_cidade_em(item, por_id, por_nome)
+        if not cidade:
+            itens.append({"indice": indice, "ok": False, "erro": ERRO_CIDADE})
+            continue
+
+        parametros_simulacao, erro = _extrair_parametros(item, por_nome)
+        if erro:
+            itens.append({"indice": indice, "ok": False, "erro": erro})
+            continue
+        entrada = {"indice": indice, "ok": True, "cidade": cidade.nome}
+        itens.append(entrada)
+        pendentes.append((entrada, cidade, parametros_simulacao, cache.hash_parametros(cidade.id, parametros_simulacao)))
+
+    # Simulações já existentes com o mesmo hash e os coeficientes vigentes (cache local e depois uma consulta)
+    vigentes = coeficientes.atual()
+    existentes = {}
+    for _, _, _, chave in pendentes:
+        if chave and chave not in existentes:
+            valor = cache.obter_resultado(chave, vigentes.versao)
+            if valor is not None:
+                existentes[chave] = valor
+    faltantes = {chave for _, _, _, chave in pendentes if chave and chave not in existentes}
+    if faltantes:
+        consulta = (
+            Simulacao.objects.filter(
+                parametros_hash__in=faltantes, relatorio__isnull=False, relatorio__versao_coeficientes=vigentes.versao,
+            )
+            .select_related("relatorio").order_by("-id")
+        )
+        for sim in consulta:
+            existentes[sim.parametros_hash] = {"simulacao_id": sim.id, "resultado": sim.relatorio.resultado}
+            cache.guardar_resultado(sim.parametros_hash, sim.id, sim.relatorio.resultado, vigentes.versao)
+
+    novas = []
+    novas_por_chave = {}
+    for entrada, cidade, parametros_simulacao, chave in pendentes:
+        if chave in existentes:
+            entrada.update(simulacao_id=existentes[chave]["simulacao_id"], resultado=existentes[chave]["resultado"], reutilizado=True)
+            continue
+        if chave and chave in novas_por_chave:
+            # Repetido dentro do próprio lote: aponta para a mesma simulação nova
+            novas_por_chave[chave][0].append(entrada)
+            continue
+        try:
+            resultado = calcular_impacto_economico(parametros_simulacao, coeficientes=vigentes)
+        except ParametrosInvalidos as e:
+            entrada.update(ok=False, erro=str(e))
+            del entrada["cidade"]
+            continue
+        except Exception as e:  # proteção genérica
+            entrada.update(ok=False, erro=f"Falha ao calcular: {e}")
+            del entrada["cidade"]
+            continue
+        entrada.update(resultado=resultado, reutilizado=False)
+        simulacao = Simulacao(cidade_id=cidade.id, parametros=parametros_simulacao, parametros_hash=chave or "")
+        simulacao.preencher_resumo()  # bulk_create não chama save()
+        nova = ([entrada], simulacao, resultado)
+        novas.append(nova)
+        if chave:
+            novas_por_chave[chave] = nova
+
+    if novas:
+        with transaction.atomic():
+            simulacoes = Simulacao.objects.bulk_create([sim for _, sim, _ in novas])
+            relatorios = [Relatorio(simulacao=sim, resultado=resultado) for (_, _, resultado), sim in zip(novas, simulacoes)]
+            for relatorio in relatorios:
+                relatorio.preencher_resumo()
+            Relatorio.objects.bulk_create(relatorios)
+            estatisticas.registrar(relatorios)
+        for (entradas, _, resultado), sim in zip(novas, simulacoes):
+            for i, entrada in enumerate(entradas):
+                entrada["simulacao_id"] = sim.id
+                if i:
+                    entrada.update(resultado=resultado, reutilizado=True)
+            if sim.parametros_hash:
+                cache.guardar_resultado(sim.parametros_hash, sim.id, resultado)
+
+    erros = sum(1 for item in itens if not item["ok"])
     return JsonResponse({
-        "simulacao_id": simulacao.id,
-        "cidade": cidade.nome,
-        "parametros": parametros_simulacao,
-        "resultado": resultado,
-    }, status=201)
+        "total": len(itens),
+        "criadas": len(novas),
+        "reutilizadas": len(itens) - erros - len(novas),
+        "erros": erros,
+        "itens": itens,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_varredura(request: HttpRequest) -> HttpResponse:
+    """Varredura de sensibilidade sobre uma grade de parâmetros.
+
+    Payload JSON: os mesmos parâmetros de ``api_simular`` (sem cidade), cada um
+    como valor, lista ou faixa ``{"inicio", "fim", "passo"}`` /
+    ``{"inicio", "fim", "pontos", "escala": "linear"|"log"}``; ``cenario`` aceita
+    lista. O produto cartesiano é transmitido em NDJSON (padrão) ou CSV
+    (``"formato": "csv"`` ou ``?formato=csv``) à medida que é calculado.
+    """
+    import json
+
+    try:
+        payload = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"erro": "Envie um objeto JSON com a especificação da grade."}, status=400)
+
+    formato = request.GET.get("formato") or payload.get("formato") or "ndjson"
+    if formato not in {"ndjson", "csv"}:
+        return JsonResponse({"erro": "formato inválido (use ndjson|csv)"}, status=400)
+
+    vigentes = coeficientes.atual()
+    limite = getattr(settings, "SIMULACAO_VARREDURA_MAX_PONTOS", 10_000_000)
+    try:
+        grade = varredura.montar_grade(payload, vigentes, max_pontos=limite)
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+    total = varredura.total_pontos(grade)
+
+    if formato == "csv":
+        resposta = StreamingHttpResponse(varredura.gerar_csv(grade, coeficientes=vigentes), content_type="text/csv; charset=utf-8")
+        resposta["Content-Disposition"] = 'attachment; filename="varredura.csv"'
+    else:
+        resposta = StreamingHttpResponse(varredura.gerar_ndjson(grade, coeficientes=vigentes), content_type="application/x-ndjson")
+    resposta["X-Total-Pontos"] = str(total)
+    return resposta
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_montecarlo(request: HttpRequest) -> JsonResponse:
+    """Simulação Monte Carlo do impacto_total.
+
+    Payload JSON: parâmetros de ``api_simular`` (sem cidade), em que
+    numero_turistas, gasto_medio, duracao_estadia e multiplicador podem ser
+    distribuições (``{"distribuicao": "normal", "media", "desvio"}``,
+    ``{"distribuicao": "triangular", "minimo", "moda", "maximo"}`` ou
+    ``{"distribuicao": "uniforme", "minimo", "maximo"}``), além de
+    ``amostras``, ``semente`` e ``bins``. Retorna média, percentis p5/p50/p95
+    e histograma de impacto_total.
+    """
+    import json
+
+    try:
+        payload = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"erro": "Envie um objeto JSON com os parâmetros."}, status=400)
+
+    try:
+        modelo = montecarlo.montar_modelo(payload, coeficientes.atual())
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+
+    limite = getattr(settings, "SIMULACAO_MONTECARLO_MAX_AMOSTRAS", 10_000_000)
+    if modelo["amostras"] > limite:
+        return JsonResponse({"erro": f"amostras excede o limite de {limite}."}, status=400)
+
+    workers = getattr(settings, "SIMULACAO_MONTECARLO_WORKERS", None)
+    try:
+        resultado = montecarlo.simular_monte_carlo(modelo, workers=workers)
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+    except Exception as e:  # proteção genérica
+        return JsonResponse({"erro": f"Falha ao calcular: {e}"}, status=500)
+    return JsonResponse(resultado)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_comparar(request: HttpRequest) -> JsonResponse:
+    """Aplica um conjunto de parâmetros a todas as cidades e devolve o ranking.
+
+    Payload JSON: parâmetros de ``api_simular`` (sem cidade), mais ``estado``
+    (sigla ou nome; opcional), ``criterio`` (``participacao_pib``, padrão, ou
+    ``impacto_per_capita``), ``limite`` de linhas no ranking e ``salvar``
+    (grava um único registro ``Comparacao`` com o ranking completo).
+    """
+    import json
+
+    try:
+        payload = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"erro": "Envie um objeto JSON com os parâmetros."}, status=400)
+
+    parametros_simulacao, erro = _extrair_parametros(payload)
+    if erro:
+        return JsonResponse({"erro": erro}, status=400)
+    estado = str(payload.get("estado") or "").strip()
+    criterio = str(payload.get("criterio") or "participacao_pib")
+    try:
+        limite = int(payload["limite"]) if payload.get("limite") is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({"erro": "limite deve ser inteiro."}, status=400)
+    if limite is not None and limite <= 0:
+        return JsonResponse({"erro": "limite deve ser > 0."}, status=400)
+
+    salvar = bool(payload.get("salvar"))
+    try:
+        # O registro salvo guarda o ranking completo; o limite vale só para a resposta
+        resultado = comparacao.comparar(
+            parametros_simulacao, estado, criterio, None if salvar else limite, coeficientes.atual(),
+        )
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+    except Exception as e:  # proteção genérica
+        return JsonResponse({"erro": f"Falha ao calcular: {e}"}, status=500)
+    if resultado["n_cidades"] == 0:
+        return JsonResponse({"erro": "Nenhuma cidade encontrada para o filtro informado."}, status=400)
+
+    resposta = {"parametros": parametros_simulacao, **resultado}
+    status = 200
+    if salvar:
+        registro = Comparacao.objects.create(
+            parametros=parametros_simulacao,
+            estado=estado,
+            criterio=criterio,
+            n_cidades=resultado["n_cidades"],
+            impacto_total=resultado["impacto_total"],
+            resultado=resultado,
+        )
+        resposta["comparacao_id"] = registro.id
+        resposta["url"] = reverse("api_comparacao", args=[registro.id])
+        if limite is not None:
+            resposta["ranking"] = resultado["ranking"][:limite]
+        status = 201
+    return JsonResponse(resposta, status=status)
+
+
+@require_http_methods(["GET"])  # GET /api/comparacoes/<id>/
+def api_comparacao(request: HttpRequest, comparacao_id: int) -> JsonResponse:
+    """Retorna uma comparação gravada (``?limite=N`` corta o ranking)."""
+    registro = get_object_or_404(Comparacao, id=comparacao_id)
+    resultado = registro.resultado
+    if request.GET.get("limite", "").isdigit():
+        resultado = {**resultado, "ranking": resultado["ranking"][:int(request.GET["limite"])]}
+    return JsonResponse({
+        "comparacao_id": registro.id,
+        "criado_em": registro.criado_em.isoformat(),
+        "parametros": registro.parametros,
+        **resultado,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_projetar(request: HttpRequest) -> JsonResponse:
+    """Projeta o impacto em série mensal ou diária e grava a série empacotada.
+
+    Payload JSON: parâmetros de ``api_simular`` (cidade opcional), com
+    ``numero_turistas`` como fluxo anual, mais ``inicio`` (AAAA-MM),
+    ``horizonte_meses``, ``granularidade`` (mensal|diaria), ``sazonalidade``
+    (nome ou 12 pesos) e ``crescimento_anual``. ``resolucao`` e ``pontos``
+    controlam a série devolvida, como em ``api_projecao``.
+    """
+    import json
+
+    try:
+        payload = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"erro": "Envie um objeto JSON com os parâmetros."}, status=400)
+
+    cidade = None
+    if payload.get("cidade_id") is not None or payload.get("cidade_nome"):
+        cidade = _resolver_cidade(payload)
+        if not cidade:
+            return JsonResponse({"erro": ERRO_CIDADE}, status=400)
+
+    parametros_projecao = {k: v for k, v in payload.items() if k in PARAM_KEYS | projecao.PARAM_KEYS}
+    try:
+        modelo = projecao.montar_projecao(parametros_projecao, coeficientes=coeficientes.atual())
+        series = projecao.projetar(modelo)
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+
+    # resolucao/pontos validados antes de gravar: um 400 não deixa projeção órfã
+    resolucao, pontos, erro = _opcoes_serie(modelo["granularidade"], payload.get("resolucao"), payload.get("pontos"))
+    if erro:
+        return JsonResponse({"erro": erro}, status=400)
+
+    # Gravação e resposta na mesma transação: uma falha ao montar a série desfaz o registro
+    with transaction.atomic():
+        registro = Projecao.objects.create(
+            cidade_id=cidade.id if cidade else None,
+            parametros=parametros_projecao,
+            inicio=series["datas"][0].astype("datetime64[D]").item(),
+            granularidade=modelo["granularidade"],
+            n_pontos=int(series["datas"].size),
+            turistas=projecao.empacotar(series["turistas"]),
+            impacto=projecao.empacotar(series["impacto"]),
+            impacto_total=Decimal(str(round(float(series["impacto"].sum()), 2))),
+        )
+        resposta, _ = _serie_projecao(registro, series, resolucao, pontos)
+        resposta["url"] = reverse("api_projecao", args=[registro.id])
+    return JsonResponse(resposta, status=201)
+
+
+@require_http_methods(["GET"])  # GET /api/projecoes/<id>/
+def api_projecao(request: HttpRequest, projecao_id: int) -> JsonResponse:
+    """Série de uma projeção gravada.
+
+    ``resolucao`` (diaria|mensal|trimestral|anual) soma os valores por período
+    do calendário; ``pontos`` reduz a série a no máximo N pontos com LTTB,
+    preservando picos e vales para gráficos.
+    """
+    registro = get_object_or_404(Projecao, id=projecao_id)
+    series = {
+        "datas": projecao.datas_serie(np.datetime64(registro.inicio, "M" if registro.granularidade == "mensal" else "D"),
+                                      registro.n_pontos, registro.granularidade),
+        "turistas": projecao.desempacotar(registro.turistas),
+        "impacto": projecao.desempacotar(registro.impacto),
+    }
+    resposta, erro = _serie_projecao(registro, series, request.GET.get("resolucao"), request.GET.get("pontos"))
+    if erro:
+        return JsonResponse({"erro": erro}, status=400)
+    return JsonResponse(resposta)
+
+
+def _opcoes_serie(granularidade: str, resolucao, pontos) -> tuple[str | None, int | None, str | None]:
+    """Valida ``resolucao`` e ``pontos`` (texto da query string ou valores do JSON)."""
+    resolucao = resolucao or granularidade
+    if not isinstance(resolucao, str) or resolucao not in projecao.RESOLUCOES:
+        return None, None, f"resolucao inválida (use {'|'.join(projecao.RESOLUCOES)})"
+    if resolucao == "diaria" and granularidade == "mensal":
+        return None, None, "Série mensal não pode ser vista em resolução diária."
+    if isinstance(pontos, (bool, float, list, dict)):
+        return None, None, "pontos deve ser inteiro."
+    try:
+        pontos = int(pontos) if pontos not in (None, "") else None
+    except (TypeError, ValueError):
+        return None, None, "pontos deve ser inteiro."
+    if pontos is not None and pontos < 3:
+        return None, None, "pontos deve ser >= 3."
+    return resolucao, pontos, None
+
+
+def _serie_projecao(registro: Projecao, series: dict, resolucao, pontos) -> tuple[dict, str | None]:
+    resolucao, pontos, erro = _opcoes_serie(registro.granularidade, resolucao, pontos)
+    if erro:
+        return {}, erro
+
+    datas, colunas = projecao.agregar(series["datas"], {"turistas": series["turistas"], "impacto": series["impacto"]}, resolucao)
+    if pontos is not None:
+        indices = projecao.lttb(colunas["impacto"], pontos)
+        datas = datas[indices]
+        colunas = {nome: valores[indices] for nome, valores in colunas.items()}
+    return {
+        "projecao_id": registro.id,
+        "granularidade": registro.granularidade,
+        "resolucao": resolucao,
+        "n_pontos": registro.n_pontos,
+        "impacto_total": float(registro.impacto_total),
+        "datas": [str(d) for d in datas],
+        "turistas": np.round(colunas["turistas"], 2).tolist(),
+        "impacto": np.round(colunas["impacto"], 2).tolist(),
+    }, None
+
+
+@require_http_methods(["GET"])  # GET /api/simulacoes/
+def api_simulacoes(request: HttpRequest) -> JsonResponse:
+    """Lista simulações, mais recentes primeiro, com paginação por cursor.
+
+    Filtros (query string): ``cidade`` (id ou nome), ``desde`` e ``ate`` (data
+    ou data-hora ISO; ``ate`` só com data inclui o dia inteiro), ``cenario`` e
+    ``status``; ``impacto_min`` e ``impacto_max`` filtram pela coluna
+    ``Relatorio.impacto_total``. ``limite`` (1-500, padrão 50) e ``cursor`` (valor de
+    ``proximo`` da página anterior).
+    """
+    # Só as colunas de resumo: parametros e resultado (JSON) não são lidos
+    queryset = Simulacao.objects.select_related("cidade", "relatorio").defer("parametros", "relatorio__resultado")
+
+    try:
+        queryset = filtros.filtrar_simulacoes(queryset, request.GET)
+    except filtros.FiltroInvalido as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+
+    try:
+        limite = min(max(int(request.GET.get("limite", 50)), 1), 500)
+    except ValueError:
+        return JsonResponse({"erro": "limite deve ser inteiro."}, status=400)
+
+    try:
+        simulacoes, proximo = paginacao.paginar(queryset, request.GET.get("cursor"), limite)
+    except paginacao.CursorInvalido as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+
+    itens = []
+    for sim in simulacoes:
+        rel = getattr(sim, "relatorio", None)
+        itens.append({
+            "simulacao_id": sim.id,
+            "cidade": sim.cidade.nome,
+            "data_criacao": sim.data_criacao.isoformat(),
+            "status": sim.status,
+            "cenario": sim.cenario,
+            "impacto_total": float(rel.impacto_total) if rel and rel.impacto_total is not None else None,
+            "url": reverse("api_resultado", args=[sim.id]),
+        })
+    return JsonResponse({"resultados": itens, "proximo": proximo})
+
+
+@require_http_methods(["GET"])  # GET /api/exportar/
+def api_exportar(request: HttpRequest) -> HttpResponse:
+    """Exporta simulações com seus relatórios em CSV ou NDJSON (streaming).
+
+    Aceita os mesmos filtros de ``api_simulacoes``, ``formato`` (``csv`` ou
+    ``ndjson``, padrão) e ``completo=1`` para incluir parâmetros e resultado
+    originais. Parquet só pelo comando ``exportar_simulacoes``.
+    """
+    formato = request.GET.get("formato", "ndjson")
+    if formato not in {"ndjson", "csv"}:
+        return JsonResponse({"erro": "formato inválido (use ndjson|csv; Parquet pelo comando exportar_simulacoes)"}, status=400)
+    try:
+        queryset = filtros.filtrar_simulacoes(Simulacao.objects.all(), request.GET)
+    except filtros.FiltroInvalido as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+    completo = request.GET.get("completo", "").lower() in {"1", "true", "sim"}
+    queryset = exportacao.consulta(queryset, completo=completo)
+
+    if formato == "csv":
+        resposta = StreamingHttpResponse(exportacao.gerar_csv(queryset, completo), content_type="text/csv; charset=utf-8")
+        resposta["Content-Disposition"] = 'attachment; filename="simulacoes.csv"'
+    else:
+        resposta = StreamingHttpResponse(exportacao.gerar_ndjson(queryset, completo), content_type="application/x-ndjson")
+    return resposta
+
+
+AGRUPAMENTOS_ESTATISTICAS = {"cidade": "cidade_id", "cenario": "cenario", "dia": "dia"}
+
+
+@require_http_methods(["GET"])  # GET /api/estatisticas/
+def api_estatisticas(request: HttpRequest) -> JsonResponse:
+    """Totais e médias de impacto lidos só da tabela de agregados diários.
+
+    ``agrupar`` é uma lista separada por vírgulas de ``cidade``, ``cenario`` e
+    ``dia`` (padrão ``cidade``). Filtros: ``cidade`` (id ou nome), ``cenario``,
+    ``desde`` e ``ate`` (datas AAAA-MM-DD, inclusivas).
+    """
+    agrupar = [g.strip() for g in request.GET.get("agrupar", "cidade").split(",") if g.strip()]
+    invalidos = [g for g in agrupar if g not in AGRUPAMENTOS_ESTATISTICAS]
+    if invalidos:
+        return JsonResponse({"erro": f"agrupar inválido: {', '.join(invalidos)} (use cidade, cenario, dia)."}, status=400)
+    colunas = [AGRUPAMENTOS_ESTATISTICAS[g] for g in dict.fromkeys(agrupar)]
+
+    queryset = EstatisticaDiaria.objects.all()
+    cidade_param = request.GET.get("cidade")
+    if cidade_param:
+        cidade = catalogo.por_id(cidade_param) if cidade_param.isdigit() else catalogo.por_nome(cidade_param)
+        if cidade is None:
+            return JsonResponse({"erro": "Cidade não encontrada."}, status=400)
+        queryset = queryset.filter(cidade_id=cidade.id)
+    if request.GET.get("cenario"):
+        queryset = queryset.filter(cenario=request.GET["cenario"].strip().lower())
+    try:
+        for param, filtro in (("desde", "dia__gte"), ("ate", "dia__lte")):
+            if request.GET.get(param):
+                dia = parse_date(request.GET[param])
+                if dia is None:
+                    raise ValueError(request.GET[param])
+                queryset = queryset.filter(**{filtro: dia})
+    except ValueError:
+        return JsonResponse({"erro": "Data inválida (use AAAA-MM-DD)."}, status=400)
+
+    grupos = (
+        queryset.values(*colunas)
+        .annotate(quantidade=Sum("quantidade"), soma_impacto=Sum("soma_impacto"), soma_gasto=Sum("soma_gasto"))
+        .order_by(*colunas)
+    )
+    itens = []
+    for grupo in grupos:
+        item = {}
+        if "cidade_id" in grupo:
+            info = catalogo.por_id(grupo["cidade_id"])
+            item.update(cidade_id=grupo["cidade_id"], cidade=info.nome if info else None)
+        if "cenario" in grupo:
+            item["cenario"] = grupo["cenario"]
+        if "dia" in grupo:
+            item["dia"] = grupo["dia"].isoformat()
+        quantidade = grupo["quantidade"] or 0
+        impacto = grupo["soma_impacto"] or Decimal("0")
+        item.update(
+            quantidade=quantidade,
+            impacto_total=float(impacto),
+            impacto_medio=round(float(impacto) / quantidade, 2) if quantidade else None,
+            gasto_total=float(grupo["soma_gasto"] or 0),
+        )
+        itens.append(item)
+    return JsonResponse({"agrupar": list(dict.fromkeys(agrupar)), "resultados": itens})
+
+
+def _expandir_pedido(request: HttpRequest) -> bool:
+    return request.GET.get("expandir") in {"1", "true"}
+
+
+def _etag_resultado(simulacao_id: int, relatorio_id: int, atualizado_em, cidade: str, expandir: bool) -> str:
+    """ETag forte do corpo de ``api_resultado``: muda se o relatório for regravado ou a cidade renomeada."""
+    marca = f"{simulacao_id}:{relatorio_id}:{atualizado_em.isoformat()}:{cidade}:{int(expandir)}"
+    return '"' + hashlib.sha256(marca.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_corresponde(request: HttpRequest, etag: str) -> bool:
+    cabecalho = request.headers.get("If-None-Match")
+    if not cabecalho:
+        return False
+    # If-None-Match usa comparação fraca (RFC 9110, 13.1.2)
+    return any(e == "*" or e.removeprefix("W/") == etag for e in parse_etags(cabecalho))
+
+
+def _com_cache_http(resposta: HttpResponse, etag: str) -> HttpResponse:
+    resposta["ETag"] = etag
+    patch_cache_control(resposta, public=True, max_age=getattr(settings, "SIMULACAO_RESULTADO_MAX_AGE", 86400))
+    return resposta
+
+
+def _nao_modificado(etag: str) -> HttpResponse:
+    return _com_cache_http(HttpResponseNotModified(), etag)
 
 
 @require_http_methods(["GET"])  # GET /api/resultados/<id>/
-def api_resultado(request: HttpRequest, simulacao_id: int) -> JsonResponse:
-    simulacao = get_object_or_404(Simulacao, id=simulacao_id)
+@metricas.instrumentar("api_resultado")
+def api_resultado(request: HttpRequest, simulacao_id: int) -> HttpResponse:
+    """Retorna o relatório de uma simulação.
+
+    Resultados com breakdown compacto (``distribuicao`` uniforme) são devolvidos
+    assim; ``?expandir=1`` gera a lista de cidades e o mapa ``impacto_por_cidade``.
+    Simulações assíncronas ainda na fila respondem 202 com status e progresso;
+    as que falharam respondem 422 com a mensagem de erro.
+
+    Respostas 200 levam ETag e ``Cache-Control: public, max-age`` de
+    ``SIMULACAO_RESULTADO_MAX_AGE`` segundos (padrão um dia; um recálculo muda o
+    ETag, mas caches podem servir a versão anterior até expirar). Com
+    ``If-None-Match`` a validação consulta só id, data de atualização e cidade,
+    sem ler o JSON do relatório, e responde 304. Com
+    ``SIMULACAO_RESULTADO_CACHE_ALIAS`` o corpo serializado fica no cache do Django.
+    """
+    expandir = _expandir_pedido(request)
+    armazenada = cache.obter_resposta(simulacao_id, expandir)
+    if armazenada is not None:
+        etag, corpo, cenario = armazenada
+        metricas.anotar_cenario(request, cenario)
+        if _etag_corresponde(request, etag):
+            return _nao_modificado(etag)
+        return _com_cache_http(HttpResponse(corpo, content_type="application/json"), etag)
+
+    if request.headers.get("If-None-Match"):
+        with perfil.trecho("validacao"):
+            marca = (
+                Simulacao.objects.filter(id=simulacao_id, relatorio__isnull=False)
+                .values_list("relatorio__id", "relatorio__atualizado_em", "cidade__nome", "cenario").first()
+            )
+        if marca is not None:
+            etag = _etag_resultado(simulacao_id, *marca[:3], expandir)
+            if _etag_corresponde(request, etag):
+                metricas.anotar_cenario(request, marca[3])
+                return _nao_modificado(etag)
+
+    with perfil.trecho("consulta"):
+        simulacao = get_object_or_404(Simulacao.objects.select_related("cidade", "relatorio"), id=simulacao_id)
+    metricas.anotar_cenario(request, simulacao.cenario)
+    with perfil.trecho("resposta"):
+        resposta = _resposta_resultado(request, simulacao)
+    if resposta.status_code != 200:
+        return resposta
+    rel = simulacao.relatorio
+    etag = _etag_resultado(simulacao.id, rel.id, rel.atualizado_em, simulacao.cidade.nome, expandir)
+    cache.guardar_resposta(simulacao.id, expandir, etag, resposta.content, simulacao.cenario)
+    return _com_cache_http(resposta, etag)
+
+
+def _resposta_resultado(request: HttpRequest, simulacao: Simulacao) -> JsonResponse:
+    """Monta a resposta de ``api_resultado`` (cidade e relatório já carregados).
+
+    Respostas sem relatório (fila, erro) não devem ser guardadas por caches.
+    """
     rel = getattr(simulacao, "relatorio", None)
     if not rel:
-        return JsonResponse({"erro": "Relatório ainda não gerado."}, status=404)
+        if simulacao.status in {Simulacao.Status.PENDENTE, Simulacao.Status.PROCESSANDO}:
+            resposta = JsonResponse({
+                "simulacao_id": simulacao.id,
+                "status": simulacao.status,
+                "progresso": simulacao.progresso,
+            }, status=202)
+        elif simulacao.status == Simulacao.Status.ERRO:
+            resposta = JsonResponse({"simulacao_id": simulacao.id, "status": simulacao.status, "erro": simulacao.erro}, status=422)
+        else:
+            resposta = JsonResponse({"erro": "Relatório ainda não gerado."}, status=404)
+        add_never_cache_headers(resposta)
+        return resposta
+    resultado = rel.resultado
+    if _expandir_pedido(request):
+        try:
+            resultado = expandir_resultado(resultado)
+        except ParametrosInvalidos as e:
+            return JsonResponse({"erro": str(e)}, status=400)
     return JsonResponse({
         "simulacao_id": simulacao.id,
         "cidade": simulacao.cidade.nome,
         "parametros": simulacao.parametros,
-        "resultado": rel.resultado,
+        "resultado": resultado,
+        "status": simulacao.status,
         "criado_em": rel.criado_em.isoformat(),
     })
+
+
+@require_http_methods(["GET"])  # GET /metrics
+def metricas_view(request: HttpRequest) -> HttpResponse:
+    """Métricas de vazão e latência no formato de texto do Prometheus (ver ``metricas``)."""
+    return HttpResponse(metricas.exposicao(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,154 @@
+"""Versões assíncronas de ``api_simular`` e ``api_resultado`` para o ASGI.
+
+Sob ASGI as views síncronas de ``views.py`` rodam uma a uma numa thread via
+``sync_to_async``; estas usam o ORM assíncrono (``aget``, ``afirst``) e
+executam o cálculo num executor, de modo que um único processo ASGI mantém
+muitas requisições lentas em andamento ao mesmo tempo. O cache de resultados e
+a fila (``fila``) são síncronos e rodam via ``sync_to_async``, fora do event
+loop. O formato das respostas é o mesmo das versões síncronas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import cache, coalescencia, coeficientes, fila, idempotencia, metricas, perfil
+from .models import Simulacao, cenario_dos_parametros
+from .services import ParametrosInvalidos
+from .views import (
+    ERRO_CIDADE,
+    _calcular_impacto,
+    _com_cache_http,
+    _consulta_existente,
+    _etag_corresponde,
+    _etag_resultado,
+    _expandir_pedido,
+    _extrair_parametros,
+    _guardar_existente,
+    _nao_modificado,
+    _pedido_assincrono,
+    _persistir_simulacao,
+    _resolver_cidade,
+    _resposta_criada,
+    _resposta_enfileirada,
+    _resposta_existente,
+    _resposta_resultado,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "SIMULACAO_ASYNC_WORKERS", 8),
+    thread_name_prefix="simulacao-calculo",
+)
+
+
+async def _simulacao_existente(chave: str, versao: int | None) -> dict | None:
+    """Versão assíncrona de ``views._simulacao_existente``: o cache roda fora do event loop."""
+    existente = await sync_to_async(cache.obter_resultado)(chave, versao)
+    if existente is not None:
+        return existente
+    simulacao = await _consulta_existente(chave, versao).afirst()
+    if simulacao is None:
+        return None
+    return await sync_to_async(_guardar_existente)(chave, simulacao)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@metricas.instrumentar("api_simular_async")
+@idempotencia.idempotente
+async def api_simular(request: HttpRequest) -> JsonResponse:
+    """Versão assíncrona de ``views.api_simular`` (mesmo payload e respostas)."""
+    try:
+        with perfil.trecho("json"):
+            payload = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({"erro": "JSON inválido."}, status=400)
+
+    # O catálogo responde da memória; só consulta o banco quando expira
+    cidade = await sync_to_async(_resolver_cidade)(payload)
+    if not cidade:
+        return JsonResponse({"erro": ERRO_CIDADE}, status=400)
+
+    # Pesos de populacao/pib consultam o catálogo (e o banco, se expirado ou em falta)
+    parametros_simulacao, erro = await sync_to_async(_extrair_parametros)(payload)
+    if erro:
+        return JsonResponse({"erro": erro}, status=400)
+
+    # Como o catálogo, o registro de coeficientes só consulta o banco quando expira
+    vigentes = await sync_to_async(coeficientes.atual)()
+    cenario = cenario_dos_parametros(parametros_simulacao)
+    if cenario in vigentes.cenarios:
+        metricas.anotar_cenario(request, cenario)
+    chave = cache.hash_parametros(cidade.id, parametros_simulacao)
+    if chave:
+        existente = await _simulacao_existente(chave, vigentes.versao)
+        if existente is not None:
+            return _resposta_existente(cidade, parametros_simulacao, existente)
+
+    if _pedido_assincrono(request, payload):
+        simulacao = await sync_to_async(fila.pendente_com_hash)(chave)
+        if simulacao is None:
+            simulacao = await sync_to_async(fila.enfileirar)(cidade, parametros_simulacao, chave or "")
+        return _resposta_enfileirada(cidade, parametros_simulacao, simulacao)
+
+    async def calcular_e_persistir():
+        if chave:
+            # Um líder anterior pode ter gravado depois da consulta de reuso acima
+            existente = await _simulacao_existente(chave, vigentes.versao)
+            if existente is not None:
+                return existente, True
+        loop = asyncio.get_running_loop()
+        with perfil.trecho("calculo"):
+            resultado = await loop.run_in_executor(_executor, partial(_calcular_impacto, parametros_simulacao, vigentes))
+        # transaction.atomic não tem versão assíncrona: as duas inserções vão juntas numa thread
+        with perfil.trecho("gravacao"):
+            simulacao = await sync_to_async(_persistir_simulacao)(cidade, parametros_simulacao, chave, resultado)
+        return {"simulacao_id": simulacao.id, "resultado": resultado}, False
+
+    try:
+        if chave:
+            # Requisições idênticas simultâneas neste event loop esperam o mesmo cálculo
+            (existente, reutilizado), compartilhado = await coalescencia.voos.aexecutar(
+                f"{chave}:{vigentes.versao}", calcular_e_persistir,
+            )
+            reutilizado = reutilizado or compartilhado
+        else:
+            existente, reutilizado = await calcular_e_persistir()
+    except ParametrosInvalidos as e:
+        return JsonResponse({"erro": str(e)}, status=400)
+    except Exception as e:  # proteção genérica
+        return JsonResponse({"erro": f"Falha ao calcular: {e}"}, status=500)
+
+    if reutilizado:
+        return _resposta_existente(cidade, parametros_simulacao, existente)
+    return _resposta_criada(cidade, parametros_simulacao, existente)
+
+
+@require_http_methods(["GET"])
+@metricas.instrumentar("api_resultado_async")
+async def api_resultado(request: HttpRequest, simulacao_id: int) -> JsonResponse:
+    """Versão assíncrona de ``views.api_resultado`` (mesmo ETag; o 304 é decidido após carregar o relatório)."""
+    try:
+        with perfil.trecho("consulta"):
+            simulacao = await Simulacao.objects.select_related("cidade", "relatorio").aget(id=simulacao_id)
+    except Simulacao.DoesNotExist:
+        raise Http404("Simulação não encontrada.")
+    metricas.anotar_cenario(request, simulacao.cenario)
+    with perfil.trecho("resposta"):
+        resposta = _resposta_resultado(request, simulacao)
+    if resposta.status_code != 200:
+        return resposta
+    rel = simulacao.relatorio
+    etag = _etag_resultado(simulacao.id, rel.id, rel.atualizado_em, simulacao.cidade.nome, _expandir_pedido(request))
+    if _etag_corresponde(request, etag):
+        return _nao_modificado(etag)
+    return _com_cache_http(resposta, etag)